@@ -1,8 +1,9 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, stream_with_context
 import json
 import os
 import sys
 import datetime
+import tempfile
 from flask_cors import CORS
 
 # Import configuration and logging
@@ -12,9 +13,19 @@ from logger import logger, get_logger
 # Import core modules
 from crawler import start_crawl
 from vpn_connect import connect_vpn, check_vpn_status, disconnect_vpn
-from utils import get_ip_details, export_to_csv, export_to_excel, save_to_filebase
-from dark_web_filters import filter_data
+from utils import get_ip_details, iter_csv_export, iter_excel_export, save_to_filebase
+from dark_web_filters import filter_data, enrich_data
 from web_archive import fetch_archive
+from dark_web_scripts.result_store import get_result_store, matches as result_matches
+from dark_web_scripts.crawl_frontier import new_crawl_id
+from dark_web_scripts.search_index import get_search_index
+from dark_web_scripts.keyword_sets import get_keyword_set, reload_keyword_set
+from dark_web_scripts.crawl_jobs import get_job_manager, JobQueueFull
+from dark_web_scripts.result_db import get_result_db
+from dark_web_scripts.content_log import get_content_log
+from dark_web_scripts.blob_store import get_blob_store
+from pagination import encode_cursor, decode_cursor, page_size, parse_fields, project, paginate
+from request_cache import RequestCache, normalize_url, normalize_terms
 
 # Import browser modules with error handling
 try:
@@ -44,9 +55,17 @@ except ImportError as e:
 # Create Flask app
 app = Flask(__name__)
 # Enable CORS with more specific settings
-CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type", "Authorization"]}})
+CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type", "Authorization"],
+                             "expose_headers": ["X-Next-Cursor"]}})
 app.config['CORS_HEADERS'] = 'Content-Type'
 
+# Responses of identical crawl, archive and IP lookup requests are shared for a while
+CRAWL_CACHE_TTL = int(os.getenv('CRAWL_CACHE_TTL', 300))
+LOOKUP_CACHE_TTL = int(os.getenv('LOOKUP_CACHE_TTL', 3600))
+crawl_cache = RequestCache('crawl', CRAWL_CACHE_TTL)
+archive_cache = RequestCache('web_archive', LOOKUP_CACHE_TTL)
+ip_cache = RequestCache('ip_details', LOOKUP_CACHE_TTL)
+
 # Get module-specific logger
 app_logger = get_logger('app')
 app_logger.info("Starting Dark Web Monitoring API")
@@ -80,9 +99,191 @@ def get_mock_data():
         app_logger.error(f"Error generating mock data: {e}")
         return jsonify({"error": str(e)}), 500
 
+def crawl_filters(data):
+    """The filter_data arguments of a /crawl request"""
+    return {
+        "keywords": data.get('keywords', ''),
+        "geo_location": data.get('geo_location', ''),
+        "date_range": data.get('date_range'),  # [start_date, end_date] in 'YYYY-MM-DD' format
+        "risk_threshold": data.get('risk_threshold'),  # Minimum risk score (0-100)
+        "seller_only": data.get('seller_only', False),  # Only include sellers
+        "country": data.get('country'),  # Specific country
+        "state": data.get('state'),  # Specific state/region
+        "district": data.get('district'),  # Specific district/city
+        "category": data.get('category')  # Content category
+    }
+
+def complete_result(item):
+    """Add the fields the frontend expects to a filtered result"""
+    # Add required fields if missing
+    if 'title' not in item or not item['title']:
+        item['title'] = 'Untitled'
+        
+    if 'description' not in item or not item['description']:
+        item['description'] = item.get('content_sample', 'No description available')
+        
+    if 'date_detected' not in item:
+        item['date_detected'] = datetime.datetime.now().strftime('%Y-%m-%d')
+        
+    if 'country' not in item:
+        item['country'] = 'Unknown'
+        
+    if 'risk_score' not in item:
+        item['risk_score'] = 50  # Default medium risk
+        
+    if 'is_seller' not in item:
+        item['is_seller'] = False
+        
+    # Add archive link if missing
+    if 'archive_link' not in item:
+        item['archive_link'] = f"https://web.archive.org/web/{item.get('url', '#')}"
+    
+    # Ensure URL is present
+    if 'url' not in item or not item['url']:
+        item['url'] = '#'
+    return item
+
+def page_response(items, params, scope):
+    """
+    JSON response with one page of items. params may hold limit and cursor (paging
+    starts when either is given; the next page's cursor goes in the X-Next-Cursor
+    header) and fields, the comma-separated fields to keep.
+    Raises ValueError for a bad cursor or limit.
+    """
+    fields = parse_fields(params.get('fields'))
+    next_cursor = None
+    if params.get('limit') or params.get('cursor'):
+        items, next_cursor = paginate(items, page_size(params.get('limit')), params.get('cursor'), scope)
+    response = jsonify(project(items, fields))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def crawl_cache_params(data):
+    """Normalized /crawl parameters: requests that would give the same results get the same key"""
+    params = crawl_filters(data)
+    params['keywords'] = normalize_terms(params['keywords'])
+    for name in ('geo_location', 'country', 'state', 'district', 'category'):
+        params[name] = (params[name] or '').strip().lower()
+    params['seller_only'] = bool(params['seller_only'])
+    params['max_pages'] = data.get('max_pages', 10)
+    # Results scored with an older keyword set are not reused
+    params['keyword_set'] = get_keyword_set().version
+    return params
+
+def result_store():
+    """The indexed in-memory result store, seeded from the result database on first use"""
+    return get_result_store(seed_records=get_result_db().iter_records())
+
+def save_crawl_data(data, crawl_id=None):
+    """Save crawl results to the result database, updating earlier results for the same URLs"""
+    try:
+        get_result_db().upsert_many(data, crawl_id=crawl_id)
+        return True
+    except Exception as e:
+        app_logger.error(f"Error saving crawl data: {e}")
+        return False
+
+def stored_crawl_results(crawl_id, data):
+    """The stored results of a crawl matching the /crawl filters, as filter_crawl_results returned them"""
+    store = result_store()
+    return [complete_result(dict(item)) for item in store.filter_data(crawl_id=crawl_id, **crawl_filters(data))]
+
+def filter_crawl_results(crawled_data, data, crawl_id=None):
+    """Enrich crawled records, store them and return the ones matching the /crawl filters"""
+    filters = crawl_filters(data)
+    app_logger.info(f"Processing {len(crawled_data)} crawled items")
+    
+    # Add date_detected field if not present
+    for item in crawled_data:
+        if 'date_detected' not in item:
+            item['date_detected'] = datetime.datetime.now().strftime('%Y-%m-%d')
+        if 'country' not in item:
+            item['country'] = 'Unknown'
+    
+    # Apply filtering: the crawl's records go into the indexed result store,
+    # and the filters are answered from its indexes
+    try:
+        crawl_id = crawl_id or new_crawl_id()
+        store = result_store()
+        store.add_many(enrich_data(crawled_data, filters['keywords']), crawl_id=crawl_id)
+        filtered_data = [dict(item) for item in store.filter_data(crawl_id=crawl_id, **filters)]
+        app_logger.info(f"Filtered data: {len(filtered_data)} items")
+    except Exception as e:
+        app_logger.error(f"Error filtering data: {e}")
+        filtered_data = crawled_data
+        app_logger.info("Using unfiltered data due to filter error")
+    
+    # Ensure the data has all required fields for the frontend
+    for item in filtered_data:
+        try:
+            complete_result(item)
+        except Exception as e:
+            app_logger.error(f"Error processing item: {e}")
+            # Skip problematic items
+            continue
+    
+    # Save the data for later use
+    save_crawl_data(filtered_data, crawl_id)
+    
+    return filtered_data
+
+def run_crawl_job(job):
+    """
+    Crawl for a background job: mock data in development mode (like /crawl),
+    otherwise a Tor crawl that reports its progress to the job and stops when the
+    job is cancelled. The job ID is the crawl ID, so a cancelled crawl can be resumed.
+    Every result that passes the filters is published to the job's event stream as
+    soon as it is scored.
+    """
+    data = job.params
+    filters = crawl_filters(data)
+    keywords = filters['keywords']
+    keyword_list = [k.strip() for k in keywords.split(',') if k.strip()] if keywords else None
+    
+    def publish(result):
+        item = dict(result)
+        item.setdefault('date_detected', datetime.datetime.now().strftime('%Y-%m-%d'))
+        for enriched in enrich_data([item], filters['keywords']):
+            if result_matches(enriched, **filters):
+                job.publish(complete_result(enriched))
+    
+    if config.DEV_MODE:
+        from mock_data import generate_mock_data
+        crawled_data = generate_mock_data(num_items=15, keywords=keyword_list or ["darkweb"])
+        for result in crawled_data:
+            publish(result)
+        job.update_progress(job.max_pages, len(crawled_data))
+    else:
+        from dark_web_scripts.tor_crawler import crawl_dark_web as tor_crawl
+        crawled_data = tor_crawl(
+            start_urls=data.get('start_urls'),
+            max_pages=job.max_pages,
+            keywords=keyword_list,
+            enable_ip_detection=data.get('enable_ip_detection', True),
+            use_async=data.get('use_async', False),
+            crawl_id=job.id,
+            progress=job.update_progress,
+            cancel_event=job.cancel_event,
+            on_result=publish
+        )
+    
+    return filter_crawl_results(crawled_data, data, crawl_id=job.id)
+
+def submit_crawl_job(data):
+    """Queue a crawl job and return the 202 response pointing at its status"""
+    try:
+        job = get_job_manager().submit(new_crawl_id(), run_crawl_job, data, max_pages=data.get('max_pages', 10))
+    except JobQueueFull as e:
+        app_logger.warning(f"Rejected crawl job: {e}")
+        return jsonify({"error": str(e)}), 503
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = f"/crawl/jobs/{job.id}"
+    return response, 202
+
 @app.route('/crawl', methods=['POST'])
 def crawl_dark_web():
-    """Crawl Dark Web and return data with enhanced filtering"""
+    """Crawl Dark Web and return data with enhanced filtering; "async": true queues a job instead"""
     try:
         app_logger.info("Received crawl request")
         data = request.get_json()
@@ -93,110 +294,36 @@ def crawl_dark_web():
         
         app_logger.info(f"Crawl parameters: keywords={keywords}, geo_location={geo_location}")
         
-        # Advanced filtering parameters
-        date_range = data.get('date_range')  # [start_date, end_date] in 'YYYY-MM-DD' format
-        risk_threshold = data.get('risk_threshold')  # Minimum risk score (0-100)
-        seller_only = data.get('seller_only', False)  # Only include sellers
-        country = data.get('country')  # Specific country
-        state = data.get('state')  # Specific state/region
-        district = data.get('district')  # Specific district/city
-        category = data.get('category')  # Content category
-        
-        # Additional parameters
-        max_pages = data.get('max_pages', 10)  # Maximum number of pages to crawl (reduced for faster response)
-        enable_ip_detection = data.get('enable_ip_detection', True)  # Whether to try to reveal IPs
-        
-        # For development purposes, always use mock data to ensure functionality
-        app_logger.info("Using mock data for crawling")
-        from mock_data import generate_mock_data
-        crawled_data = generate_mock_data(num_items=15, keywords=keywords.split(',') if keywords else ["darkweb"])
-    
-        # Process the crawled data
-        app_logger.info(f"Processing {len(crawled_data)} crawled items")
-        
-        # Try to use the enhanced filter
-        try:
-            from dark_web_scripts.dark_web_filters import filter_data
-        except ImportError:
-            # Fall back to the original filter if the enhanced one is not available
-            app_logger.warning("Enhanced filter not available, falling back to original filter")
-            try:
-                from dark_web_filters import filter_data
-            except ImportError:
-                app_logger.error("Could not import any filter module, using identity function")
-                # Define a simple pass-through function if no filter module is available
-                def filter_data(data, **kwargs):
-                    return data
-        
-        # Add date_detected field if not present
-        for item in crawled_data:
-            if 'date_detected' not in item:
-                item['date_detected'] = datetime.datetime.now().strftime('%Y-%m-%d')
-            if 'country' not in item:
-                item['country'] = 'Unknown'
-        
-        # Apply filtering
-        try:
-            filtered_data = filter_data(
-                crawled_data, 
-                keywords=keywords, 
-                geo_location=geo_location,
-                date_range=date_range,
-                risk_threshold=risk_threshold,
-                seller_only=seller_only,
-                country=country,
-                state=state,
-                district=district,
-                category=category
-            )
-            app_logger.info(f"Filtered data: {len(filtered_data)} items")
-        except Exception as e:
-            app_logger.error(f"Error filtering data: {e}")
-            filtered_data = crawled_data
-            app_logger.info("Using unfiltered data due to filter error")
+        # Long crawls run as background jobs that the client polls
+        if data.get('async'):
+            return submit_crawl_job(data)
         
-        # Ensure the data has all required fields for the frontend
-        for item in filtered_data:
+        # Later pages of a paged crawl come from the stored results, without crawling again
+        if data.get('cursor'):
             try:
-                # Add required fields if missing
-                if 'title' not in item or not item['title']:
-                    item['title'] = 'Untitled'
-                    
-                if 'description' not in item or not item['description']:
-                    item['description'] = item.get('content_sample', 'No description available')
-                    
-                if 'date_detected' not in item:
-                    item['date_detected'] = datetime.datetime.now().strftime('%Y-%m-%d')
-                    
-                if 'country' not in item:
-                    item['country'] = 'Unknown'
-                    
-                if 'risk_score' not in item:
-                    item['risk_score'] = 50  # Default medium risk
-                    
-                if 'is_seller' not in item:
-                    item['is_seller'] = False
-                    
-                # Add archive link if missing
-                if 'archive_link' not in item:
-                    item['archive_link'] = f"https://web.archive.org/web/{item.get('url', '#')}"
-                
-                # Ensure URL is present
-                if 'url' not in item or not item['url']:
-                    item['url'] = '#'
-            except Exception as e:
-                app_logger.error(f"Error processing item: {e}")
-                # Skip problematic items
-                continue
-        
-        # Save the data for later use
-        try:
-            save_crawl_data(filtered_data)
-        except Exception as e:
-            app_logger.error(f"Error saving crawl data: {e}")
+                scope = (decode_cursor(data['cursor']) or {}).get('scope') or ''
+                if not scope.startswith('crawl-'):
+                    raise ValueError("Invalid cursor")
+                return page_response(stored_crawl_results(scope, data), data, scope), 200
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        
+        def run_crawl():
+            # For development purposes, always use mock data to ensure functionality
+            app_logger.info("Using mock data for crawling")
+            from mock_data import generate_mock_data
+            crawled_data = generate_mock_data(num_items=15, keywords=keywords.split(',') if keywords else ["darkweb"])
+            
+            crawl_id = new_crawl_id()
+            return crawl_id, filter_crawl_results(crawled_data, data, crawl_id=crawl_id)
         
+        # Identical requests share one crawl (concurrent ones wait for it)
+        crawl_id, filtered_data = crawl_cache.get_or_compute(crawl_cache_params(data), run_crawl)
         app_logger.info(f"Returning {len(filtered_data)} filtered results")
-        return jsonify(filtered_data), 200
+        try:
+            return page_response(filtered_data, data, crawl_id), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     except Exception as e:
         app_logger.error(f"Error in crawl endpoint: {e}")
         # Return mock data as a fallback
@@ -209,23 +336,144 @@ def crawl_dark_web():
             app_logger.error(f"Error generating mock data: {e2}")
             return jsonify({"error": f"Crawl failed: {str(e)}"}), 500
 
-def save_crawl_data(data):
-    """Save crawled data to a JSON file for later use"""
+@app.route('/crawl/jobs', methods=['POST'])
+def create_crawl_job():
+    """Queue a crawl as a background job; takes the same parameters as /crawl"""
     try:
-        # Create directory if it doesn't exist
-        data_dir = os.path.join(os.path.dirname(__file__), 'data_storage')
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # Save to file
-        file_path = os.path.join(data_dir, 'crawled_data.json')
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        
-        app_logger.info(f"Saved crawl data to {file_path}")
-        return True
+        return submit_crawl_job(request.get_json() or {})
     except Exception as e:
-        app_logger.error(f"Error saving crawl data: {e}")
-        return False
+        app_logger.error(f"Error submitting crawl job: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/crawl/jobs', methods=['GET'])
+def list_crawl_jobs():
+    """Status of every crawl job that hasn't expired, newest first"""
+    return jsonify([job.to_dict() for job in get_job_manager().list()]), 200
+
+@app.route('/crawl/jobs/<job_id>', methods=['GET'])
+def crawl_job_status(job_id):
+    """Status and progress of a crawl job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job: {job_id}"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/crawl/jobs/<job_id>/results', methods=['GET'])
+def crawl_job_results(job_id):
+    """Filtered results of a finished crawl job; supports limit, cursor and fields"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job: {job_id}"}), 404
+    if job.results is None:
+        return jsonify({"error": f"Job {job_id} has no results ({job.status})", "status": job.status}), 409
+    try:
+        return page_response(job.results, request.args, job_id), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/crawl/jobs/<job_id>/events', methods=['GET'])
+def crawl_job_events(job_id):
+    """
+    Server-Sent Events stream of a crawl job: a "result" event for every result as
+    soon as it is found, periodic "progress" events and a final "done" event.
+    Reconnecting with Last-Event-ID resumes after the last result received.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job: {job_id}"}), 404
+    after = request.headers.get('Last-Event-ID', request.args.get('after', '0'))
+    after = int(after) if after.isdigit() else 0
+    
+    def events():
+        for event, event_id, payload in job.iter_events(after):
+            message = f"event: {event}\n"
+            if event_id is not None:
+                message += f"id: {event_id}\n"
+            yield message + f"data: {json.dumps(payload)}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/crawl/jobs/<job_id>', methods=['DELETE'])
+def cancel_crawl_job(job_id):
+    """Cancel a queued or running crawl job"""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job: {job_id}"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/results', methods=['POST'])
+def query_results():
+    """Filter every stored crawl result using the result store's indexes"""
+    try:
+        data = request.get_json() or {}
+        results = result_store().query(
+            keywords=data.get('keywords'),
+            geo_location=data.get('geo_location'),
+            date_range=data.get('date_range'),
+            risk_threshold=data.get('risk_threshold'),
+            seller_only=data.get('seller_only', False),
+            country=data.get('country'),
+            state=data.get('state'),
+            district=data.get('district'),
+            category=data.get('category')
+        )
+        app_logger.info(f"Returning {len(results)} stored results")
+        return jsonify(results), 200
+    except Exception as e:
+        app_logger.error(f"Error querying stored results: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/search', methods=['GET'])
+def search_saved_pages():
+    """BM25 full-text search over already crawled pages; use "quotes" for phrases"""
+    try:
+        query = request.args.get('q', default='')
+        limit = request.args.get('limit', default=20, type=int)
+        if not query.strip():
+            return jsonify({"error": "Query parameter q is required"}), 400
+        
+        results = get_search_index().search(query, limit=limit)
+        app_logger.info(f"Search '{query}' matched {results['total']} saved pages")
+        return jsonify(results), 200
+    except Exception as e:
+        app_logger.error(f"Error searching saved pages: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/page-content', methods=['GET'])
+def page_content():
+    """Full saved content of a crawled page (its latest version unless version is given)"""
+    try:
+        url = request.args.get('url', default='')
+        version = request.args.get('version', type=int)
+        if not url:
+            return jsonify({"error": "Query parameter url is required"}), 400
+        
+        content_log = get_content_log()
+        page = content_log.get(url, version)
+        if page is None:
+            return jsonify({"error": f"No saved content for {url}"}), 404
+        if 'content_hash' in page and 'content' not in page:
+            # The body is kept once in the blob store, referenced by its hash
+            page['content'] = get_blob_store().get_text(page['content_hash'])
+        return jsonify({"page": page, "versions": content_log.versions(url)}), 200
+    except Exception as e:
+        app_logger.error(f"Error reading saved content: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/keyword-set', methods=['GET', 'POST'])
+def keyword_set_info():
+    """Version and size of the current keyword set; POST reloads it from its file"""
+    try:
+        if request.method == 'POST':
+            keyword_set = reload_keyword_set()
+            app_logger.info(f"Keyword set reloaded, version {keyword_set.version}")
+        else:
+            keyword_set = get_keyword_set()
+        return jsonify(keyword_set.summary()), 200
+    except Exception as e:
+        app_logger.error(f"Error loading keyword set: {e}")
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/ip-details', methods=['POST'])
 def ip_details():
@@ -236,22 +484,25 @@ def ip_details():
     if not site_url:
         return jsonify({"error": "URL is required"}), 400
 
-    # Try to use the enhanced IP reveal functionality
-    try:
-        from dark_web_scripts.ip_reveal import reveal_ip_and_geo
+    def reveal():
+        # Try to use the enhanced IP reveal functionality
+        try:
+            from dark_web_scripts.ip_reveal import reveal_ip_and_geo
+        except ImportError:
+            # Fall back to the original method
+            app_logger.warning("Enhanced IP reveal not available, falling back to original method")
+            return get_ip_details(site_url)
         
         app_logger.info(f"Revealing IP for {site_url} using enhanced method")
-        ip_info = reveal_ip_and_geo(site_url)
-        
-        if ip_info:
-            return jsonify(ip_info), 200
-        else:
-            return jsonify({"error": "Could not reveal IP address"}), 404
-    except ImportError:
-        # Fall back to the original method
-        app_logger.warning("Enhanced IP reveal not available, falling back to original method")
-        ip_info = get_ip_details(site_url)
+        return reveal_ip_and_geo(site_url)
+    
+    # Concurrent lookups of the same site share one reveal; only found IPs are cached
+    ip_info = ip_cache.get_or_compute({"url": normalize_url(site_url)}, reveal,
+                                      cacheable=lambda info: bool(info and info.get("ip_found")))
+    if ip_info:
         return jsonify(ip_info), 200
+    else:
+        return jsonify({"error": "Could not reveal IP address"}), 404
 
 @app.route('/web-archive', methods=['POST'])
 def web_archive():
@@ -262,7 +513,9 @@ def web_archive():
     if not site_url:
         return jsonify({"error": "URL is required"}), 400
 
-    archive_data = fetch_archive(site_url)
+    # Concurrent requests for the same site share one set of archive lookups; failed lookups are not cached
+    archive_data = archive_cache.get_or_compute({"url": normalize_url(site_url)}, lambda: fetch_archive(site_url),
+                                                cacheable=lambda data: bool(data) and data.get('status') != 'not found')
     return jsonify(archive_data), 200
 
 @app.route('/vpn-status', methods=['GET'])
@@ -283,46 +536,77 @@ def vpn_disconnect():
     status = disconnect_vpn()
     return jsonify(status), 200
 
+def export_filters(args):
+    """
+    Result database filters of an export request: the latest crawl's results unless
+    crawl_id is given (crawl_id=all exports every stored result), optionally narrowed
+    by country, category, min_risk, date_from/date_to and seller_only
+    """
+    db = get_result_db()
+    crawl_id = args.get('crawl_id') or db.latest_crawl_id()
+    return {
+        "crawl_id": None if crawl_id == 'all' else crawl_id,
+        "country": args.get('country'),
+        "category": args.get('category'),
+        "min_risk": args.get('min_risk', type=float),
+        "date_range": (args.get('date_from'), args.get('date_to')),
+        "seller_only": args.get('seller_only', '').lower() in ('1', 'true', 'yes')
+    }
+
 @app.route('/export-csv', methods=['GET'])
 def export_csv():
-    """Export crawled data to CSV"""
+    """Export crawled data to CSV, streamed while the records are read"""
     try:
-        # Get the latest crawl data
-        data_path = os.path.join(os.path.dirname(__file__), 'data_storage', 'crawled_data.json')
-        
-        if not os.path.exists(data_path):
+        filters = export_filters(request.args)
+        if not get_result_db().count(**filters):
             return jsonify({"error": "No crawl data available"}), 404
         
-        with open(data_path, 'r') as f:
-            crawl_data = json.load(f)
-        
-        # Export to CSV
-        csv_path = export_to_csv(crawl_data)
-        
-        # Return the file
-        return send_file(csv_path, as_attachment=True, download_name="dark_web_data.csv")
+        return Response(stream_with_context(iter_csv_export(get_result_db().iter_records(**filters))), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=dark_web_data.csv'})
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/export-excel', methods=['GET'])
 def export_excel():
-    """Export crawled data to Excel"""
+    """Export crawled data to Excel, built in a write-only workbook"""
     try:
-        # Get the latest crawl data
-        data_path = os.path.join(os.path.dirname(__file__), 'data_storage', 'crawled_data.json')
-        
-        if not os.path.exists(data_path):
+        filters = export_filters(request.args)
+        if not get_result_db().count(**filters):
             return jsonify({"error": "No crawl data available"}), 404
         
-        with open(data_path, 'r') as f:
-            crawl_data = json.load(f)
+        return Response(stream_with_context(iter_excel_export(get_result_db().iter_records(**filters))),
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                        headers={'Content-Disposition': 'attachment; filename=dark_web_data.xlsx'})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/export-parquet', methods=['GET'])
+def export_parquet():
+    """Export crawled data to a Parquet file (nested fields kept, columnar and compressed)"""
+    try:
+        from dark_web_scripts.columnar_export import PYARROW_AVAILABLE, write_parquet
+        if not PYARROW_AVAILABLE:
+            return jsonify({"error": "Parquet export not available (pyarrow is not installed)"}), 501
         
-        # Export to Excel
-        excel_path = export_to_excel(crawl_data)
+        filters = export_filters(request.args)
+        if not get_result_db().count(**filters):
+            return jsonify({"error": "No crawl data available"}), 404
         
-        # Return the file
-        return send_file(excel_path, as_attachment=True, download_name="dark_web_data.xlsx")
+        def generate():
+            # Written to an anonymous temporary file: Parquet's footer comes last
+            with tempfile.TemporaryFile() as f:
+                write_parquet(get_result_db().iter_records(**filters), f)
+                f.seek(0)
+                while True:
+                    chunk = f.read(1 << 16)
+                    if not chunk:
+                        break
+                    yield chunk
+        
+        return Response(stream_with_context(generate()), mimetype='application/vnd.apache.parquet',
+                        headers={'Content-Disposition': 'attachment; filename=dark_web_data.parquet'})
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -338,14 +622,12 @@ def upload_to_filebase():
         if 'data' in data:
             crawl_data = data['data']
         else:
-            # Otherwise, get the latest crawl data from file
-            data_path = os.path.join(os.path.dirname(__file__), 'data_storage', 'crawled_data.json')
+            # Otherwise, get the latest crawl's results from the result database
+            db = get_result_db()
+            crawl_data = list(db.iter_records(crawl_id=db.latest_crawl_id()))
             
-            if not os.path.exists(data_path):
+            if not crawl_data:
                 return jsonify({"error": "No crawl data available"}), 404
-            
-            with open(data_path, 'r') as f:
-                crawl_data = json.load(f)
         
         # Upload to Filebase
         app_logger.info(f"Uploading data to Filebase, type: {data_type}")
@@ -359,16 +641,24 @@ def upload_to_filebase():
 
 @app.route('/filebase-data', methods=['GET'])
 def list_filebase_data():
-    """List data stored in Filebase"""
+    """List data stored in Filebase; pass the X-Next-Cursor header back as cursor for the next page"""
     try:
         data_type = request.args.get('data_type', 'crawl_results')
-        limit = int(request.args.get('limit', 100))
+        limit = page_size(request.args.get('limit'))
+        scope = f"filebase:{data_type}"
+        try:
+            state = decode_cursor(request.args.get('cursor'), scope)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Import the Filebase storage module
         try:
             from filebase_storage import list_filebase_data as list_data
-            result = list_data(data_type, limit)
-            return jsonify(result), 200
+            result = list_data(data_type, limit, state.get('after') if state else None)
+            response = jsonify(project(result, parse_fields(request.args.get('fields'))))
+            if len(result) >= limit:
+                response.headers['X-Next-Cursor'] = encode_cursor({'scope': scope, 'after': result[-1]['filename']})
+            return response, 200
         except ImportError:
             app_logger.error("Filebase storage module not available")
             return jsonify({"error": "Filebase storage module not available"}), 500
@@ -461,7 +751,11 @@ def track_seller():
 
 @app.route('/seller-history', methods=['POST'])
 def seller_history():
-    """Get historical data for a seller"""
+    """
+    Get historical data for a seller, newest first. limit and cursor page through the
+    snapshots (next_cursor continues), and fields keeps only the listed snapshot fields,
+    e.g. "timestamp,rating,products.title,products.price".
+    """
     data = request.get_json()
     marketplace = data.get('marketplace', '')
     seller_id = data.get('seller_id')
@@ -473,13 +767,24 @@ def seller_history():
     if not seller_id and not seller_name:
         return jsonify({"error": "Either seller_id or seller_name is required"}), 400
     
+    scope = f"seller:{marketplace}:{seller_id or seller_name}"
+    try:
+        limit = page_size(data.get('limit')) if data.get('limit') or data.get('cursor') else None
+        state = decode_cursor(data.get('cursor'), scope)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     try:
         from dark_web_scripts.seller_tracking import get_seller_history
         
         app_logger.info(f"Getting history for seller {seller_id or seller_name} on {marketplace}")
-        result = get_seller_history(marketplace, seller_id, seller_name)
+        result = get_seller_history(marketplace, seller_id, seller_name, limit=limit,
+                                    after=state.get('after') if state else None)
         
         if result and 'error' not in result:
+            next_after = result.pop('next_after', None)
+            result['next_cursor'] = encode_cursor({'scope': scope, 'after': next_after}) if next_after else None
+            result['history'] = project(result['history'], parse_fields(data.get('fields')))
             return jsonify(result), 200
         else:
             return jsonify(result), 400
@@ -530,13 +835,22 @@ def crawl_with_browser():
     browser_type = data.get('browser_type', 'tor').lower()
     url = data.get('url', '')
     keywords = data.get('keywords', '')
+    use_async = data.get('use_async', False)  # Use the asyncio crawl engine for Tor
+    max_pages = data.get('max_pages', 50)
     
     if not url and not keywords:
         return jsonify({"error": "Either URL or keywords are required"}), 400
     
     # Handle different browser types
     if browser_type == 'tor':
-        if url:
+        if use_async:
+            # Use the concurrent crawl engine, starting from the URL or the seed list
+            from dark_web_scripts.tor_crawler import crawl_dark_web as tor_crawl, search_dark_web
+            if url:
+                result = tor_crawl(start_urls=[url], max_pages=max_pages, use_async=True)
+            else:
+                result = search_dark_web(keywords, max_pages=max_pages, use_async=True)
+        elif url:
             # Use the dark-web-scripts/tor_crawler.py implementation
             from dark_web_scripts.tor_crawler import scrape_onion_site
             result = scrape_onion_site(url)
@@ -577,24 +891,10 @@ def crawl_with_browser():
     # Filter and save the data if it's in the right format
     if isinstance(result, list) and result and 'url' in result[0]:
         filtered_data = filter_data(result, keywords)
-        save_crawl_data(filtered_data)
+        save_crawl_data(filtered_data, new_crawl_id())
         return jsonify(filtered_data), 200
     
     return jsonify(result), 200
 
-def save_crawl_data(data):
-    """Save crawl data to JSON file"""
-    data_dir = os.path.join(os.path.dirname(__file__), 'data_storage')
-    
-    # Create directory if it doesn't exist
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-    
-    # Save data to file
-    data_path = os.path.join(data_dir, 'crawled_data.json')
-    
-    with open(data_path, 'w') as f:
-        json.dump(data, f, indent=2)
-
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5000)
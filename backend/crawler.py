@@ -2,12 +2,20 @@ import requests
 from stem import Signal
 from stem.control import Controller
 from bs4 import BeautifulSoup
+import os
+import sys
 import random
 import datetime
 import time
 import string
 import uuid
 
+# Shared single-pass page parser and scoring engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dark_web_scripts.page_parser import parse_page
+from dark_web_scripts.scoring import score_page
+from dark_web_scripts.gazetteer import locate
+
 # Fake data generators
 def generate_onion_url():
     """Generate a random .onion URL"""
@@ -386,36 +394,34 @@ def scrape_onion_site(url):
         # Set a reasonable timeout
         response = session.get(url, timeout=60)
         
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # Parse the HTML content once for every signal below
+        page = parse_page(response.text, url)
         
         # Extract title
-        title = soup.title.string if soup.title else "Unknown Title"
+        title = page['title'] or "Unknown Title"
         
         # Extract description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        description = meta_desc['content'] if meta_desc else ""
+        description = page['description']
         
         # If no meta description, try to get some text content
         if not description:
-            paragraphs = soup.find_all('p')
-            if paragraphs:
+            if page['paragraphs']:
                 # Join the first few paragraphs
-                description = ' '.join([p.text for p in paragraphs[:3]])[:200] + "..."
+                description = ' '.join(page['paragraphs'])[:200] + "..."
             else:
                 # Just get some text from the body
-                body_text = soup.body.text if soup.body else ""
-                description = ' '.join(body_text.split()[:30]) + "..."
+                description = ' '.join(page['text'].split()[:30]) + "..."
         
-        # Calculate risk score based on content
-        content_text = soup.get_text().lower()
-        risk_score = calculate_risk_score_from_content(content_text)
+        # Risk score, seller signals and country from one pass of the scoring engine
+        content_text = page['text'].lower()
+        scores = score_page(page['title'], page['description'], page['text'])
+        risk_score = scores['risk_score']
         
         # Try to determine if it's a seller
-        is_seller_site = determine_if_seller(soup, content_text)
+        is_seller_site = determine_if_seller(page, scores)
         
         # Try to determine country
-        country = extract_country_from_content(soup, content_text)
+        country = scores.get('country', "Unknown")
         
         # Check for archive link
         archive_link = generate_archive_link(url)
@@ -452,126 +458,17 @@ def scrape_onion_site(url):
         }]
 
 def calculate_risk_score_from_content(content):
-    """Calculate risk score based on actual content"""
-    # Define risk categories with weighted scores
-    risk_terms = {
-        # High risk terms (90-100)
-        "murder": 95, "assassination": 95, "hitman": 95, "kill": 90,
-        "fentanyl": 95, "heroin": 90, "cocaine": 85, "meth": 85,
-        "weapons": 90, "guns": 85, "firearms": 85, "explosives": 90,
-        "child": 95, "underage": 95,
-        "counterfeit": 80, "fake id": 80, "passport": 85,
-        
-        # Medium risk terms (60-89)
-        "hack": 75, "cracking": 70, "ddos": 75,
-        "credit card": 80, "dumps": 80, "cvv": 80,
-        "bitcoin": 60, "monero": 65, "cryptocurrency": 60,
-        "anonymous": 60, "hidden": 60, "private": 60,
-        
-        # Low risk terms (30-59)
-        "forum": 40, "discussion": 35, "community": 30,
-        "market": 50, "marketplace": 55, "shop": 55,
-        "secure": 40, "encrypted": 45, "privacy": 40
-    }
-    
-    # Calculate score based on presence of risk terms
-    max_score = 0
-    for term, score in risk_terms.items():
-        if term in content:
-            max_score = max(max_score, score)
-    
-    # If no risk terms found, assign a base score
-    if max_score == 0:
-        max_score = 30
-    
-    # Add some randomness (±5 points)
-    max_score += random.randint(-5, 5)
-    
-    # Ensure score is within 0-100 range
-    return max(0, min(100, max_score))
+    """Calculate risk score based on actual content (deterministic, shared scoring engine)"""
+    return score_page(content=content)["risk_score"]
 
-def determine_if_seller(soup, content):
-    """Determine if the site is a seller based on content analysis"""
-    # Check for common seller indicators in the content
-    seller_indicators = [
-        "buy", "purchase", "order", "add to cart", "checkout", "shopping cart",
-        "price", "cost", "payment", "shipping", "delivery", "vendor", "seller",
-        "bitcoin", "btc", "monero", "xmr", "cryptocurrency", "crypto", "wallet"
-    ]
-    
-    # Check for common seller HTML elements
-    seller_elements = [
-        soup.find('form', attrs={'id': lambda x: x and ('cart' in x.lower() or 'checkout' in x.lower() or 'order' in x.lower())}),
-        soup.find('button', text=lambda x: x and ('buy' in x.lower() or 'purchase' in x.lower() or 'add to cart' in x.lower())),
-        soup.find('input', attrs={'type': 'submit', 'value': lambda x: x and ('buy' in x.lower() or 'purchase' in x.lower())}),
-        soup.find('div', attrs={'class': lambda x: x and ('product' in x.lower() or 'item' in x.lower() or 'cart' in x.lower())})
-    ]
-    
-    # Check content for seller indicators
-    content_indicators = sum(1 for indicator in seller_indicators if indicator in content.lower())
-    
-    # Check HTML for seller elements
-    element_indicators = sum(1 for element in seller_elements if element is not None)
-    
-    # Determine if it's a seller based on the number of indicators
-    return (content_indicators >= 3) or (element_indicators >= 1)
+def determine_if_seller(page, scores):
+    """Determine if the site is a seller from the page's text (scores) and HTML elements (page)"""
+    # Cart/checkout forms, buy buttons and product divs found while parsing
+    return scores["is_seller"] or page['seller_elements'] >= 1
 
-def extract_country_from_content(soup, content):
+def extract_country_from_content(content):
     """Extract country information from the content"""
-    # List of countries to check for
-    countries = [
-        "Afghanistan", "Albania", "Algeria", "Andorra", "Angola", "Argentina", "Armenia", "Australia", 
-        "Austria", "Azerbaijan", "Bahamas", "Bahrain", "Bangladesh", "Barbados", "Belarus", "Belgium", 
-        "Belize", "Benin", "Bhutan", "Bolivia", "Bosnia", "Botswana", "Brazil", "Brunei", "Bulgaria", 
-        "Burkina Faso", "Burundi", "Cambodia", "Cameroon", "Canada", "Cape Verde", "Central African Republic", 
-        "Chad", "Chile", "China", "Colombia", "Comoros", "Congo", "Costa Rica", "Croatia", "Cuba", "Cyprus", 
-        "Czech Republic", "Denmark", "Djibouti", "Dominica", "Dominican Republic", "East Timor", "Ecuador", 
-        "Egypt", "El Salvador", "Equatorial Guinea", "Eritrea", "Estonia", "Eswatini", "Ethiopia", "Fiji", 
-        "Finland", "France", "Gabon", "Gambia", "Georgia", "Germany", "Ghana", "Greece", "Grenada", "Guatemala", 
-        "Guinea", "Guinea-Bissau", "Guyana", "Haiti", "Honduras", "Hungary", "Iceland", "India", "Indonesia", 
-        "Iran", "Iraq", "Ireland", "Israel", "Italy", "Jamaica", "Japan", "Jordan", "Kazakhstan", "Kenya", 
-        "Kiribati", "Korea", "Kosovo", "Kuwait", "Kyrgyzstan", "Laos", "Latvia", "Lebanon", "Lesotho", "Liberia", 
-        "Libya", "Liechtenstein", "Lithuania", "Luxembourg", "Madagascar", "Malawi", "Malaysia", "Maldives", 
-        "Mali", "Malta", "Marshall Islands", "Mauritania", "Mauritius", "Mexico", "Micronesia", "Moldova", 
-        "Monaco", "Mongolia", "Montenegro", "Morocco", "Mozambique", "Myanmar", "Namibia", "Nauru", "Nepal", 
-        "Netherlands", "New Zealand", "Nicaragua", "Niger", "Nigeria", "North Macedonia", "Norway", "Oman", 
-        "Pakistan", "Palau", "Palestine", "Panama", "Papua New Guinea", "Paraguay", "Peru", "Philippines", 
-        "Poland", "Portugal", "Qatar", "Romania", "Russia", "Rwanda", "Saint Kitts and Nevis", "Saint Lucia", 
-        "Saint Vincent and the Grenadines", "Samoa", "San Marino", "Sao Tome and Principe", "Saudi Arabia", 
-        "Senegal", "Serbia", "Seychelles", "Sierra Leone", "Singapore", "Slovakia", "Slovenia", "Solomon Islands", 
-        "Somalia", "South Africa", "South Sudan", "Spain", "Sri Lanka", "Sudan", "Suriname", "Sweden", "Switzerland", 
-        "Syria", "Taiwan", "Tajikistan", "Tanzania", "Thailand", "Togo", "Tonga", "Trinidad and Tobago", "Tunisia", 
-        "Turkey", "Turkmenistan", "Tuvalu", "Uganda", "Ukraine", "United Arab Emirates", "United Kingdom", "USA", 
-        "United States", "Uruguay", "Uzbekistan", "Vanuatu", "Vatican City", "Venezuela", "Vietnam", "Yemen", 
-        "Zambia", "Zimbabwe"
-    ]
-    
-    # Check for country names in the content
-    for country in countries:
-        if country in content or country.lower() in content.lower():
-            return country
-    
-    # Check for country codes in the content
-    country_codes = {
-        "US": "United States", "GB": "United Kingdom", "UK": "United Kingdom", "CA": "Canada", 
-        "AU": "Australia", "DE": "Germany", "FR": "France", "JP": "Japan", "CN": "China", 
-        "RU": "Russia", "BR": "Brazil", "IN": "India", "MX": "Mexico", "ES": "Spain", 
-        "IT": "Italy", "NL": "Netherlands", "CH": "Switzerland", "SE": "Sweden", "NO": "Norway"
-    }
-    
-    for code, country in country_codes.items():
-        if f" {code} " in f" {content} " or f" {code}," in content or f" {code}." in content:
-            return country
-    
-    # Check for shipping information
-    shipping_elements = soup.find_all(text=lambda text: text and "shipping" in text.lower())
-    for element in shipping_elements:
-        for country in countries:
-            if country in element or country.lower() in element.lower():
-                return country
-    
-    # If no country found, return Unknown
-    return "Unknown"
+    return locate(content).get("country", "Unknown")
 
 def search_onion_directory(keywords):
     """Search for .onion sites related to the keywords"""
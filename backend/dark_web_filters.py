@@ -1,35 +1,19 @@
-import random
+import os
+import sys
+
+# Shared deterministic scoring engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dark_web_scripts.scoring import score_page
+from dark_web_scripts.enrichment_cache import cached_score_site
+from dark_web_scripts.gazetteer import locate
+from dark_web_scripts.keyword_sets import get_keyword_set
+from dark_web_scripts import batch_filters
 
 def calculate_risk_score(text, keywords=None):
-    """Calculate risk score based on NLP-inspired keyword analysis"""
-    if not text or not keywords:
-        return 30  # Default low risk
-    
-    # Define risk categories
-    high_risk_terms = ["arms", "murder", "drugs", "weapons", "hitman", "fentanyl", "heroin", "cocaine", "assassination"]
-    medium_risk_terms = ["fraud", "hack", "counterfeit", "fake", "stolen", "illegal", "scam", "phishing"]
-    low_risk_terms = ["forum", "chat", "anonymous", "privacy", "secure", "discussion", "community"]
-    
-    # Convert text to lowercase for case-insensitive matching
-    text_lower = text.lower()
-    
-    # Check for high risk terms
-    for term in high_risk_terms:
-        if term in text_lower:
-            return 90 + (10 * random.random())  # 90-100 range
-    
-    # Check for medium risk terms
-    for term in medium_risk_terms:
-        if term in text_lower:
-            return 60 + (30 * random.random())  # 60-90 range
-    
-    # Check for low risk terms
-    for term in low_risk_terms:
-        if term in text_lower:
-            return 30 + (30 * random.random())  # 30-60 range
-    
-    # Default score
-    return 10 + (20 * random.random())  # 10-30 range
+    """Calculate a deterministic risk score (0-100) for text with the shared scoring engine"""
+    if not text:
+        return 0
+    return score_page(content=text)["risk_score"]
 
 def detect_country_from_keywords(keywords):
     """Estimate country origin from keywords"""
@@ -56,18 +40,61 @@ def detect_country_from_keywords(keywords):
 
 def detect_seller(text):
     """Detect if the page is from a seller based on text content"""
-    seller_indicators = ["sell", "price", "shipping", "vendor", "shop", "store", "payment", "bitcoin", "btc", "monero", "xmr"]
-    
     if not text:
         return False
+    return score_page(content=text)["is_seller"]
+
+def enrich_data(crawled_data, keywords=None):
+    """
+    Add risk_score, is_seller, category and location fields to crawled records that
+    haven't been scored yet. Returns the records unchanged if the first one already has
+    a risk_score, otherwise enriched copies.
+    """
+    if not crawled_data or 'risk_score' in crawled_data[0]:
+        return crawled_data
+    
+    enriched_data = []
+    # Every record of this batch is scored with the same keyword set
+    keyword_set = get_keyword_set()
+    
+    for site_data in crawled_data:
+        # Risk, seller, category and location from one pass of the scoring engine,
+        # or from the enrichment cache if this record's text was scored before
+        scores = cached_score_site(site_data, keyword_set=keyword_set)
+        risk_score = scores['risk_score']
+        
+        # Detect country if not already present
+        detected_country = site_data.get('country') or scores.get('country')
+        if not detected_country and keywords:
+            detected_country = detect_country_from_keywords(keywords)
+        
+        # Detect if it's a seller
+        is_seller = site_data.get('is_seller', scores['is_seller'])
+        
+        # Detect category if not already present
+        detected_category = site_data.get('category') or scores['category']
+        
+        # Extract location details
+        location_details = {field: scores[field] for field in ('state', 'district') if field in scores}
+        
+        # Enrich the data
+        enriched_site_data = site_data.copy()
+        enriched_site_data['risk_score'] = risk_score
+        if detected_country:
+            enriched_site_data['country'] = detected_country
+        enriched_site_data['is_seller'] = is_seller
+        if detected_category:
+            enriched_site_data['category'] = detected_category
+        
+        # Add location details
+        if location_details.get('state'):
+            enriched_site_data['state'] = location_details['state']
+        if location_details.get('district'):
+            enriched_site_data['district'] = location_details['district']
+        
+        enriched_data.append(enriched_site_data)
     
-    text_lower = text.lower()
-    
-    for indicator in seller_indicators:
-        if indicator in text_lower:
-            return True
-    
-    return False
+    return enriched_data
 
 def filter_data(crawled_data, keywords=None, geo_location=None, date_range=None, risk_threshold=None, 
              seller_only=False, country=None, state=None, district=None, category=None):
@@ -92,52 +119,12 @@ def filter_data(crawled_data, keywords=None, geo_location=None, date_range=None,
         return []
     
     # First, enrich the data if needed
-    if 'risk_score' not in crawled_data[0]:
-        enriched_data = []
-        
-        for site_data in crawled_data:
-            # Calculate risk score based on title and description
-            combined_text = f"{site_data.get('title', '')} {site_data.get('description', '')}"
-            risk_score = calculate_risk_score(combined_text, keywords)
-            
-            # Detect country if not already present
-            detected_country = site_data.get('country')
-            if not detected_country and keywords:
-                detected_country = detect_country_from_keywords(keywords)
-            
-            # Detect if it's a seller
-            is_seller = site_data.get('is_seller', detect_seller(combined_text))
-            
-            # Detect category if not already present
-            detected_category = site_data.get('category')
-            if not detected_category:
-                detected_category = detect_category(combined_text)
-            
-            # Extract location details
-            location_details = extract_location_details(site_data.get('description', ''), detected_country)
-            
-            # Enrich the data
-            enriched_site_data = site_data.copy()
-            enriched_site_data['risk_score'] = risk_score
-            if detected_country:
-                enriched_site_data['country'] = detected_country
-            enriched_site_data['is_seller'] = is_seller
-            if detected_category:
-                enriched_site_data['category'] = detected_category
-            
-            # Add location details
-            if location_details.get('state'):
-                enriched_site_data['state'] = location_details['state']
-            if location_details.get('district'):
-                enriched_site_data['district'] = location_details['district']
-            
-            enriched_data.append(enriched_site_data)
-        
-        # Use the enriched data for filtering
-        data_to_filter = enriched_data
-    else:
-        # Use the original data for filtering
-        data_to_filter = crawled_data
+    data_to_filter = enrich_data(crawled_data, keywords)
+    
+    # Large result sets are filtered with column-wise masks
+    if batch_filters.PANDAS_AVAILABLE and len(data_to_filter) >= batch_filters.BATCH_MIN_RECORDS:
+        return batch_filters.filter_data_batch(data_to_filter, keywords, geo_location, date_range, risk_threshold,
+                                               seller_only, country, state, district, category)
     
     # Now apply all the filters
     filtered_data = []
@@ -206,93 +193,10 @@ def detect_category(text):
     """Detect the category of content based on text"""
     if not text:
         return None
-    
-    text_lower = text.lower()
-    
-    # Define category keywords
-    categories = {
-        'drugs': ['drug', 'cocaine', 'heroin', 'mdma', 'ecstasy', 'lsd', 'marijuana', 'cannabis', 'weed', 'pills', 'pharmacy'],
-        'weapons': ['weapon', 'gun', 'rifle', 'pistol', 'ammunition', 'firearm', 'explosive', 'knife', 'tactical'],
-        'hacking': ['hack', 'exploit', 'vulnerability', 'malware', 'ransomware', 'ddos', 'phishing', 'botnet'],
-        'counterfeit': ['counterfeit', 'fake', 'replica', 'clone', 'copy', 'forgery', 'document', 'passport', 'id card'],
-        'financial': ['credit card', 'bank account', 'paypal', 'bitcoin', 'cryptocurrency', 'money laundering', 'finance'],
-        'data': ['data', 'database', 'breach', 'leak', 'personal information', 'identity', 'account', 'password'],
-        'services': ['service', 'hire', 'rent', 'contract', 'hitman', 'hacker', 'escort']
-    }
-    
-    # Check each category
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                return category
-    
-    return 'other'
+    return score_page(content=text)["category"]
 
 def extract_location_details(text, country=None):
     """Extract state and district information from text"""
     if not text:
         return {}
-    
-    # This is a simplified implementation
-    # In a real app, you would use NLP or a location database
-    
-    # Define some common states/regions and districts/cities
-    location_data = {
-        'USA': {
-            'states': {
-                'California': ['Los Angeles', 'San Francisco', 'San Diego', 'Sacramento'],
-                'New York': ['New York City', 'Buffalo', 'Albany', 'Rochester'],
-                'Texas': ['Austin', 'Houston', 'Dallas', 'San Antonio'],
-                'Florida': ['Miami', 'Orlando', 'Tampa', 'Jacksonville']
-            }
-        },
-        'Russia': {
-            'states': {
-                'Moscow Oblast': ['Moscow', 'Khimki', 'Podolsk'],
-                'Saint Petersburg': ['Saint Petersburg', 'Pushkin', 'Peterhof']
-            }
-        },
-        'Germany': {
-            'states': {
-                'Bavaria': ['Munich', 'Nuremberg', 'Augsburg'],
-                'Berlin': ['Berlin'],
-                'North Rhine-Westphalia': ['Cologne', 'Düsseldorf', 'Dortmund']
-            }
-        }
-    }
-    
-    result = {}
-    text_lower = text.lower()
-    
-    # If country is provided, only check that country's locations
-    if country and country in location_data:
-        for state, cities in location_data[country]['states'].items():
-            if state.lower() in text_lower:
-                result['state'] = state
-                
-                # Check for cities in this state
-                for city in cities:
-                    if city.lower() in text_lower:
-                        result['district'] = city
-                        break
-    else:
-        # Check all countries
-        for country_name, country_info in location_data.items():
-            for state, cities in country_info['states'].items():
-                if state.lower() in text_lower:
-                    result['state'] = state
-                    result['country'] = country_name
-                    
-                    # Check for cities in this state
-                    for city in cities:
-                        if city.lower() in text_lower:
-                            result['district'] = city
-                            break
-                    
-                    if 'district' in result:
-                        break
-            
-            if 'state' in result:
-                break
-    
-    return result
+    return locate(text, country)
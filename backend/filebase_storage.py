@@ -6,6 +6,7 @@ a decentralized storage platform built on IPFS, Sia, or Filecoin.
 
 import os
 import json
+import bisect
 import time
 import uuid
 import requests
@@ -81,42 +82,37 @@ def save_to_filebase(data, data_type='crawl_results'):
             filename = f"{data_type}_{data_id}.json"
             
             # Use boto3 to upload to Filebase (S3-compatible API)
-            try:
-                # Create an S3 client with Filebase endpoint
-                s3_client = boto3.client(
-                    's3',
-                    endpoint_url=FILEBASE_ENDPOINT,
-                    aws_access_key_id=FILEBASE_ACCESS_KEY,
-                    aws_secret_access_key=FILEBASE_SECRET_KEY,
-                    config=Config(signature_version='s3v4')
-                )
-                
-                # Upload the file
-                response = s3_client.put_object(
-                    Bucket=FILEBASE_BUCKET,
-                    Key=filename,
-                    Body=json_data,
-                    ContentType='application/json'
-                )
-                
-                logger.info(f"Successfully saved to Filebase: {filename}")
-                
-                # Get the ETag (entity tag) which can be used as a CID
-                cid = response.get('ETag', '').strip('"')
-                
-                return {
-                    'success': True,
-                    'storage': 'filebase',
-                    'id': data_id,
-                    'filename': filename,
-                    'cid': cid,
-                    'url': f"{FILEBASE_ENDPOINT}/{FILEBASE_BUCKET}/{filename}",
-                    'timestamp': timestamp
-                }
-            else:
-                logger.error(f"Failed to save to Filebase: {response.status_code}, {response.text}")
-                # Fall back to local storage
-                return _save_to_local_storage(json_data, data_type, data_id, timestamp)
+            # Create an S3 client with Filebase endpoint
+            s3_client = boto3.client(
+                's3',
+                endpoint_url=FILEBASE_ENDPOINT,
+                aws_access_key_id=FILEBASE_ACCESS_KEY,
+                aws_secret_access_key=FILEBASE_SECRET_KEY,
+                config=Config(signature_version='s3v4')
+            )
+            
+            # Upload the file
+            response = s3_client.put_object(
+                Bucket=FILEBASE_BUCKET,
+                Key=filename,
+                Body=json_data,
+                ContentType='application/json'
+            )
+            
+            logger.info(f"Successfully saved to Filebase: {filename}")
+            
+            # Get the ETag (entity tag) which can be used as a CID
+            cid = response.get('ETag', '').strip('"')
+            
+            return {
+                'success': True,
+                'storage': 'filebase',
+                'id': data_id,
+                'filename': filename,
+                'cid': cid,
+                'url': f"{FILEBASE_ENDPOINT}/{FILEBASE_BUCKET}/{filename}",
+                'timestamp': timestamp
+            }
                 
         except Exception as e:
             logger.error(f"Error saving to Filebase: {e}")
@@ -179,31 +175,26 @@ def get_from_filebase(data_id, data_type='crawl_results'):
             logger.info(f"Retrieving data from Filebase: {data_type}, {data_id}")
             
             # Use boto3 to download from Filebase (S3-compatible API)
-            try:
-                # Create an S3 client with Filebase endpoint
-                s3_client = boto3.client(
-                    's3',
-                    endpoint_url=FILEBASE_ENDPOINT,
-                    aws_access_key_id=FILEBASE_ACCESS_KEY,
-                    aws_secret_access_key=FILEBASE_SECRET_KEY,
-                    config=Config(signature_version='s3v4')
-                )
-                
-                # Download the file
-                response = s3_client.get_object(
-                    Bucket=FILEBASE_BUCKET,
-                    Key=filename
-                )
-                
-                # Read the content
-                content = response['Body'].read().decode('utf-8')
-                
-                logger.info(f"Successfully retrieved from Filebase: {filename}")
-                return json.loads(content)
-            else:
-                logger.warning(f"Failed to retrieve from Filebase: {response.status_code}")
-                # Fall back to local storage
-                return _get_from_local_storage(data_id, data_type)
+            # Create an S3 client with Filebase endpoint
+            s3_client = boto3.client(
+                's3',
+                endpoint_url=FILEBASE_ENDPOINT,
+                aws_access_key_id=FILEBASE_ACCESS_KEY,
+                aws_secret_access_key=FILEBASE_SECRET_KEY,
+                config=Config(signature_version='s3v4')
+            )
+            
+            # Download the file
+            response = s3_client.get_object(
+                Bucket=FILEBASE_BUCKET,
+                Key=filename
+            )
+            
+            # Read the content
+            content = response['Body'].read().decode('utf-8')
+            
+            logger.info(f"Successfully retrieved from Filebase: {filename}")
+            return json.loads(content)
                 
         except Exception as e:
             logger.error(f"Error retrieving from Filebase: {e}")
@@ -236,13 +227,14 @@ def _get_from_local_storage(data_id, data_type):
         logger.error(f"Error retrieving from local storage: {e}")
         return None
 
-def list_filebase_data(data_type='crawl_results', limit=100):
+def list_filebase_data(data_type='crawl_results', limit=100, after=None):
     """
     List data stored in Filebase (or local storage)
     
     Args:
         data_type: Type of data to list
         limit: Maximum number of items to return
+        after: Filename of the last item of the previous page, to continue the listing
         
     Returns:
         list: List of data items with metadata
@@ -253,61 +245,55 @@ def list_filebase_data(data_type='crawl_results', limit=100):
             logger.info(f"Listing data from Filebase: {data_type}")
             
             # Use boto3 to list objects from Filebase (S3-compatible API)
-            try:
-                # Create an S3 client with Filebase endpoint
-                s3_client = boto3.client(
-                    's3',
-                    endpoint_url=FILEBASE_ENDPOINT,
-                    aws_access_key_id=FILEBASE_ACCESS_KEY,
-                    aws_secret_access_key=FILEBASE_SECRET_KEY,
-                    config=Config(signature_version='s3v4')
-                )
-                
-                # List objects with the prefix
-                response = s3_client.list_objects_v2(
-                    Bucket=FILEBASE_BUCKET,
-                    Prefix=f"{data_type}_",
-                    MaxKeys=limit
-                )
-                
-                # Extract the object keys
-                items = []
-                if 'Contents' in response:
-                    for obj in response['Contents']:
-                        key = obj['Key']
-                        last_modified = obj['LastModified'].isoformat()
-                        size = obj['Size']
-                        
-                        # Extract the data_id from the key
-                        data_id = key.split('_', 1)[1].split('.', 1)[0]
-                        
-                        items.append({
-                            'id': data_id,
-                            'filename': key,
-                            'last_modified': last_modified,
-                            'size': size,
-                            'storage': 'filebase',
-                            'url': f"{FILEBASE_ENDPOINT}/{FILEBASE_BUCKET}/{key}"
-                        })
-                
-                logger.info(f"Successfully listed {len(items)} items from Filebase")
-                return items
-            else:
-                logger.warning(f"Failed to list from Filebase: {response.status_code}")
-                # Fall back to local storage
-                return _list_local_storage(data_type, limit)
+            # Create an S3 client with Filebase endpoint
+            s3_client = boto3.client(
+                's3',
+                endpoint_url=FILEBASE_ENDPOINT,
+                aws_access_key_id=FILEBASE_ACCESS_KEY,
+                aws_secret_access_key=FILEBASE_SECRET_KEY,
+                config=Config(signature_version='s3v4')
+            )
+            
+            # List objects with the prefix, continuing after the previous page
+            list_args = {'Bucket': FILEBASE_BUCKET, 'Prefix': f"{data_type}_", 'MaxKeys': limit}
+            if after:
+                list_args['StartAfter'] = after
+            response = s3_client.list_objects_v2(**list_args)
+            
+            # Extract the object keys
+            items = []
+            if 'Contents' in response:
+                for obj in response['Contents']:
+                    key = obj['Key']
+                    last_modified = obj['LastModified'].isoformat()
+                    size = obj['Size']
+                    
+                    # Extract the data_id from the key
+                    data_id = key.split('_', 1)[1].split('.', 1)[0]
+                    
+                    items.append({
+                        'id': data_id,
+                        'filename': key,
+                        'last_modified': last_modified,
+                        'size': size,
+                        'storage': 'filebase',
+                        'url': f"{FILEBASE_ENDPOINT}/{FILEBASE_BUCKET}/{key}"
+                    })
+            
+            logger.info(f"Successfully listed {len(items)} items from Filebase")
+            return items
                 
         except Exception as e:
             logger.error(f"Error listing from Filebase: {e}")
             # Fall back to local storage
-            return _list_local_storage(data_type, limit)
+            return _list_local_storage(data_type, limit, after)
     else:
         # Use local storage
         logger.info(f"Filebase not configured, listing from local storage: {data_type}")
-        return _list_local_storage(data_type, limit)
+        return _list_local_storage(data_type, limit, after)
 
-def _list_local_storage(data_type, limit=100):
-    """List data stored in local storage"""
+def _list_local_storage(data_type, limit=100, after=None):
+    """List data stored in local storage by filename (the order S3 lists keys in), continuing after the file named after"""
     try:
         # Create the directory path
         storage_dir = LOCAL_STORAGE_DIR / data_type
@@ -317,9 +303,12 @@ def _list_local_storage(data_type, limit=100):
             logger.warning(f"Directory not found in local storage: {storage_dir}")
             return []
         
-        # List files
+        # List files by name, so a page continues after its cursor even if that file was deleted
+        files = sorted(storage_dir.glob(f"{data_type}_*.json"), key=lambda path: path.name)
+        if after:
+            files = files[bisect.bisect_right([path.name for path in files], after):]
         items = []
-        for file_path in sorted(storage_dir.glob(f"{data_type}_*.json"), key=os.path.getmtime, reverse=True)[:limit]:
+        for file_path in files[:limit]:
             # Extract the data_id from the filename
             filename = file_path.name
             data_id = filename.split('_', 1)[1].split('.', 1)[0]
@@ -361,27 +350,23 @@ def delete_from_filebase(data_id, data_type='crawl_results'):
             logger.info(f"Deleting data from Filebase: {data_type}, {data_id}")
             
             # Use boto3 to delete from Filebase (S3-compatible API)
-            try:
-                # Create an S3 client with Filebase endpoint
-                s3_client = boto3.client(
-                    's3',
-                    endpoint_url=FILEBASE_ENDPOINT,
-                    aws_access_key_id=FILEBASE_ACCESS_KEY,
-                    aws_secret_access_key=FILEBASE_SECRET_KEY,
-                    config=Config(signature_version='s3v4')
-                )
-                
-                # Delete the object
-                response = s3_client.delete_object(
-                    Bucket=FILEBASE_BUCKET,
-                    Key=filename
-                )
-                
-                logger.info(f"Successfully deleted from Filebase: {filename}")
-                return True
-            else:
-                logger.warning(f"Failed to delete from Filebase: {response.status_code}")
-                return False
+            # Create an S3 client with Filebase endpoint
+            s3_client = boto3.client(
+                's3',
+                endpoint_url=FILEBASE_ENDPOINT,
+                aws_access_key_id=FILEBASE_ACCESS_KEY,
+                aws_secret_access_key=FILEBASE_SECRET_KEY,
+                config=Config(signature_version='s3v4')
+            )
+            
+            # Delete the object
+            response = s3_client.delete_object(
+                Bucket=FILEBASE_BUCKET,
+                Key=filename
+            )
+            
+            logger.info(f"Successfully deleted from Filebase: {filename}")
+            return True
                 
         except Exception as e:
             logger.error(f"Error deleting from Filebase: {e}")
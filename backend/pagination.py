@@ -0,0 +1,88 @@
+"""
+Cursor pagination and field projection for list endpoints.
+A cursor is an opaque, URL-safe token holding where the previous page ended and
+which listing it belongs to, so a client simply passes back the next_cursor it
+received. fields= keeps only the named fields of every item; a dotted name such as
+products.title selects inside nested objects and lists of objects.
+"""
+import json
+import base64
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(state):
+    """Opaque token for a cursor state dict"""
+    raw = json.dumps(state, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, scope=None):
+    """
+    Cursor state of a token, or None for an empty token. Raises ValueError if the
+    token is malformed or belongs to a different listing than scope.
+    """
+    if not token:
+        return None
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    if scope is not None and state.get('scope') != scope:
+        raise ValueError("Cursor belongs to a different listing")
+    return state
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Requested page size, clamped to 1..MAX_PAGE_SIZE"""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+def parse_fields(fields):
+    """
+    Field tree of a fields= value ("a,b.c" or a list of names): {"a": None, "b": {"c": None}},
+    or None to keep every field
+    """
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    tree = {}
+    for name in fields:
+        parts = [part.strip() for part in str(name).split('.') if part.strip()]
+        node = tree
+        for position, part in enumerate(parts):
+            last = position == len(parts) - 1
+            if last:
+                node[part] = None
+            elif node.get(part, {}) is None:
+                break  # the whole field is already selected
+            else:
+                node = node.setdefault(part, {})
+    return tree or None
+
+def project(value, tree):
+    """Keep only the fields of tree in a dict, or in every dict of a list"""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {name: project(value[name], subtree) for name, subtree in tree.items() if name in value}
+
+def paginate(items, limit, cursor=None, scope=None):
+    """
+    One page of a list whose order doesn't change between requests: returns
+    (page, next_cursor), next_cursor being None on the last page
+    """
+    state = decode_cursor(cursor, scope)
+    try:
+        offset = max(int(state.get('offset', 0)), 0) if state else 0
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    page = items[offset:offset + limit]
+    end = offset + len(page)
+    next_cursor = encode_cursor({'scope': scope, 'offset': end}) if end < len(items) else None
+    return page, next_cursor
@@ -0,0 +1,123 @@
+"""
+Request-level cache for expensive API calls (crawls, archive and IP lookups).
+Responses are cached under a key made from the request's normalized parameters,
+for a configurable TTL and up to a maximum number of entries (least recently
+used first out). Concurrent identical requests are coalesced: the first one
+computes the response and the others wait for it instead of repeating the work.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+from logger import get_logger
+
+cache_logger = get_logger('request_cache')
+
+REQUEST_CACHE_SIZE = int(os.getenv('REQUEST_CACHE_SIZE', 256))  # entries per cache
+
+def normalize_url(url):
+    """URL with surrounding whitespace, scheme/host case, fragment and trailing slash normalized"""
+    url = (url or '').strip()
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url.rstrip('/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+
+def normalize_terms(value):
+    """A comma-separated string or list of terms as a sorted list of distinct lowercase terms"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return sorted({str(term).strip().lower() for term in value if str(term).strip()})
+
+class _Call:
+    """A computation in flight, shared by every request waiting for the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class RequestCache:
+    """TTL + LRU cache of computed responses with singleflight coalescing"""
+
+    def __init__(self, name, ttl, max_entries=REQUEST_CACHE_SIZE):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.shared = 0
+
+    @staticmethod
+    def key(params):
+        """Cache key of a dict of (already normalized) parameters"""
+        raw = json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get_or_compute(self, params, compute, cacheable=None):
+        """
+        Cached value for params, or compute() run once for every concurrent caller with
+        the same params. The result is cached unless cacheable(value) is false; an
+        exception is raised in every waiting caller and nothing is cached.
+        """
+        key = self.key(params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = compute()
+            if self.ttl > 0 and (cacheable is None or cacheable(call.value)):
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + self.ttl, call.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": len(self._calls),
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "ttl": self.ttl
+            }
@@ -6,6 +6,8 @@ import pandas as pd
 import uuid
 import time
 import json
+import io
+import tempfile
 
 # Simulated GeoIP database path
 GEOIP2_DATABASE = '/path/to/GeoLite2-City.mmdb'
@@ -374,52 +376,68 @@ def get_ip_details(site_url):
             'message': f'Error getting IP details: {str(e)}'
         }
 
-def export_to_csv(data):
-    """Export data to CSV file"""
-    if not data:
-        raise ValueError("No data to export")
-    
-    # Create export directory if it doesn't exist
-    export_dir = os.path.join(os.path.dirname(__file__), 'exports')
-    if not os.path.exists(export_dir):
-        os.makedirs(export_dir)
-    
-    # Generate a unique filename
-    filename = f"dark_web_export_{int(time.time())}.csv"
-    filepath = os.path.join(export_dir, filename)
-    
-    # Write data to CSV
-    with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-        # Get all possible field names from the data
-        fieldnames = set()
-        for item in data:
-            fieldnames.update(item.keys())
-        
-        writer = csv.DictWriter(csvfile, fieldnames=sorted(fieldnames))
-        writer.writeheader()
-        writer.writerows(data)
-    
-    return filepath
+# Columns of CSV/Excel exports, in order; any other fields of a record go into "extra" as JSON
+EXPORT_FIELDS = [
+    'id', 'url', 'title', 'description', 'content_sample', 'risk_score', 'risk_level',
+    'risk_categories', 'category', 'country', 'state', 'district', 'is_seller',
+    'found_keywords', 'date_detected', 'archive_link', 'ip_info'
+]
+EXPORT_CHUNK_ROWS = 1000  # CSV rows sent per chunk
+EXCEL_MAX_CELL_LENGTH = 32767  # longest text an Excel cell can hold
 
-def export_to_excel(data):
-    """Export data to Excel file"""
-    if not data:
-        raise ValueError("No data to export")
-    
-    # Create export directory if it doesn't exist
-    export_dir = os.path.join(os.path.dirname(__file__), 'exports')
-    if not os.path.exists(export_dir):
-        os.makedirs(export_dir)
-    
-    # Generate a unique filename
-    filename = f"dark_web_export_{int(time.time())}.xlsx"
-    filepath = os.path.join(export_dir, filename)
+def export_row(record, fields=EXPORT_FIELDS):
+    """Cell values of a record for the export columns, nested values as JSON"""
+    row = []
+    for field in fields:
+        value = record.get(field)
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        row.append(value)
+    extra = {key: value for key, value in record.items() if key not in fields}
+    row.append(json.dumps(extra) if extra else None)
+    return row
+
+def iter_csv_export(records, fields=EXPORT_FIELDS):
+    """
+    Yield a CSV export of records (any iterable) as UTF-8 chunks, starting with the
+    header, so it can be sent while the records are still being read
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(fields) + ['extra'])
+    for count, record in enumerate(records, 1):
+        writer.writerow(export_row(record, fields))
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def iter_excel_export(records, fields=EXPORT_FIELDS, chunk_size=1 << 16):
+    """
+    Yield an Excel export of records in chunks. Rows go into a write-only workbook,
+    so memory use doesn't grow with the number of records; the workbook is saved to
+    an anonymous temporary file that disappears once it has been sent.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
     
-    # Convert to DataFrame and export to Excel
-    df = pd.DataFrame(data)
-    df.to_excel(filepath, index=False)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Dark Web Data')
+    sheet.append(list(fields) + ['extra'])
+    for record in records:
+        row = export_row(record, fields)
+        sheet.append([ILLEGAL_CHARACTERS_RE.sub('', value)[:EXCEL_MAX_CELL_LENGTH] if isinstance(value, str) else value
+                      for value in row])
     
-    return filepath
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
 
 def save_to_filebase(data, data_type='crawl_results'):
     """
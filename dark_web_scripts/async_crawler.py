@@ -0,0 +1,253 @@
+"""
+Asyncio crawl engine for the Dark Web crawler.
+Keeps many fetches in flight over Tor while still honouring the per-domain crawl delay,
+and returns the same result dicts as tor_crawler.crawl_dark_web.
+"""
+import asyncio
+import datetime
+import logging
+import os
+import random
+
+# Optional dependencies for the async engine
+try:
+    import aiohttp
+    from aiohttp_socks import ProxyConnector
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+from dark_web_scripts.tor_crawler import (
+    CRAWL_DELAY, MAX_DEPTH, MAX_DOMAIN_DEPTH, MAX_PAGES_PER_SITE, USER_AGENTS, ILLEGAL_KEYWORDS, SEED_URLS,
+    normalize_url, is_valid_url, process_page, is_relevant_result, attach_ip_info, scheduler_room,
+    log_crawl_stats
+)
+from dark_web_scripts.circuit_pool import TorCircuitPool
+from dark_web_scripts.keyword_sets import get_keyword_set
+from dark_web_scripts.crawl_frontier import CrawlFrontier
+from dark_web_scripts.politeness import PolitenessScheduler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('async_crawler')
+
+# Constants
+DEFAULT_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', 100))
+REQUEST_TIMEOUT = 30  # seconds, same as the synchronous crawler
+IDLE_POLL_INTERVAL = 0.5  # seconds a worker waits when no domain is ready
+
+def _error_result(url, error):
+    """Build an error result in the same shape as scrape_onion_site"""
+    return {
+        "url": url,
+        "error": error,
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+
+class CircuitSessions:
+    """
+    One aiohttp session per Tor circuit generation. A rotated circuit's session is
+    closed once the pool no longer has that generation in use, so requests still in
+    flight on a draining circuit keep their session.
+    """
+
+    def __init__(self, pool, limit_per_circuit):
+        self.pool = pool
+        self.limit_per_circuit = limit_per_circuit
+        self.sessions = {}  # (circuit index, generation) -> ClientSession
+
+    async def get(self, circuit):
+        """Return the session for a circuit's current generation"""
+        key = (circuit.index, circuit.generation)
+        if key in self.sessions:
+            return self.sessions[key]
+
+        # aiohttp_socks resolves hostnames through the proxy with rdns=True
+        proxy_url = circuit.proxy_url.replace('socks5h://', 'socks5://', 1)
+        connector = ProxyConnector.from_url(proxy_url, rdns=True, limit=self.limit_per_circuit)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        self.sessions[key] = session
+        return session
+
+    async def prune(self):
+        """Close the sessions of circuit generations the pool has retired"""
+        live = self.pool.generations()
+        for key in [key for key in self.sessions if key not in live]:
+            await self.sessions.pop(key).close()
+
+    async def close(self):
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+
+async def fetch_page(session, url):
+    """Fetch a single page, returning (status_code, text)"""
+    headers = {
+        'User-Agent': random.choice(USER_AGENTS)
+    }
+    async with session.get(url, headers=headers) as response:
+        text = await response.text(errors='replace')
+        return response.status, text
+
+async def scrape_onion_site_async(session, url, depth, keywords, keyword_set=None):
+    """Async counterpart of tor_crawler.scrape_onion_site (politeness is handled by the scheduler)"""
+    if not is_valid_url(url):
+        logger.error(f"Invalid URL format: {url}")
+        return _error_result(url, f"Invalid URL format: {url}")
+
+    try:
+        logger.info(f"Scraping {url}")
+        status, html = await fetch_page(session, url)
+
+        if status != 200:
+            logger.warning(f"Failed to retrieve {url}, Status code: {status}")
+            return _error_result(url, f"HTTP {status}")
+
+        # Parsing and scoring are CPU bound, keep them off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, process_page, url, html, depth, keywords, keyword_set)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error scraping {url}: {e}")
+        return _error_result(url, str(e) or e.__class__.__name__)
+    except Exception as e:
+        logger.error(f"Unexpected error scraping {url}: {e}")
+        return _error_result(url, f"Unexpected error: {str(e)}")
+
+async def async_crawl_dark_web(start_urls=None, max_pages=100, keywords=None,
+                               enable_ip_detection=True, concurrency=None, circuit_pool=None,
+                               crawl_id=None, domain_delays=None, max_pages_per_site=MAX_PAGES_PER_SITE,
+                               domain_weights=None, keyword_set=None, progress=None, cancel_event=None,
+                               on_result=None):
+    """
+    Crawl the Dark Web with many concurrent fetches. on_result, progress and
+    cancel_event work as in tor_crawler.crawl_dark_web; fetches already in flight
+    finish on cancel.
+    """
+    if not AIOHTTP_AVAILABLE:
+        raise RuntimeError("aiohttp and aiohttp_socks are required for the async crawl engine")
+
+    if not start_urls:
+        start_urls = SEED_URLS
+
+    if keywords is None:
+        keywords = ILLEGAL_KEYWORDS
+
+    # Score the whole crawl with one keyword set, even if the file is reloaded meanwhile
+    if keyword_set is None:
+        keyword_set = get_keyword_set()
+
+    if not concurrency:
+        concurrency = DEFAULT_CONCURRENCY
+
+    # Workers share the pool's circuits; each worker sticks to its own circuit
+    owns_pool = circuit_pool is None
+    if owns_pool:
+        circuit_pool = TorCircuitPool()
+    sessions = CircuitSessions(circuit_pool, limit_per_circuit=-(-concurrency // len(circuit_pool)))
+
+    loop = asyncio.get_running_loop()
+    frontier = CrawlFrontier(crawl_id, max_pages=max_pages, max_pages_per_domain=max_pages_per_site,
+                             max_domain_depth=MAX_DOMAIN_DEPTH, domain_weights=domain_weights)
+    scheduler = PolitenessScheduler(default_delay=CRAWL_DELAY, delay_overrides=domain_delays)
+    results = []
+    pages_crawled = frontier.pages_crawled
+    active = 0
+
+    frontier.add_many([(normalize_url(url), 0) for url in start_urls])  # (url, depth)
+    fill_lock = asyncio.Lock()
+
+    async def fill_scheduler():
+        """
+        Move a batch of ready URLs from the frontier into the politeness scheduler.
+        The claim runs in a thread so fetches in flight keep going, and one worker
+        claims at a time.
+        """
+        async with fill_lock:
+            room = scheduler_room(scheduler)
+            if not room:
+                return False
+            claimed = await loop.run_in_executor(None, frontier.claim, room)
+        for url, depth in claimed:
+            scheduler.push(url, depth)
+        return bool(claimed)
+
+    async def worker(worker_id):
+        nonlocal pages_crawled, active
+        while pages_crawled < max_pages and not (cancel_event and cancel_event.is_set()):
+            # Get next URL from a domain whose crawl delay has elapsed
+            claimed = scheduler.pop()
+            if claimed is None:
+                if await fill_scheduler():
+                    continue
+                wait = scheduler.time_until_ready()
+                if wait is None and active == 0 and not frontier.has_pending():
+                    return
+                await asyncio.sleep(min(wait if wait is not None else IDLE_POLL_INTERVAL, IDLE_POLL_INTERVAL))
+                continue
+
+            url, depth = claimed
+            pages_crawled += 1
+            active += 1
+            try:
+                circuit = circuit_pool.acquire(index=worker_id)
+                try:
+                    session = await sessions.get(circuit)
+                    start_time = loop.time()
+                    result = await scrape_onion_site_async(session, url, depth, keywords, keyword_set)
+                    success = "error" not in result
+                    circuit_pool.release(circuit, loop.time() - start_time, success)
+                except BaseException:
+                    circuit_pool.release(circuit)
+                    scheduler.release(url, False)
+                    # Synchronous: a cancelled worker may not get to await an executor call
+                    frontier.requeue(url)
+                    raise
+                await sessions.prune()
+
+                # Frontier writes commit to SQLite, keep them off the event loop
+                scheduler.release(url, success)
+                await loop.run_in_executor(None, frontier.mark_done if success else frontier.mark_failed, url)
+
+                if is_relevant_result(result):
+                    if enable_ip_detection and success:
+                        await loop.run_in_executor(None, attach_ip_info, result, url)
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+
+                # Add links to the frontier if not at max depth (already seen URLs are ignored)
+                if "links" in result and depth < MAX_DEPTH:
+                    await loop.run_in_executor(None, frontier.add_links, url, result["links"])
+
+                logger.info(f"Crawled {pages_crawled}/{max_pages} pages")
+                if progress:
+                    progress(pages_crawled, len(results))
+            finally:
+                active -= 1
+
+    workers = [asyncio.create_task(worker(i)) for i in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+
+        # URLs still buffered in memory go back to the frontier for a later resume
+        for url, _ in scheduler.drain():
+            frontier.requeue(url)
+        frontier.finish('completed' if not frontier.has_pending() else 'stopped')
+        stats = frontier.stats()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await sessions.close()
+        frontier.close()
+        if owns_pool:
+            circuit_pool.close()
+
+    log_crawl_stats(stats, results)
+    return results
+
+def run_async_crawl(**kwargs):
+    """Run the async crawl engine from synchronous code (Flask views, scripts)"""
+    return asyncio.run(async_crawl_dark_web(**kwargs))
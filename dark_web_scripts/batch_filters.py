@@ -0,0 +1,357 @@
+"""
+Batch scoring and filtering for large sets of crawled records.
+Takes a whole list (or DataFrame) of records, scores the ones the enrichment cache
+hasn't seen into a keyword-count matrix, derives risk scores and levels with column
+operations, and applies every filter as a boolean mask. Gives the same results as dark_web_filters.filter_sites and the backend's
+filter_data, which hand large inputs over to this module.
+"""
+import os
+import re
+import datetime
+import functools
+import logging
+
+# Optional dependencies for the batch path
+try:
+    import numpy as np
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+from dark_web_scripts.keyword_matcher import is_word_char
+from dark_web_scripts.keyword_sets import get_keyword_set
+from dark_web_scripts.enrichment_cache import get_enrichment_cache, risk_key, cached_signals
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('batch_filters')
+
+# Inputs at least this large are filtered with the batch path
+BATCH_MIN_RECORDS = int(os.getenv('BATCH_FILTER_MIN_RECORDS', 1000))
+
+@functools.lru_cache(maxsize=1)
+def get_risk_thresholds():
+    """(low, medium, high) risk thresholds from the environment, read once"""
+    return (
+        int(os.getenv('LOW_RISK_THRESHOLD', 30)),
+        int(os.getenv('MEDIUM_RISK_THRESHOLD', 60)),
+        int(os.getenv('HIGH_RISK_THRESHOLD', 80))
+    )
+
+@functools.lru_cache(maxsize=4)
+def _risk_layout(categories):
+    """
+    Unique risk keywords, keyword -> column, the keyword x category membership matrix,
+    category weights, and for each column the (category index, position) slots it fills;
+    categories is a tuple of (name, keywords, weight)
+    """
+    keywords = list(dict.fromkeys(
+        keyword.lower() for _, category_keywords, _ in categories for keyword in category_keywords
+    ))
+    columns = {keyword: index for index, keyword in enumerate(keywords)}
+    membership = np.zeros((len(keywords), len(categories)), dtype=np.int64)
+    slots = [[] for _ in keywords]
+    for category_index, (_, category_keywords, _) in enumerate(categories):
+        for position, keyword in enumerate(category_keywords):
+            membership[columns[keyword.lower()], category_index] += 1
+            slots[columns[keyword.lower()]].append((category_index, position))
+    weights = np.array([weight for _, _, weight in categories])
+    return keywords, columns, membership, weights, slots
+
+def risk_layout(keyword_set=None):
+    """_risk_layout for the risk categories of a keyword set (default: the current one)"""
+    risk_categories = (keyword_set or get_keyword_set()).risk_categories
+    return _risk_layout(tuple((name, tuple(data["keywords"]), data["weight"]) for name, data in risk_categories.items()))
+
+def text_column(frame, name, default=""):
+    """A string column with missing values replaced by default"""
+    if name not in frame:
+        return pd.Series(default, index=frame.index, dtype=object)
+    return frame[name].where(frame[name].notna(), default).astype(object)
+
+def keyword_counts(risk_texts, keyword_set=None):
+    """Whole-word match counts: one row per text, one column per risk keyword"""
+    keyword_set = keyword_set or get_keyword_set()
+    keywords, columns, _, _, _ = risk_layout(keyword_set)
+    counts = np.zeros((len(risk_texts), len(keywords)), dtype=np.int64)
+    if not len(risk_texts):
+        return counts
+
+    # One scan over all texts; the newline between them is a word boundary no keyword spans
+    corpus = "\n".join(risk_texts)
+    row_starts = np.cumsum([0] + [len(text) + 1 for text in risk_texts[:-1]])
+    scan = keyword_set.matcher().scan(corpus, lowered=True)
+    word_chars = word_char_mask(corpus)
+    for keyword, column in columns.items():
+        if keyword in scan.starts:
+            rows = np.searchsorted(row_starts, word_starts(scan, keyword, word_chars), side="right") - 1
+            np.add.at(counts[:, column], rows, 1)
+    return counts
+
+def word_char_mask(text):
+    """Boolean array marking the \\w characters of text, padded with False on both ends"""
+    code_points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    unique, inverse = np.unique(code_points, return_inverse=True)
+    is_word = np.array([is_word_char(chr(code_point)) for code_point in unique.tolist()], dtype=bool)
+    return np.concatenate(([False], is_word[inverse], [False]))
+
+def word_starts(scan, keyword, word_chars):
+    """KeywordScan.word_starts for the whole text, with the \\b checks done as array lookups"""
+    starts = np.asarray(scan.starts[keyword])
+    ends = starts + len(keyword)
+    # word_chars is shifted by one: word_chars[i] is text[i - 1]
+    at_start = word_chars[starts] != word_chars[starts + 1]
+    at_end = word_chars[ends] != word_chars[ends + 1]
+    starts = starts[at_start & at_end]
+    if len(starts) > 1 and np.any(np.diff(starts) < len(keyword)):
+        # Self-overlapping keyword: keep the leftmost-first, non-overlapping matches
+        kept, last_end = [], 0
+        for start in starts.tolist():
+            if start >= last_end:
+                kept.append(start)
+                last_end = start + len(keyword)
+        starts = np.asarray(kept)
+    return starts
+
+def risk_scores(counts, keyword_set=None):
+    """calculate_risk_score's scores for a keyword-count matrix, as column operations"""
+    _, _, membership, weights, _ = risk_layout(keyword_set)
+    category_counts = counts @ membership
+    category_scores = np.minimum(100, category_counts * weights / 5)
+    # Add categories in order so the float sums match calculate_risk_score exactly
+    base = np.zeros(len(counts))
+    for index, weight in enumerate(weights.tolist()):
+        base = base + category_scores[:, index] * (weight / 100)
+    return np.round(np.minimum(100, base)).astype(np.int64)
+
+def risk_levels(scores, thresholds=None):
+    """'high' / 'medium' / 'low' for each score"""
+    _, medium_risk, high_risk = thresholds or get_risk_thresholds()
+    return np.select([scores >= high_risk, scores >= medium_risk], ["high", "medium"], "low")
+
+def risk_categories(counts, keyword_set=None):
+    """calculate_risk_score's categories dict for each row of a keyword-count matrix"""
+    keyword_set = keyword_set or get_keyword_set()
+    keywords, _, _, _, slots = risk_layout(keyword_set)
+    categories = [(name, data["weight"]) for name, data in keyword_set.risk_categories.items()]
+    hits = [[] for _ in range(len(counts))]
+    rows, columns = np.nonzero(counts)
+    for row, column, count in zip(rows.tolist(), columns.tolist(), counts[rows, columns].tolist()):
+        for category_index, position in slots[column]:
+            hits[row].append((category_index, position, keywords[column], count))
+
+    all_categories = []
+    for row_hits in hits:
+        matched_categories = {}
+        for category_index, _, keyword, count in sorted(row_hits):
+            category, weight = categories[category_index]
+            matched_categories.setdefault(category, (weight, []))[1].extend([keyword] * count)
+        all_categories.append({
+            category: {"score": min(100, len(category_matches) * weight / 5), "matches": category_matches}
+            for category, (weight, category_matches) in matched_categories.items()
+        })
+    return all_categories
+
+def cached_risks(risk_texts, keyword_set=None):
+    """
+    calculate_risk_score results for lowercased risk texts. Texts already in the
+    enrichment cache are not scanned again; the rest are scored as one matrix.
+    """
+    keyword_set = keyword_set or get_keyword_set()
+    cache = get_enrichment_cache()
+    keys = [risk_key(text, keyword_set) for text in risk_texts]
+    risks = cache.get_many(keys)
+    missing = [row for row, risk in enumerate(risks) if risk is None]
+    if missing:
+        counts = keyword_counts([risk_texts[row] for row in missing], keyword_set)
+        scores = risk_scores(counts, keyword_set).tolist()
+        categories = risk_categories(counts, keyword_set)
+        for position, row in enumerate(missing):
+            risks[row] = {"score": scores[position], "categories": categories[position]}
+        cache.put_many(((keys[row], risks[row]) for row in missing), keyword_set.version)
+    return risks
+
+def score_frame(records, keyword_set=None):
+    """
+    Build a DataFrame of the records with keyword_text, risk_score and risk_level
+    columns; the calculate_risk_score result of every row is returned alongside.
+    """
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    frame = frame.reset_index(drop=True)
+    title = text_column(frame, "title")
+    description = text_column(frame, "description")
+    content = text_column(frame, "content", None)
+    has_content = content.notna()
+
+    # Same texts filter_sites builds per record
+    risk_content = content.where(has_content, description)
+    with_title = (title + " " + risk_content).str.lower()
+    risk_text = with_title.where(title.astype(bool), risk_content.str.lower()).where(risk_content.astype(bool), "")
+    frame["keyword_text"] = (content.where(has_content, "") + " " + title + " " + description).str.lower()
+
+    risks = cached_risks(risk_text.tolist(), keyword_set)
+    frame["risk_score"] = np.array([risk["score"] for risk in risks], dtype=np.int64)
+    frame["risk_level"] = risk_levels(frame["risk_score"].to_numpy())
+    return frame, risks
+
+def contains_mask(frame, field, value):
+    """True where the field is missing or contains value (case-insensitive)"""
+    if field not in frame:
+        return pd.Series(True, index=frame.index)
+    present = frame[field].notna()
+    return ~present | text_column(frame, field).str.lower().str.contains(value.lower(), regex=False)
+
+def any_keyword_mask(text, keywords):
+    """True where the (lowercased) text contains any of the keywords"""
+    pattern = "|".join(re.escape(keyword.lower()) for keyword in keywords)
+    return text.str.contains(pattern, regex=True)
+
+def _lookup_mask(column, predicate):
+    """Evaluate predicate once per distinct value of a column"""
+    results = {value: predicate(value) for value in column.dropna().unique()}
+    return column.map(results).fillna(True).astype(bool)
+
+def date_range_mask(frame, date_range):
+    """filter_sites' date check; records whose dates don't parse are kept"""
+    if "date_detected" not in frame:
+        return pd.Series(True, index=frame.index)
+
+    def in_range(value):
+        try:
+            site_date = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+            start_date = datetime.datetime.fromisoformat(date_range[0])
+            end_date = datetime.datetime.fromisoformat(date_range[1])
+            return start_date <= site_date <= end_date
+        except (ValueError, TypeError, AttributeError):
+            return True
+    return _lookup_mask(frame["date_detected"], in_range)
+
+def _site_texts(frame, rows):
+    """title + description + content for the given rows, as categorize_site builds it"""
+    texts = []
+    for row in rows:
+        text = ""
+        for field, suffix in (("title", " "), ("description", " "), ("content", "")):
+            if field in frame and frame.at[row, field] is not None and frame.at[row, field] == frame.at[row, field]:
+                text += frame.at[row, field] + suffix
+        texts.append(text)
+    return texts
+
+def filter_frame(records, keywords, geo_location=None, date_range=None, risk_threshold=None,
+                 seller_only=False, country=None, state=None, district=None, category=None, keyword_set=None):
+    """
+    Score and filter records with filter_sites' rules. Returns the scored DataFrame
+    (surviving rows only, highest risk first) and the risk results of those rows.
+    """
+    keyword_set = keyword_set or get_keyword_set()
+    frame, risks = score_frame(records, keyword_set)
+    low_risk, _, _ = get_risk_thresholds()
+    if risk_threshold is None:
+        risk_threshold = low_risk
+
+    mask = frame["url"].notna() if "url" in frame else pd.Series(False, index=frame.index)
+    mask &= frame["risk_score"] >= risk_threshold
+    if keywords:
+        mask &= any_keyword_mask(frame["keyword_text"], keywords)
+    if geo_location:
+        mask &= contains_mask(frame, "geo_location", geo_location)
+    if date_range:
+        mask &= date_range_mask(frame, date_range)
+    for field, value in (("country", country), ("state", state), ("district", district)):
+        if value:
+            mask &= contains_mask(frame, field, value)
+
+    # Seller and category checks need a scan, so only run them on rows still in play
+    if seller_only:
+        is_seller = frame["is_seller"].where(frame["is_seller"].notna(), False).astype(bool) \
+            if "is_seller" in frame else pd.Series(False, index=frame.index)
+        rows = frame.index[mask & ~is_seller]
+        detected = [cached_signals(text, keyword_set)["is_seller"] for text in _site_texts(frame, rows)]
+        frame["is_seller"] = is_seller.astype(object)
+        frame.loc[rows, "is_seller"] = detected
+        mask &= frame["is_seller"].astype(bool)
+    if category:
+        existing = frame["category"] if "category" in frame else pd.Series(None, index=frame.index, dtype=object)
+        rows = frame.index[mask & existing.isna()]
+        detected = [cached_signals(text, keyword_set)["category"] for text in _site_texts(frame, rows)]
+        frame["category"] = existing.astype(object)
+        frame.loc[rows, "category"] = detected
+        mask &= text_column(frame, "category").str.lower() == category.lower()
+
+    order = frame.index[mask]
+    order = frame.loc[order, "risk_score"].sort_values(ascending=False, kind="stable").index
+    return frame.loc[order], [risks[row] for row in order]
+
+def filter_sites_batch(sites, keywords=None, geo_location=None, date_range=None,
+                       risk_threshold=None, seller_only=False, country=None,
+                       state=None, district=None, category=None, keyword_set=None):
+    """
+    filter_sites for large lists of site dicts: same result, computed as column operations.
+    The returned dicts are the input dicts, updated like filter_sites updates them.
+    """
+    if not sites:
+        return []
+    keyword_set = keyword_set or get_keyword_set()
+    if not keywords:
+        keywords = list(keyword_set.illegal_keywords)
+    elif isinstance(keywords, str):
+        keywords = [k.strip() for k in keywords.split(',')]
+
+    frame, risks = filter_frame(sites, keywords, geo_location, date_range, risk_threshold,
+                                 seller_only, country, state, district, category, keyword_set)
+    scores = frame["risk_score"].tolist()
+    levels = frame["risk_level"].tolist()
+    sellers = frame["is_seller"].tolist() if seller_only else None
+    categories = frame["category"].tolist() if category else None
+
+    filtered_sites = []
+    for position, row in enumerate(frame.index):
+        site = sites[row]
+        site["risk_score"] = int(scores[position])
+        site["risk_categories"] = risks[position]["categories"]
+        site["risk_level"] = levels[position]
+        if seller_only:
+            site["is_seller"] = bool(sellers[position])
+        if category:
+            site["category"] = categories[position]
+        filtered_sites.append(site)
+    return filtered_sites
+
+def filter_data_batch(data, keywords=None, geo_location=None, date_range=None, risk_threshold=None,
+                      seller_only=False, country=None, state=None, district=None, category=None):
+    """
+    Predicate phase of the backend's filter_data as boolean masks over already enriched
+    records. Returns the matching records in order, or all records if none match.
+    """
+    frame = pd.DataFrame.from_records(data)
+    mask = pd.Series(True, index=frame.index)
+
+    if keywords:
+        terms = [keyword.strip().lower() for keyword in keywords.split(',')]
+        mask &= (any_keyword_mask(text_column(frame, "title").str.lower(), terms) |
+                 any_keyword_mask(text_column(frame, "description").str.lower(), terms))
+    if geo_location:
+        geo_match = text_column(frame, "description").str.lower().str.contains(geo_location.lower(), regex=False)
+        if "country" in frame:
+            geo_match |= frame["country"].notna() & \
+                text_column(frame, "country").str.lower().str.contains(geo_location.lower(), regex=False)
+        mask &= geo_match
+    if date_range and "date_detected" in frame:
+        start = datetime.datetime.strptime(date_range[0], '%Y-%m-%d')
+        end = datetime.datetime.strptime(date_range[1], '%Y-%m-%d')
+        # Only parse dates of rows still in play, as the per-record loop does
+        in_play = frame["date_detected"].where(mask)
+        mask &= _lookup_mask(in_play, lambda value: start <= datetime.datetime.strptime(value, '%Y-%m-%d') <= end)
+    if risk_threshold is not None and "risk_score" in frame:
+        mask &= ~frame["risk_score"].notna() | (frame["risk_score"] >= risk_threshold)
+    if seller_only and "is_seller" in frame:
+        mask &= ~frame["is_seller"].notna() | frame["is_seller"].where(frame["is_seller"].notna(), True).astype(bool)
+    for field, value in (("country", country), ("state", state), ("district", district)):
+        if value:
+            mask &= contains_mask(frame, field, value)
+    if category and "category" in frame:
+        mask &= ~frame["category"].notna() | (text_column(frame, "category").str.lower() == category.lower())
+
+    filtered_data = [data[row] for row in frame.index[mask]]
+    return filtered_data if filtered_data else data
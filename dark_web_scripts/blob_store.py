@@ -0,0 +1,241 @@
+"""
+Content-addressed store for page bodies.
+A body is stored once under the SHA-256 of its bytes, so mirrors and pages that
+haven't changed since the last crawl don't add anything: storing a body that is
+already there is a lookup, not a write. Bodies are compressed with zstd, using a
+dictionary trained on the first BLOB_TRAIN_SAMPLES bodies once that many have been
+seen (small HTML-derived pages share most of their vocabulary, which a dictionary
+captures far better than per-page compression). Each blob records the codec and
+dictionary it was written with, so blobs stay readable after a new dictionary is
+trained. Without zstandard installed, bodies are compressed with zlib instead.
+Blobs are never deleted on their own: sweep() removes the ones the content log no
+longer references once it has compacted away the versions that did.
+"""
+import os
+import time
+import zlib
+import hashlib
+import sqlite3
+import logging
+import threading
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('blob_store')
+
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+    logger.warning("zstandard not installed, page bodies are compressed with zlib")
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', os.path.join(BACKEND_DIR, 'data', 'blobs.db'))
+COMPRESSION_LEVEL = int(os.getenv('BLOB_COMPRESSION_LEVEL', 9))
+TRAIN_SAMPLES = int(os.getenv('BLOB_TRAIN_SAMPLES', 500))  # bodies collected before a dictionary is trained
+DICT_SIZE = 112 * 1024  # bytes of trained dictionary
+SAMPLE_BYTES = 64 * 1024  # bytes of each body used as a training sample
+SWEEP_GRACE = int(os.getenv('BLOB_SWEEP_GRACE', 300))  # seconds a stored body is kept before it must be referenced
+SWEEP_BATCH_SIZE = 500  # blobs deleted per transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    dict_id INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blob_dictionaries (
+    dict_id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    samples INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+def content_hash(data):
+    """SHA-256 hex digest a body is stored under"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+class BlobStore:
+    """Deduplicated, compressed page bodies keyed by SHA-256"""
+
+    def __init__(self, db_path=BLOB_STORE_PATH, level=COMPRESSION_LEVEL, train_samples=TRAIN_SAMPLES):
+        self.db_path = str(db_path)
+        self.level = level
+        self.train_samples = train_samples
+        self.writes = 0
+        self.duplicates = 0
+        self.swept = 0
+        self._stored = {}  # hash -> time of the last put, so a sweep spares bodies about to be referenced
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        self._dictionaries = {}  # dict_id -> zstd.ZstdCompressionDict
+        self._samples = []
+        self._dict_id = 0
+        self._compressor = None
+        if ZSTD_AVAILABLE:
+            row = self._conn.execute(
+                "SELECT dict_id, data FROM blob_dictionaries ORDER BY dict_id DESC LIMIT 1").fetchone()
+            if row:
+                self._use_dictionary(row[0], row[1])
+            else:
+                self._compressor = zstd.ZstdCompressor(level=level)
+
+    def _use_dictionary(self, dict_id, data):
+        dictionary = zstd.ZstdCompressionDict(data)
+        self._dictionaries[dict_id] = dictionary
+        self._dict_id = dict_id
+        self._compressor = zstd.ZstdCompressor(level=self.level, dict_data=dictionary)
+
+    def _dictionary(self, dict_id):
+        """Trained dictionary dict_id (lock held)"""
+        if dict_id not in self._dictionaries:
+            row = self._conn.execute("SELECT data FROM blob_dictionaries WHERE dict_id = ?", (dict_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Missing blob dictionary {dict_id}")
+            self._dictionaries[dict_id] = zstd.ZstdCompressionDict(row[0])
+        return self._dictionaries[dict_id]
+
+    def put(self, data):
+        """
+        Store a body (bytes or text) unless it's already stored; returns its hash.
+        Storing a body that is already there writes nothing.
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = content_hash(data)
+        with self._lock:
+            self._stored[digest] = time.time()
+            if self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone():
+                self.duplicates += 1
+                return digest
+            if ZSTD_AVAILABLE:
+                codec, dict_id, stored = 'zstd', self._dict_id, self._compressor.compress(data)
+            else:
+                codec, dict_id, stored = 'zlib', 0, zlib.compress(data, 6)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO blobs (hash, codec, dict_id, size, stored_size, data, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (digest, codec, dict_id, len(data), len(stored), stored, time.time())
+                )
+            self.writes += 1
+            if ZSTD_AVAILABLE and not self._dict_id and data:
+                self._samples.append(data[:SAMPLE_BYTES])
+                if len(self._samples) >= self.train_samples:
+                    self._train()
+        return digest
+
+    def _train(self):
+        """Train a dictionary on the collected samples and compress new blobs with it (lock held)"""
+        samples, self._samples = self._samples, []
+        try:
+            dictionary = zstd.train_dictionary(DICT_SIZE, samples, level=self.level)
+        except zstd.ZstdError as e:
+            logger.warning(f"Could not train a blob dictionary from {len(samples)} samples: {e}")
+            return
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO blob_dictionaries (data, samples, created_at) VALUES (?, ?, ?)",
+                (dictionary.as_bytes(), len(samples), time.time())
+            )
+        self._use_dictionary(cursor.lastrowid, dictionary.as_bytes())
+        logger.info(f"Trained blob dictionary {self._dict_id} on {len(samples)} page bodies")
+
+    def get(self, digest):
+        """The body stored under a hash as bytes, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT codec, dict_id, data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            codec, dict_id, stored = row
+            dictionary = self._dictionary(dict_id) if ZSTD_AVAILABLE and codec == 'zstd' and dict_id else None
+        if codec == 'zlib':
+            return zlib.decompress(stored)
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is required to read zstd-compressed blobs")
+        if dictionary is not None:
+            return zstd.ZstdDecompressor(dict_data=dictionary).decompress(stored)
+        return zstd.ZstdDecompressor().decompress(stored)
+
+    def get_text(self, digest):
+        """The body stored under a hash as text, or None"""
+        data = self.get(digest)
+        return data.decode('utf-8') if data is not None else None
+
+    def sweep(self, referenced, since=None, grace=SWEEP_GRACE):
+        """
+        Delete the blobs whose hash isn't in referenced (the mark set), except those
+        created or put within grace seconds before since (when the mark started), which
+        may be about to be referenced. Returns the number of blobs deleted.
+        """
+        cutoff = (since or time.time()) - grace
+        with self._lock:
+            hashes = [digest for (digest,) in self._conn.execute(
+                "SELECT hash FROM blobs WHERE created_at < ?", (cutoff,))]
+            garbage = [digest for digest in hashes
+                       if digest not in referenced and self._stored.get(digest, 0) < cutoff]
+            with self._conn:
+                for start in range(0, len(garbage), SWEEP_BATCH_SIZE):
+                    self._conn.executemany("DELETE FROM blobs WHERE hash = ?",
+                                           [(digest,) for digest in garbage[start:start + SWEEP_BATCH_SIZE]])
+            self._stored = {digest: stored for digest, stored in self._stored.items() if stored >= cutoff}
+            self.swept += len(garbage)
+        if garbage:
+            logger.info(f"Deleted {len(garbage)} unreferenced blobs")
+        return len(garbage)
+
+    def __contains__(self, digest):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is not None
+
+    def stats(self):
+        with self._lock:
+            blobs, size, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+            return {
+                "blobs": blobs,
+                "bytes": size,
+                "stored_bytes": stored,
+                "compression_ratio": round(size / stored, 2) if stored else None,
+                "dictionary": self._dict_id or None,
+                "writes": self.writes,
+                "duplicates": self.duplicates,
+                "swept": self.swept
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_blob_store():
+    """Process-wide blob store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore()
+        return _store
+
+if __name__ == "__main__":
+    # Example usage: python blob_store.py  (shows how much the stored bodies were compressed)
+    print(BlobStore().stats())
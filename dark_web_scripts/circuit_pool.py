@@ -0,0 +1,233 @@
+"""
+Tor circuit pool for the Dark Web crawler.
+Hands out isolated Tor circuits by giving each one its own SOCKS username/password
+(Tor's IsolateSOCKSAuth, on by default), and rotates circuits one at a time instead
+of sending a global NEWNYM.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+
+import requests
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('circuit_pool')
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', '.env'))
+
+# Pool defaults (overridable from backend/.env)
+TOR_SOCKS_HOST = os.getenv('TOR_SOCKS_HOST', '127.0.0.1')
+TOR_SOCKS_PORT = int(os.getenv('TOR_SOCKS_PORT', 9050))
+CIRCUIT_POOL_SIZE = int(os.getenv('TOR_CIRCUIT_POOL_SIZE', 8))
+CIRCUIT_MAX_AGE = int(os.getenv('TOR_CIRCUIT_MAX_AGE', 600))  # seconds
+CIRCUIT_MAX_REQUESTS = int(os.getenv('TOR_CIRCUIT_MAX_REQUESTS', 50))
+CIRCUIT_MAX_FAILURES = int(os.getenv('TOR_CIRCUIT_MAX_FAILURES', 5))
+
+class TorCircuit:
+    """A single isolated Tor circuit identified by its SOCKS credentials"""
+
+    def __init__(self, index, host=TOR_SOCKS_HOST, port=TOR_SOCKS_PORT):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.generation = 0
+        self.in_flight = 0
+        self.draining = False  # replaced in the pool, closed when its last request is released
+        self._session = None
+        self._new_credentials()
+
+    def _new_credentials(self):
+        """Pick fresh SOCKS credentials, which makes Tor build a new circuit"""
+        self.username = f"crawler-{self.index}-{uuid.uuid4().hex[:12]}"
+        self.password = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.total_latency = 0.0
+
+    @property
+    def proxy_url(self):
+        """SOCKS proxy URL carrying this circuit's isolation credentials"""
+        return f"socks5h://{self.username}:{self.password}@{self.host}:{self.port}"
+
+    @property
+    def proxies(self):
+        """Proxy mapping for requests"""
+        return {
+            'http': self.proxy_url,
+            'https': self.proxy_url
+        }
+
+    @property
+    def session(self):
+        """requests.Session bound to this circuit"""
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.proxies = self.proxies
+        return self._session
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    @property
+    def avg_latency(self):
+        if not self.requests:
+            return None
+        return self.total_latency / self.requests
+
+    def is_expired(self, max_age, max_requests, max_failures):
+        """Check whether this circuit is due for rotation"""
+        return (self.age >= max_age or
+                self.requests >= max_requests or
+                self.consecutive_failures >= max_failures)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def rotate(self):
+        """Switch to a new circuit by changing credentials"""
+        self.close()
+        self._new_credentials()
+        self.generation += 1
+        logger.info(f"Rotated Tor circuit {self.index} (generation {self.generation})")
+
+    def record(self, latency=None, success=True):
+        """Record the outcome of a request made over this circuit"""
+        self.requests += 1
+        if latency is not None:
+            self.total_latency += latency
+        if success:
+            self.consecutive_failures = 0
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def to_dict(self):
+        avg_latency = self.avg_latency
+        return {
+            "index": self.index,
+            "generation": self.generation,
+            "age": round(self.age, 1),
+            "requests": self.requests,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "avg_latency": round(avg_latency, 3) if avg_latency is not None else None
+        }
+
+class TorCircuitPool:
+    """Pool of isolated Tor circuits rotated individually by age, request count or failures"""
+
+    def __init__(self, size=CIRCUIT_POOL_SIZE, max_age=CIRCUIT_MAX_AGE,
+                 max_requests=CIRCUIT_MAX_REQUESTS, max_failures=CIRCUIT_MAX_FAILURES,
+                 host=TOR_SOCKS_HOST, port=TOR_SOCKS_PORT):
+        self.max_age = max_age
+        self.max_requests = max_requests
+        self.max_failures = max_failures
+        self.circuits = [TorCircuit(i, host, port) for i in range(max(1, size))]
+        self.draining = set()  # replaced circuits that still have requests in flight
+        self.rotations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.circuits)
+
+    def _maybe_rotate(self, circuit):
+        """
+        Rotate a circuit of the pool if it has expired (caller holds the lock).
+        An idle circuit gets new credentials in place. A busy one is marked as
+        draining and replaced by a new circuit in its slot, so it gets no new
+        requests, and is closed when its last request is released.
+        """
+        if circuit.draining or not circuit.is_expired(self.max_age, self.max_requests, self.max_failures):
+            return
+        if circuit.in_flight == 0:
+            circuit.rotate()
+        else:
+            replacement = TorCircuit(circuit.index, circuit.host, circuit.port)
+            replacement.generation = circuit.generation + 1
+            self.circuits[circuit.index] = replacement
+            circuit.draining = True
+            self.draining.add(circuit)
+            logger.info(f"Tor circuit {circuit.index} draining {circuit.in_flight} requests, "
+                        f"replaced by generation {replacement.generation}")
+        self.rotations += 1
+
+    def acquire(self, index=None):
+        """
+        Take a circuit for one request.
+        Without an index the least busy, fastest circuit is chosen; with an index
+        the caller gets its own circuit (index modulo pool size).
+        """
+        with self._lock:
+            if index is not None:
+                circuit = self.circuits[index % len(self.circuits)]
+            else:
+                circuit = min(
+                    self.circuits,
+                    key=lambda c: (c.in_flight, c.consecutive_failures,
+                                   c.avg_latency if c.avg_latency is not None else 0)
+                )
+            self._maybe_rotate(circuit)
+            circuit = self.circuits[circuit.index]  # its replacement if it started draining
+            circuit.in_flight += 1
+            return circuit
+
+    def release(self, circuit, latency=None, success=None):
+        """Return a circuit after a request and record its latency and outcome (if any)"""
+        with self._lock:
+            circuit.in_flight = max(0, circuit.in_flight - 1)
+            if success is not None:
+                circuit.record(latency, success)
+            if circuit.draining:
+                if circuit.in_flight == 0:
+                    circuit.close()
+                    self.draining.discard(circuit)
+            else:
+                self._maybe_rotate(circuit)
+
+    def generations(self):
+        """(index, generation) of every circuit in use, including draining ones"""
+        with self._lock:
+            return {(circuit.index, circuit.generation) for circuit in self.circuits + list(self.draining)}
+
+    def verify(self):
+        """Check once that Tor is reachable through the pool"""
+        circuit = self.acquire()
+        start = time.time()
+        try:
+            response = circuit.session.get('https://check.torproject.org/', timeout=15)
+            self.release(circuit, time.time() - start, True)
+            if 'Congratulations. This browser is configured to use Tor' in response.text:
+                logger.info("Successfully connected to Tor network")
+                return True
+            logger.warning("Connected to Tor but verification failed")
+            return True
+        except Exception as e:
+            self.release(circuit, None, False)
+            logger.warning(f"Could not verify Tor connection: {e}")
+            return False
+
+    def stats(self):
+        """Per-circuit latency and failure counters"""
+        with self._lock:
+            return {
+                "size": len(self.circuits),
+                "rotations": self.rotations,
+                "draining": len(self.draining),
+                "circuits": [circuit.to_dict() for circuit in self.circuits]
+            }
+
+    def close(self):
+        """Close all sessions held by the pool"""
+        with self._lock:
+            for circuit in self.circuits + list(self.draining):
+                circuit.close()
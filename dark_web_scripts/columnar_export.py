@@ -0,0 +1,234 @@
+"""
+Columnar (Parquet / Arrow IPC) export and import of crawl results.
+Records are written in batches with a fixed Arrow schema, so nested fields such as
+risk_categories and found_keywords keep their structure; ip_info and any fields
+outside the schema are kept as JSON and restored on import. Parquet datasets are
+partitioned by date_detected and category (hive style, date_detected=.../category=...),
+so loading a date range or a category only reads the matching files, and only the
+requested columns of them.
+"""
+import os
+import sys
+import json
+import uuid
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('columnar_export')
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logger.warning("pyarrow not installed, Parquet/Arrow export and import are unavailable")
+
+PARTITION_FIELDS = ('date_detected', 'category')
+BATCH_ROWS = 50000  # records converted and written at a time
+JSON_FIELDS = ('ip_info',)  # free-form nested fields, stored as JSON text
+
+def result_schema():
+    """Arrow schema of an exported crawl result"""
+    return pa.schema([
+        ('id', pa.string()),
+        ('url', pa.string()),
+        ('title', pa.string()),
+        ('description', pa.string()),
+        ('content_sample', pa.string()),
+        ('risk_score', pa.int64()),
+        ('risk_level', pa.string()),
+        ('risk_categories', pa.map_(pa.string(), pa.struct([
+            ('score', pa.float64()),
+            ('matches', pa.list_(pa.string()))
+        ]))),
+        ('category', pa.string()),
+        ('country', pa.string()),
+        ('state', pa.string()),
+        ('district', pa.string()),
+        ('is_seller', pa.bool_()),
+        ('found_keywords', pa.list_(pa.string())),
+        ('date_detected', pa.string()),
+        ('archive_link', pa.string()),
+        ('ip_info', pa.string()),
+        ('extra', pa.string())  # JSON of the fields not in the schema
+    ])
+
+def _text(value):
+    return None if value is None else str(value)
+
+def to_row(record, names):
+    """A crawl result as a row of the result schema"""
+    row = {name: record.get(name) for name in names if name != 'extra'}
+    for name in ('id', 'url', 'title', 'description', 'content_sample', 'risk_level', 'category',
+                 'country', 'state', 'district', 'date_detected', 'archive_link'):
+        row[name] = _text(row[name])
+    score = row['risk_score']
+    row['risk_score'] = int(round(score)) if isinstance(score, (int, float)) and not isinstance(score, bool) else None
+    row['is_seller'] = bool(row['is_seller']) if row['is_seller'] is not None else None
+    categories = row['risk_categories']
+    row['risk_categories'] = [
+        (name, {"score": data.get("score"), "matches": [str(match) for match in data.get("matches", [])]})
+        for name, data in categories.items() if isinstance(data, dict)
+    ] if isinstance(categories, dict) else None
+    keywords = row['found_keywords']
+    row['found_keywords'] = [str(keyword) for keyword in keywords] if isinstance(keywords, list) else None
+    for name in JSON_FIELDS:
+        row[name] = json.dumps(row[name]) if row[name] is not None else None
+    extra = {key: value for key, value in record.items() if key not in names}
+    row['extra'] = json.dumps(extra, default=str) if extra else None
+    return row
+
+def from_row(row):
+    """A crawl result back from a (possibly partial) row of the result schema"""
+    record = {}
+    for name, value in row.items():
+        if value is None:
+            continue
+        if name == 'extra':
+            record.update(json.loads(value))
+        elif name in JSON_FIELDS:
+            record[name] = json.loads(value)
+        elif name == 'risk_categories':
+            record[name] = dict(value)
+        else:
+            record[name] = value
+    return record
+
+def iter_batches(records, schema, batch_rows=BATCH_ROWS):
+    """Arrow record batches of records (any iterable), batch_rows at a time"""
+    names = set(schema.names)
+    rows = []
+    for record in records:
+        if isinstance(record, dict):
+            rows.append(to_row(record, names))
+        if len(rows) >= batch_rows:
+            yield pa.RecordBatch.from_pylist(rows, schema=schema)
+            rows = []
+    if rows:
+        yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required for Parquet/Arrow export and import")
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(name, pa.string()) for name in PARTITION_FIELDS]), flavor='hive')
+
+def export_parquet_dataset(records, base_dir, batch_rows=BATCH_ROWS):
+    """
+    Write records to a Parquet dataset under base_dir, partitioned by date_detected
+    and category. Files of earlier exports are kept, so exports can be appended to
+    the same dataset.
+    """
+    _require_pyarrow()
+    schema = result_schema()
+    reader = pa.RecordBatchReader.from_batches(schema, iter_batches(records, schema, batch_rows))
+    ds.write_dataset(reader, base_dir, format='parquet', partitioning=_partitioning(),
+                     basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+                     existing_data_behavior='overwrite_or_ignore')
+    logger.info(f"Exported crawl results to Parquet dataset {base_dir}")
+
+def write_parquet(records, sink, batch_rows=BATCH_ROWS):
+    """Write records to a single Parquet file (path or binary file object); returns the row count"""
+    _require_pyarrow()
+    schema = result_schema()
+    count = 0
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in iter_batches(records, schema, batch_rows):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+def write_arrow(records, sink, batch_rows=BATCH_ROWS):
+    """Write records to an Arrow IPC (Feather v2) file; returns the row count"""
+    _require_pyarrow()
+    schema = result_schema()
+    count = 0
+    with pa.ipc.new_file(sink, schema) as writer:
+        for batch in iter_batches(records, schema, batch_rows):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+def filter_expression(filters):
+    """
+    Dataset filter expression from {field: value} (equality), {field: [values]} (any
+    of them) or {field: (op, value)} with op one of ==, !=, <, <=, >, >=, or
+    {field: ("between", low, high)} (inclusive)
+    """
+    expression = None
+    for name, condition in (filters or {}).items():
+        field = ds.field(name)
+        if isinstance(condition, tuple):
+            op = condition[0]
+            if op == 'between':
+                term = (field >= condition[1]) & (field <= condition[2])
+            elif op == '==':
+                term = field == condition[1]
+            elif op == '!=':
+                term = field != condition[1]
+            elif op == '<':
+                term = field < condition[1]
+            elif op == '<=':
+                term = field <= condition[1]
+            elif op == '>':
+                term = field > condition[1]
+            elif op == '>=':
+                term = field >= condition[1]
+            else:
+                raise ValueError(f"Unsupported filter operator for {name}: {op}")
+        elif isinstance(condition, list):
+            term = field.isin(condition)
+        else:
+            term = field == condition
+        expression = term if expression is None else expression & term
+    return expression
+
+def open_dataset(source):
+    """Dataset over a partitioned Parquet directory, a Parquet file or an Arrow IPC file"""
+    _require_pyarrow()
+    if os.path.isdir(source):
+        return ds.dataset(source, format='parquet', partitioning=_partitioning())
+    if source.endswith(('.arrow', '.feather', '.ipc')):
+        return ds.dataset(source, format='ipc')
+    return ds.dataset(source, format='parquet')
+
+def iter_records(source, columns=None, filters=None):
+    """
+    Yield crawl results from a columnar export, reading only the given columns and
+    only the partitions and row groups that can match filters (see filter_expression)
+    """
+    dataset = open_dataset(source)
+    if columns is not None:
+        columns = [name for name in columns if name in dataset.schema.names]
+    for batch in dataset.to_batches(columns=columns, filter=filter_expression(filters)):
+        for row in batch.to_pylist():
+            yield from_row(row)
+
+def load_records(source, columns=None, filters=None):
+    """Crawl results of a columnar export as a list (see iter_records)"""
+    return list(iter_records(source, columns, filters))
+
+def load_frame(source, columns=None, filters=None):
+    """Columns of a columnar export as a pandas DataFrame, for notebooks"""
+    return open_dataset(source).to_table(columns=columns, filter=filter_expression(filters)).to_pandas()
+
+if __name__ == "__main__":
+    # Example usage: python columnar_export.py <crawled_data.json|.jsonl> <dataset_dir | file.parquet | file.arrow>
+    from dark_web_scripts.dark_web_filters import iter_site_records
+    if len(sys.argv) < 3:
+        print("Usage: python columnar_export.py <input.json|.jsonl> <dataset_dir|output.parquet|output.arrow>")
+        sys.exit(1)
+    source, target = sys.argv[1], sys.argv[2]
+    if target.endswith('.parquet'):
+        print(f"Wrote {write_parquet(iter_site_records(source), target)} records to {target}")
+    elif target.endswith(('.arrow', '.feather', '.ipc')):
+        print(f"Wrote {write_arrow(iter_site_records(source), target)} records to {target}")
+    else:
+        export_parquet_dataset(iter_site_records(source), target)
+        print(f"Exported {source} to {target}")
@@ -0,0 +1,381 @@
+"""
+Append-only store for the full content of crawled pages.
+Pages are appended to segment files of a fixed maximum size instead of one JSON
+file each. Every record is a length and CRC32 header followed by the page as
+zlib-compressed JSON. An offset index in SQLite maps each URL and version to its
+segment, offset and length, so reading a page is one index lookup and one seek.
+Saving a page again adds a new version; a background compactor drops all but the
+latest CONTENT_KEEP_VERSIONS versions of every URL and rewrites sealed segments
+that have become mostly garbage. The index also keeps the blob store hash of each
+version's body, so after compacting, bodies no kept version references anymore
+are deleted from the blob store.
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import struct
+import sqlite3
+import logging
+import threading
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('content_log')
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+CONTENT_LOG_DIR = os.getenv('CONTENT_LOG_DIR', os.path.join(BACKEND_DIR, 'data', 'content_log'))
+LEGACY_CRAWLED_DIR = os.path.join(BACKEND_DIR, 'data', 'crawled')  # one JSON file per page, as saved before
+
+SEGMENT_SIZE = int(os.getenv('CONTENT_SEGMENT_MB', 64)) * 1024 * 1024  # a new segment is started past this size
+KEEP_VERSIONS = int(os.getenv('CONTENT_KEEP_VERSIONS', 3))  # versions of a URL kept by compaction
+COMPACT_INTERVAL = int(os.getenv('CONTENT_COMPACT_INTERVAL', 600))  # seconds between compactions (0 disables)
+COMPACT_MIN_GARBAGE = float(os.getenv('CONTENT_COMPACT_GARBAGE', 0.5))  # share of dead bytes before a segment is rewritten
+
+HEADER = struct.Struct('>II')  # payload length, CRC32 of the payload
+SEGMENT_RE = re.compile(r'^segment-(\d{6})\.log$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content_index (
+    url TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    saved_at REAL NOT NULL,
+    content_hash TEXT,
+    PRIMARY KEY (url, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_content_segment ON content_index (segment);
+"""
+
+def encode_record(entry):
+    """Header and compressed payload of a log entry"""
+    payload = zlib.compress(json.dumps(entry, separators=(',', ':'), default=str).encode('utf-8'))
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def decode_payload(payload, crc):
+    if zlib.crc32(payload) != crc:
+        raise ValueError("Corrupt content log record (CRC mismatch)")
+    return json.loads(zlib.decompress(payload))
+
+def read_record(f):
+    """Next entry of an open segment, or None at its end or at a partly written record"""
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    length, crc = HEADER.unpack(header)
+    payload = f.read(length)
+    if len(payload) < length:
+        return None
+    return decode_payload(payload, crc)
+
+class ContentLog:
+    """Segmented append-only log of page versions with an offset index"""
+
+    def __init__(self, log_dir=CONTENT_LOG_DIR, segment_size=SEGMENT_SIZE, keep_versions=KEEP_VERSIONS,
+                 blob_store=None):
+        self.log_dir = log_dir
+        self.segment_size = segment_size
+        self.keep_versions = keep_versions
+        self.blob_store = blob_store  # bodies of dropped versions are collected from it after compaction
+        os.makedirs(log_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(log_dir, 'index.db'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+        segments = self.segments()
+        self._segment = segments[-1] if segments else 1
+        self._file = open(self._segment_path(self._segment), 'ab')
+        self._recover()
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._compactor = None
+
+    def _segment_path(self, segment):
+        return os.path.join(self.log_dir, f"segment-{segment:06d}.log")
+
+    def _migrate(self):
+        """Add the content_hash column to an older index, filled in from the records it points at"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(content_index)")}
+        if 'content_hash' in columns:
+            return
+        rows = self._conn.execute("SELECT url, version, segment, offset, length FROM content_index").fetchall()
+        with self._conn:
+            self._conn.execute("ALTER TABLE content_index ADD COLUMN content_hash TEXT")
+            for url, version, segment, offset, length in rows:
+                try:
+                    page = self._read(segment, offset, length)["page"]
+                except (OSError, ValueError, zlib.error) as e:
+                    logger.error(f"Error reading version {version} of {url}: {e}")
+                    continue
+                if page.get("content_hash"):
+                    self._conn.execute("UPDATE content_index SET content_hash = ? WHERE url = ? AND version = ?",
+                                       (page["content_hash"], url, version))
+
+    def segments(self):
+        """Numbers of the segment files on disk, oldest first"""
+        return sorted(int(match.group(1)) for match in map(SEGMENT_RE.match, os.listdir(self.log_dir)) if match)
+
+    def _recover(self):
+        """
+        Index records at the end of the active segment that were written but not indexed
+        before a crash, and cut off a partly written last record
+        """
+        row = self._conn.execute("SELECT MAX(offset + ? + length) FROM content_index WHERE segment = ?",
+                                 (HEADER.size, self._segment)).fetchone()
+        end = row[0] or 0
+        path = self._segment_path(self._segment)
+        if os.path.getsize(path) <= end:
+            return
+        recovered = 0
+        with open(path, 'rb') as f, self._conn:
+            f.seek(end)
+            while True:
+                offset = f.tell()
+                try:
+                    entry = read_record(f)
+                except (ValueError, zlib.error):
+                    entry = None
+                if entry is None:
+                    break
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO content_index (url, version, segment, offset, length, saved_at, "
+                    "content_hash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entry['url'], entry['version'], self._segment, offset, f.tell() - offset - HEADER.size,
+                     entry['saved_at'], entry['page'].get('content_hash'))
+                )
+                recovered += 1
+        if offset < os.path.getsize(path):
+            logger.warning(f"Truncating partly written record at {path}:{offset}")
+            self._file.truncate(offset)
+            self._file.seek(0, os.SEEK_END)
+        if recovered:
+            logger.info(f"Recovered {recovered} unindexed records from {path}")
+
+    def _append(self, data):
+        """Write raw record bytes to the active segment (lock held); returns (segment, offset)"""
+        offset = self._file.tell()
+        if offset and offset + len(data) > self.segment_size:
+            self._file.close()
+            self._segment += 1
+            self._file = open(self._segment_path(self._segment), 'ab')
+            offset = 0
+            self._wake.set()  # a segment was sealed: let the compactor look at it
+        self._file.write(data)
+        self._file.flush()
+        return self._segment, offset
+
+    def append(self, url, page, saved_at=None):
+        """Save a new version of a page; returns its version number"""
+        saved_at = saved_at or time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(version) FROM content_index WHERE url = ?", (url,)).fetchone()
+            version = (row[0] or 0) + 1
+            record = encode_record({"url": url, "version": version, "saved_at": saved_at, "page": page})
+            segment, offset = self._append(record)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO content_index (url, version, segment, offset, length, saved_at, content_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, version, segment, offset, len(record) - HEADER.size, saved_at, page.get("content_hash"))
+                )
+        return version
+
+    def get(self, url, version=None):
+        """The saved page of a URL (its latest version by default), or None"""
+        with self._lock:
+            if version is None:
+                row = self._conn.execute(
+                    "SELECT segment, offset, length FROM content_index WHERE url = ? ORDER BY version DESC LIMIT 1",
+                    (url,)).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT segment, offset, length FROM content_index WHERE url = ? AND version = ?",
+                    (url, version)).fetchone()
+            if row is None:
+                return None
+            segment, offset, length = row
+            # Opened under the lock, so compaction can't remove the segment before it's read
+            f = open(self._segment_path(segment), 'rb')
+        with f:
+            return self._read_from(f, offset, length)["page"]
+
+    def _read(self, segment, offset, length):
+        with open(self._segment_path(segment), 'rb') as f:
+            return self._read_from(f, offset, length)
+
+    @staticmethod
+    def _read_from(f, offset, length):
+        """The entry of the record at offset of an open segment"""
+        f.seek(offset)
+        header = f.read(HEADER.size + length)
+        _, crc = HEADER.unpack_from(header)
+        return decode_payload(header[HEADER.size:], crc)
+
+    def versions(self, url):
+        """Saved versions of a URL, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, saved_at FROM content_index WHERE url = ? ORDER BY version DESC", (url,)
+            ).fetchall()
+        return [{"version": version, "saved_at": saved_at} for version, saved_at in rows]
+
+    def compact(self):
+        """
+        Drop all but the latest keep_versions versions of every URL, then copy the live
+        records of sealed segments that are at least COMPACT_MIN_GARBAGE dead to the
+        active segment and delete them, and collect the blobs no kept version references.
+        Returns the number of segments removed.
+        """
+        started = time.time()
+        with self._lock:
+            with self._conn:
+                dropped = self._conn.execute(
+                    "DELETE FROM content_index WHERE version <= "
+                    "(SELECT MAX(version) FROM content_index AS latest WHERE latest.url = content_index.url) - ?",
+                    (self.keep_versions,)
+                ).rowcount
+            live = dict(self._conn.execute(
+                "SELECT segment, SUM(length + ?) FROM content_index GROUP BY segment", (HEADER.size,)
+            ).fetchall())
+            active = self._segment
+        if dropped:
+            logger.info(f"Dropped {dropped} old page versions from the content log index")
+
+        removed = 0
+        for segment in self.segments():
+            if segment >= active:
+                continue
+            size = os.path.getsize(self._segment_path(segment))
+            if size and live.get(segment, 0) > size * (1 - COMPACT_MIN_GARBAGE):
+                continue
+            self._rewrite(segment)
+            removed += 1
+        if self.blob_store is not None:
+            self.blob_store.sweep(self.content_hashes(), since=started)
+        return removed
+
+    def content_hashes(self):
+        """Blob store hashes of the bodies of every indexed version"""
+        with self._lock:
+            return {content_hash for (content_hash,) in self._conn.execute(
+                "SELECT DISTINCT content_hash FROM content_index WHERE content_hash IS NOT NULL")}
+
+    def _rewrite(self, segment):
+        """Move the live records of a sealed segment to the active segment and delete it"""
+        path = self._segment_path(segment)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, version, offset, length FROM content_index WHERE segment = ? ORDER BY offset",
+                (segment,)).fetchall()
+        # Sealed segments never change, so their records can be read without the lock
+        records = []
+        with open(path, 'rb') as f:
+            for url, version, offset, length in rows:
+                f.seek(offset)
+                records.append((url, version, f.read(HEADER.size + length)))
+        with self._lock:
+            with self._conn:
+                for url, version, data in records:
+                    new_segment, new_offset = self._append(data)
+                    self._conn.execute(
+                        "UPDATE content_index SET segment = ?, offset = ? WHERE url = ? AND version = ? AND segment = ?",
+                        (new_segment, new_offset, url, version, segment)
+                    )
+            os.remove(path)
+        logger.info(f"Compacted content log segment {segment}: {len(records)} live records moved")
+
+    def start_compaction(self, interval=COMPACT_INTERVAL):
+        """Compact in a background thread every interval seconds, and whenever a segment is sealed"""
+        if self._compactor is not None or interval <= 0:
+            return
+        self._compactor = threading.Thread(target=self._compact_loop, args=(interval,),
+                                           name='content-log-compaction', daemon=True)
+        self._compactor.start()
+
+    def _compact_loop(self, interval):
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.compact()
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Error compacting content log: {e}")
+
+    def import_directory(self, data_dir=LEGACY_CRAWLED_DIR):
+        """Append the one-file-per-page JSON files saved before the log existed; returns how many"""
+        if not os.path.isdir(data_dir):
+            return 0
+        paths = [os.path.join(data_dir, name) for name in os.listdir(data_dir) if name.endswith('.json')]
+        imported = 0
+        for path in sorted(paths, key=os.path.getmtime):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    page = json.load(f)
+                self.append(page["url"], page, os.path.getmtime(path))
+                imported += 1
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Error importing {path}: {e}")
+        logger.info(f"Imported {imported} saved pages from {data_dir}")
+        return imported
+
+    def stats(self):
+        with self._lock:
+            urls, versions = self._conn.execute(
+                "SELECT COUNT(DISTINCT url), COUNT(*) FROM content_index").fetchone()
+        segments = self.segments()
+        return {
+            "urls": urls,
+            "versions": versions,
+            "segments": len(segments),
+            "bytes": sum(os.path.getsize(self._segment_path(segment)) for segment in segments)
+        }
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            self._file.close()
+            self._conn.close()
+
+_log = None
+_log_lock = threading.Lock()
+
+def get_content_log():
+    """Process-wide content log, with background compaction running"""
+    global _log
+    with _log_lock:
+        if _log is None:
+            from dark_web_scripts.blob_store import get_blob_store
+            _log = ContentLog(blob_store=get_blob_store())
+            _log.start_compaction()
+        return _log
+
+if __name__ == "__main__":
+    # Example usage: python content_log.py [import|compact|stats]  (don't compact while a crawl is running)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from dark_web_scripts.blob_store import get_blob_store
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    content_log = ContentLog(blob_store=get_blob_store())
+    if command == 'import':
+        print(f"Imported {content_log.import_directory()} saved pages")
+    elif command == 'compact':
+        print(f"Removed {content_log.compact()} segments")
+    print(content_log.stats())
+    content_log.close()
@@ -0,0 +1,468 @@
+"""
+Persistent crawl frontier for the Dark Web crawler.
+Stores queued and visited URLs with depth, priority and next-fetch time in the
+SQLite database configured by DB_PATH, so a crawl can resume where it stopped
+and large crawls don't have to keep every URL in memory.
+Each domain gets its own page budget and depth limit, and URLs are claimed
+round-robin across domains so one big link directory can't use up the crawl.
+"""
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('crawl_frontier')
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+# Same location as config.DB_PATH in the backend
+DB_PATH = os.path.join(BACKEND_DIR, os.getenv('DB_PATH', 'data/darkweb.db'))
+
+# Per-domain limits (None disables the limit)
+MAX_PAGES_PER_DOMAIN = int(os.getenv('MAX_PAGES_PER_SITE', 50))
+MAX_DOMAIN_DEPTH = int(os.getenv('MAX_DOMAIN_DEPTH', 3))  # same-domain hops from the first URL seen on a domain
+
+# URL states
+QUEUED = 'queued'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_runs (
+    crawl_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    max_pages INTEGER,
+    pages_crawled INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running'
+);
+CREATE TABLE IF NOT EXISTS crawl_frontier (
+    crawl_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    domain_depth INTEGER NOT NULL DEFAULT 0,
+    priority INTEGER NOT NULL DEFAULT 0,
+    next_fetch_at REAL NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    added_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (crawl_id, url)
+);
+CREATE INDEX IF NOT EXISTS idx_frontier_ready
+    ON crawl_frontier (crawl_id, state, priority DESC, depth, next_fetch_at);
+CREATE INDEX IF NOT EXISTS idx_frontier_domain
+    ON crawl_frontier (crawl_id, domain, state, priority DESC, depth);
+CREATE TABLE IF NOT EXISTS crawl_domains (
+    crawl_id TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    weight REAL NOT NULL DEFAULT 1,
+    budget INTEGER,
+    admitted INTEGER NOT NULL DEFAULT 0,
+    claimed INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    over_budget INTEGER NOT NULL DEFAULT 0,
+    too_deep INTEGER NOT NULL DEFAULT 0,
+    queued INTEGER NOT NULL DEFAULT 0,
+    next_turn REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (crawl_id, domain)
+);
+"""
+
+# Created after _migrate, which adds the columns they use to older databases
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_domains_turn
+    ON crawl_domains (crawl_id, next_turn) WHERE queued > 0;
+"""
+
+def new_crawl_id():
+    """Generate an ID for a new crawl run"""
+    return f"crawl-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+class CrawlFrontier:
+    """
+    Disk-backed frontier and visited set for a single crawl run.
+    A domain admits at most its budget of URLs (max_pages_per_domain scaled by its weight);
+    links past the budget or the same-domain depth limit are dropped and counted.
+    """
+
+    def __init__(self, crawl_id=None, db_path=DB_PATH, max_pages=None, resume=True,
+                 max_pages_per_domain=MAX_PAGES_PER_DOMAIN, max_domain_depth=MAX_DOMAIN_DEPTH,
+                 domain_weights=None):
+        self.crawl_id = crawl_id or new_crawl_id()
+        self.db_path = str(db_path)
+        self.max_pages_per_domain = max_pages_per_domain
+        self.max_domain_depth = max_domain_depth
+        self.domain_weights = {domain.lower(): weight for domain, weight in (domain_weights or {}).items()}
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.executescript(INDEXES)
+        self._domains = {}  # domain -> [budget, admitted] for domains seen by this process
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO crawl_runs (crawl_id, created_at, updated_at, max_pages) VALUES (?, ?, ?, ?)",
+                (self.crawl_id, now, now, max_pages)
+            )
+            if resume:
+                # URLs that were being fetched when the previous run stopped go back in the queue
+                cursor = self._conn.execute(
+                    "UPDATE crawl_frontier SET state = ?, updated_at = ? WHERE crawl_id = ? AND state = ?",
+                    (QUEUED, now, self.crawl_id, IN_PROGRESS)
+                )
+                if cursor.rowcount:
+                    self._count_queued()
+                    logger.info(f"Resuming crawl {self.crawl_id}: re-queued {cursor.rowcount} interrupted URLs")
+            row = self._conn.execute(
+                "SELECT MIN(next_turn) FROM crawl_domains WHERE crawl_id = ? AND queued > 0", (self.crawl_id,)
+            ).fetchone()
+        # Turn reached by the domains being served; domains that get new URLs start from here
+        self._clock = row[0] or 0
+
+    def _migrate(self):
+        """Add columns introduced after a frontier database was first created"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(crawl_frontier)")}
+        if 'domain_depth' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE crawl_frontier ADD COLUMN domain_depth INTEGER NOT NULL DEFAULT 0")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(crawl_domains)")}
+        if 'queued' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE crawl_domains ADD COLUMN queued INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute("ALTER TABLE crawl_domains ADD COLUMN next_turn REAL NOT NULL DEFAULT 0")
+                self._count_queued(all_crawls=True)
+
+    def _count_queued(self, all_crawls=False):
+        """Recount the queued URLs of every domain (after re-queueing URLs in bulk)"""
+        self._conn.execute(
+            "UPDATE crawl_domains SET queued = (SELECT COUNT(*) FROM crawl_frontier f "
+            "  WHERE f.crawl_id = crawl_domains.crawl_id AND f.domain = crawl_domains.domain AND f.state = ?)"
+            + ("" if all_crawls else " WHERE crawl_id = ?"),
+            (QUEUED,) if all_crawls else (QUEUED, self.crawl_id)
+        )
+
+    def _queue_in(self, domain, count):
+        """
+        Count newly queued URLs of a domain; a domain that had none queued rejoins the
+        rotation at the current turn instead of catching up (caller holds the lock)
+        """
+        self._conn.execute(
+            "UPDATE crawl_domains SET next_turn = CASE WHEN queued = 0 THEN MAX(next_turn, ?) ELSE next_turn END, "
+            "queued = queued + ? WHERE crawl_id = ? AND domain = ?",
+            (self._clock, count, self.crawl_id, domain)
+        )
+
+    def weight_for(self, domain):
+        return self.domain_weights.get(domain.lower(), 1)
+
+    def budget_for(self, domain):
+        """Page budget for a domain, or None if unlimited"""
+        if self.max_pages_per_domain is None:
+            return None
+        return max(1, int(round(self.max_pages_per_domain * self.weight_for(domain))))
+
+    def _domain(self, domain):
+        """Load (or create) the budget row for a domain; caller holds the lock"""
+        entry = self._domains.get(domain)
+        if entry is None:
+            row = self._conn.execute(
+                "SELECT budget, admitted FROM crawl_domains WHERE crawl_id = ? AND domain = ?",
+                (self.crawl_id, domain)
+            ).fetchone()
+            if row is None:
+                row = (self.budget_for(domain), 0)
+                self._conn.execute(
+                    "INSERT INTO crawl_domains (crawl_id, domain, weight, budget, next_turn) VALUES (?, ?, ?, ?, ?)",
+                    (self.crawl_id, domain, self.weight_for(domain), row[0], self._clock)
+                )
+            entry = self._domains[domain] = list(row)
+        return entry
+
+    def add(self, url, depth, priority=0, next_fetch_at=0):
+        """Queue a URL unless this crawl has already seen it; returns True if it was added"""
+        return self.add_many([(url, depth)], priority, next_fetch_at) > 0
+
+    def add_many(self, urls, priority=0, next_fetch_at=0):
+        """
+        Queue (url, depth) or (url, depth, domain_depth) entries in one transaction.
+        Returns the number of new URLs; URLs over their domain's budget or depth limit are dropped.
+        """
+        now = time.time()
+        added = 0
+        queued = {}  # domain -> new URLs
+        dropped = {}  # (domain, column) -> count
+        with self._lock, self._conn:
+            for entry in urls:
+                url, depth = entry[0], entry[1]
+                domain_depth = entry[2] if len(entry) > 2 else 0
+                domain = urlparse(url).netloc.lower()
+                budget = self._domain(domain)
+
+                if self.max_domain_depth is not None and domain_depth > self.max_domain_depth:
+                    reason = 'too_deep'
+                elif budget[0] is not None and budget[1] >= budget[0]:
+                    reason = 'over_budget'
+                else:
+                    reason = None
+
+                if reason:
+                    # Seen URLs are not counted as dropped
+                    if not self._conn.execute(
+                        "SELECT 1 FROM crawl_frontier WHERE crawl_id = ? AND url = ?", (self.crawl_id, url)
+                    ).fetchone():
+                        dropped[(domain, reason)] = dropped.get((domain, reason), 0) + 1
+                    continue
+
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO crawl_frontier "
+                    "(crawl_id, url, domain, depth, domain_depth, priority, next_fetch_at, added_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.crawl_id, url, domain, depth, domain_depth, priority, next_fetch_at, now, now)
+                )
+                if cursor.rowcount:
+                    budget[1] += 1
+                    added += 1
+                    queued[domain] = queued.get(domain, 0) + 1
+
+            for domain, count in queued.items():
+                self._conn.execute(
+                    "UPDATE crawl_domains SET admitted = admitted + ? WHERE crawl_id = ? AND domain = ?",
+                    (count, self.crawl_id, domain)
+                )
+                self._queue_in(domain, count)
+
+            for (domain, column), count in dropped.items():
+                self._conn.execute(
+                    f"UPDATE crawl_domains SET {column} = {column} + ? WHERE crawl_id = ? AND domain = ?",
+                    (count, self.crawl_id, domain)
+                )
+        return added
+
+    def add_links(self, parent_url, links, priority=0):
+        """Queue links found on parent_url one level deeper, tracking same-domain depth"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT depth, domain_depth, domain FROM crawl_frontier WHERE crawl_id = ? AND url = ?",
+                (self.crawl_id, parent_url)
+            ).fetchone()
+        depth, domain_depth, domain = row if row else (0, 0, urlparse(parent_url).netloc.lower())
+        return self.add_many([
+            (link, depth + 1, domain_depth + 1 if urlparse(link).netloc.lower() == domain else 0)
+            for link in links
+        ], priority)
+
+    def claim(self, limit=1, now=None):
+        """
+        Take up to `limit` ready URLs, marking them in progress; returns [(url, depth), ...]
+        Domains take turns (weighted by their share), so one domain can't fill a whole batch:
+        the domains whose turn is next each give a few URLs, their share of the batch, and
+        every URL claimed moves its domain's next turn on by 1 / weight. Each step reads
+        only the domains and rows it takes, whatever the size of the frontier.
+        """
+        if now is None:
+            now = time.time()
+        claimed = []
+        with self._lock, self._conn:
+            skipped = set()  # domains with queued URLs that aren't ready yet
+            while len(claimed) < limit:
+                remaining = limit - len(claimed)
+                domains = [row for row in self._conn.execute(
+                    "SELECT domain, weight, next_turn FROM crawl_domains "
+                    "WHERE crawl_id = ? AND queued > 0 ORDER BY next_turn LIMIT ?",
+                    (self.crawl_id, remaining + len(skipped))
+                ) if row[0] not in skipped][:remaining]
+                if not domains:
+                    break
+                total_weight = sum(weight or 1 for _, weight, _ in domains)
+                self._clock = max(self._clock, domains[0][2])
+                taken = 0
+                for domain, weight, next_turn in domains:
+                    share = min(max(1, int(round(remaining * (weight or 1) / total_weight))), limit - len(claimed))
+                    if share <= 0:
+                        break
+                    rows = self._conn.execute(
+                        "SELECT rowid, url, depth FROM crawl_frontier "
+                        "WHERE crawl_id = ? AND domain = ? AND state = ? AND next_fetch_at <= ? "
+                        "ORDER BY priority DESC, depth, rowid LIMIT ?",
+                        (self.crawl_id, domain, QUEUED, now, share)
+                    ).fetchall()
+                    if len(rows) < share:
+                        skipped.add(domain)
+                    if not rows:
+                        continue
+                    self._conn.executemany(
+                        "UPDATE crawl_frontier SET state = ?, attempts = attempts + 1, updated_at = ? WHERE rowid = ?",
+                        [(IN_PROGRESS, now, row[0]) for row in rows]
+                    )
+                    self._conn.execute(
+                        "UPDATE crawl_domains SET claimed = claimed + ?, queued = queued - ?, next_turn = ? "
+                        "WHERE crawl_id = ? AND domain = ?",
+                        (len(rows), len(rows), next_turn + len(rows) / (weight or 1), self.crawl_id, domain)
+                    )
+                    claimed.extend((url, depth) for _, url, depth in rows)
+                    taken += len(rows)
+        return claimed
+
+    def pop(self, now=None):
+        """Take the next ready URL, or None"""
+        claimed = self.claim(1, now)
+        return claimed[0] if claimed else None
+
+    def _finish(self, url, state):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE crawl_frontier SET state = ?, updated_at = ? WHERE crawl_id = ? AND url = ?",
+                (state, now, self.crawl_id, url)
+            )
+            self._conn.execute(
+                f"UPDATE crawl_domains SET {state} = {state} + 1 WHERE crawl_id = ? AND domain = ?",
+                (self.crawl_id, urlparse(url).netloc.lower())
+            )
+            self._conn.execute(
+                "UPDATE crawl_runs SET pages_crawled = pages_crawled + 1, updated_at = ? WHERE crawl_id = ?",
+                (now, self.crawl_id)
+            )
+
+    def mark_done(self, url):
+        """Record that a URL was fetched"""
+        self._finish(url, DONE)
+
+    def mark_failed(self, url):
+        """Record that fetching a URL failed"""
+        self._finish(url, FAILED)
+
+    def requeue(self, url, next_fetch_at=0):
+        """Put a claimed URL back in the queue, optionally not before next_fetch_at"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT state FROM crawl_frontier WHERE crawl_id = ? AND url = ?", (self.crawl_id, url)
+            ).fetchone()
+            self._conn.execute(
+                "UPDATE crawl_frontier SET state = ?, next_fetch_at = ?, updated_at = ? WHERE crawl_id = ? AND url = ?",
+                (QUEUED, next_fetch_at, time.time(), self.crawl_id, url)
+            )
+            if row and row[0] != QUEUED:
+                self._queue_in(urlparse(url).netloc.lower(), 1)
+
+    def is_seen(self, url):
+        """Check whether a URL is already queued or visited in this crawl"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM crawl_frontier WHERE crawl_id = ? AND url = ?",
+                (self.crawl_id, url)
+            ).fetchone()
+        return row is not None
+
+    __contains__ = is_seen
+
+    def has_pending(self):
+        """Check whether any URLs are still queued or in progress"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM crawl_frontier WHERE crawl_id = ? AND state IN (?, ?) LIMIT 1",
+                (self.crawl_id, QUEUED, IN_PROGRESS)
+            ).fetchone()
+        return row is not None
+
+    def next_ready_time(self):
+        """Earliest next_fetch_at among queued URLs, or None if the queue is empty"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_fetch_at) FROM crawl_frontier WHERE crawl_id = ? AND state = ?",
+                (self.crawl_id, QUEUED)
+            ).fetchone()
+        return row[0] if row else None
+
+    @property
+    def pages_crawled(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pages_crawled FROM crawl_runs WHERE crawl_id = ?", (self.crawl_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def stats(self):
+        """Counts of URLs per state for this crawl"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM crawl_frontier WHERE crawl_id = ? GROUP BY state",
+                (self.crawl_id,)
+            ).fetchall()
+        counts = {QUEUED: 0, IN_PROGRESS: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        counts["crawl_id"] = self.crawl_id
+        counts["pages_crawled"] = self.pages_crawled
+        counts.update(self.budget_stats())
+        return counts
+
+    def domain_stats(self):
+        """Budget counters per domain: {domain: {budget, admitted, claimed, done, failed, over_budget, too_deep}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT domain, weight, budget, admitted, claimed, done, failed, over_budget, too_deep "
+                "FROM crawl_domains WHERE crawl_id = ? ORDER BY claimed DESC, domain",
+                (self.crawl_id,)
+            ).fetchall()
+        return {
+            row[0]: {
+                "weight": row[1],
+                "budget": row[2],
+                "admitted": row[3],
+                "claimed": row[4],
+                "done": row[5],
+                "failed": row[6],
+                "over_budget": row[7],
+                "too_deep": row[8]
+            }
+            for row in rows
+        }
+
+    def budget_stats(self):
+        """Crawl-wide summary of the per-domain budgets"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), "
+                "       SUM(CASE WHEN budget IS NOT NULL AND admitted >= budget THEN 1 ELSE 0 END), "
+                "       SUM(CASE WHEN claimed > 0 THEN 1 ELSE 0 END), "
+                "       COALESCE(SUM(over_budget), 0), COALESCE(SUM(too_deep), 0) "
+                "FROM crawl_domains WHERE crawl_id = ?",
+                (self.crawl_id,)
+            ).fetchone()
+        return {
+            "domains_seen": row[0],
+            "domains_exhausted": row[1] or 0,
+            "domains_crawled": row[2] or 0,
+            "dropped_over_budget": row[3],
+            "dropped_too_deep": row[4]
+        }
+
+    def finish(self, status='completed'):
+        """Mark the crawl run as finished"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE crawl_runs SET status = ?, updated_at = ? WHERE crawl_id = ?",
+                (status, time.time(), self.crawl_id)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,242 @@
+"""
+Background crawl jobs.
+A crawl submitted as a job runs on a bounded pool of worker threads instead of the
+request thread. Clients poll the job for its status and progress (pages crawled,
+results found, ETA), can cancel it, and fetch its results once it has finished, or
+follow it as a stream of events that delivers each result as soon as it is found.
+Only the latest CRAWL_EVENT_BUFFER streamed results are kept for followers; the
+complete results are the job's results. Finished jobs are kept for CRAWL_JOB_TTL
+seconds and then dropped.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('crawl_jobs')
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', '.env'))
+
+CRAWL_JOB_WORKERS = int(os.getenv('CRAWL_JOB_WORKERS', 2))  # crawls running at the same time
+CRAWL_JOB_QUEUE_SIZE = int(os.getenv('CRAWL_JOB_QUEUE_SIZE', 20))  # jobs waiting for a worker
+CRAWL_JOB_TTL = int(os.getenv('CRAWL_JOB_TTL', 3600))  # seconds finished jobs are kept
+PROGRESS_EVENT_INTERVAL = float(os.getenv('CRAWL_PROGRESS_INTERVAL', 2))  # seconds between progress events
+EVENT_BUFFER_SIZE = int(os.getenv('CRAWL_EVENT_BUFFER', 1000))  # latest published results kept for followers
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = 'queued', 'running', 'completed', 'failed', 'cancelled'
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while CRAWL_JOB_QUEUE_SIZE jobs are already waiting"""
+
+class CrawlJob:
+    """State, progress and results of one submitted crawl"""
+
+    def __init__(self, job_id, params, max_pages=None):
+        self.id = job_id
+        self.params = params
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.max_pages = max_pages
+        self.pages_crawled = 0
+        self.results_found = 0
+        self.results = None
+        self.error = None
+        self.published = 0  # results published while the crawl runs
+        self.discovered = deque(maxlen=EVENT_BUFFER_SIZE)  # the latest of them, in discovery order
+        self.cancel_event = threading.Event()
+        self._changed = threading.Condition()
+        self._future = None
+
+    def update_progress(self, pages_crawled, results_found):
+        """Progress callback for the crawler: called after every page"""
+        self.pages_crawled = pages_crawled
+        self.results_found = results_found
+
+    def publish(self, result):
+        """Hand a result to the clients following the job's events"""
+        with self._changed:
+            self.discovered.append(result)
+            self.published += 1
+            self._changed.notify_all()
+
+    def _finish(self, status):
+        with self._changed:
+            self.status = status
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def eta(self):
+        """Estimated seconds until a running job has crawled max_pages, or None"""
+        if self.status != RUNNING or not self.max_pages or not self.pages_crawled:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining = max(self.max_pages - self.pages_crawled, 0)
+        return round(elapsed / self.pages_crawled * remaining, 1)
+
+    def progress(self):
+        return {
+            "pages_crawled": self.pages_crawled,
+            "max_pages": self.max_pages,
+            "results_found": self.results_found,
+            "eta_seconds": self.eta()
+        }
+
+    def to_dict(self):
+        """Status of the job, without its results"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress(),
+            "result_count": len(self.results) if self.results is not None else None,
+            "error": self.error
+        }
+
+    def iter_events(self, after=0, interval=PROGRESS_EVENT_INTERVAL):
+        """
+        Follow the job: yields ("result", number, result) for every published result
+        after the first `after` ones as soon as it arrives, ("progress", None, progress)
+        every interval seconds while the job runs, and finally ("done", None, status).
+        Results a follower fell too far behind to get from the buffer are reported as
+        ("skipped", number, {"skipped": count}); they are in the job's results.
+        """
+        sent = after
+        next_progress = 0
+        while True:
+            with self._changed:
+                if sent >= self.published and not self.finished:
+                    self._changed.wait(max(next_progress - time.monotonic(), 0))
+                published = self.published
+                first = published - len(self.discovered)  # number of results before the buffer
+                new = list(islice(self.discovered, max(sent - first, 0), None))
+                finished = self.finished
+            if sent < first:
+                skipped, sent = first - sent, first
+                yield "skipped", sent, {"skipped": skipped}
+            for result in new:
+                sent += 1
+                yield "result", sent, result
+            if finished:
+                yield "done", None, self.to_dict()
+                return
+            if time.monotonic() >= next_progress:
+                yield "progress", None, dict(self.progress(), status=self.status)
+                next_progress = time.monotonic() + interval
+
+class CrawlJobManager:
+    """Runs crawl jobs on a thread pool and keeps them until their TTL expires"""
+
+    def __init__(self, workers=CRAWL_JOB_WORKERS, queue_size=CRAWL_JOB_QUEUE_SIZE, ttl=CRAWL_JOB_TTL):
+        self.ttl = ttl
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawl-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id, run, params=None, max_pages=None):
+        """
+        Queue run(job) as a job; its return value becomes the job's results. run should
+        pass job.update_progress and job.cancel_event on to the crawler, and hand each
+        result it finds to job.publish.
+        """
+        job = CrawlJob(job_id, params or {}, max_pages)
+        with self._lock:
+            self._prune()
+            queued = sum(1 for other in self._jobs.values() if other.status == QUEUED)
+            if queued >= self.queue_size:
+                raise JobQueueFull(f"{queued} crawl jobs are already waiting")
+            self._jobs[job.id] = job
+            job._future = self._executor.submit(self._run, job, run)
+        logger.info(f"Queued crawl job {job.id}")
+        return job
+
+    def _run(self, job, run):
+        with self._lock:
+            if job.cancelled:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            results = run(job)
+            job.results = results if results is not None else []
+            job.results_found = len(job.results)
+            job._finish(CANCELLED if job.cancelled else COMPLETED)
+        except Exception as e:
+            logger.error(f"Crawl job {job.id} failed: {e}")
+            job.error = str(e)
+            job._finish(FAILED)
+        logger.info(f"Crawl job {job.id} {job.status} with {job.results_found} results")
+
+    def get(self, job_id):
+        """The job with this ID, or None if it doesn't exist or has expired"""
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """Every job that hasn't expired, newest first"""
+        with self._lock:
+            self._prune()
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: a queued job never starts, and a running crawl stops after its
+        current page, keeping the results found so far. Returns the job, or None.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                job._future.cancel()
+                job._finish(CANCELLED)
+        logger.info(f"Cancelling crawl job {job_id}")
+        return job
+
+    def _prune(self):
+        """Drop finished jobs older than the TTL (called with the lock held)"""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        """Cancel every unfinished job and wait for the running ones to stop"""
+        for job in self.list():
+            self.cancel(job.id)
+        self._executor.shutdown(wait=True)
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Process-wide crawl job manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = CrawlJobManager()
+        return _manager
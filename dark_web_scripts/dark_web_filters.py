@@ -1,10 +1,17 @@
 import json
-import re
 import os
+import sys
+import gzip
+import heapq
 import datetime
+import itertools
 from dotenv import load_dotenv
 import logging
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dark_web_scripts.keyword_sets import get_keyword_set
+from dark_web_scripts.enrichment_cache import cached_risk, cached_signals
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('dark_web_filters')
@@ -12,111 +19,26 @@ logger = logging.getLogger('dark_web_filters')
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', '.env'))
 
-# Get keywords from environment or use defaults
-def get_illegal_keywords():
-    env_keywords = os.getenv('ILLEGAL_KEYWORDS')
-    if env_keywords:
-        try:
-            return json.loads(env_keywords)
-        except:
-            pass
-    
-    # Default keywords if not in environment
-    return [
-        # Drugs
-        "drugs", "cocaine", "heroin", "fentanyl", "mdma", "ecstasy", "meth", "amphetamine", 
-        "lsd", "cannabis", "marijuana", "weed", "ketamine", "opioids", "steroids", "pills",
-        
-        # Weapons
-        "weapons", "guns", "firearms", "pistol", "rifle", "ammunition", "ammo", "explosives",
-        "grenades", "knives", "tactical", "silencer", "suppressor", "armor", "bulletproof",
-        
-        # Hacking
-        "hacking", "malware", "ransomware", "spyware", "botnet", "ddos", "phishing", "exploit",
-        "vulnerability", "zero-day", "rootkit", "keylogger", "cracking", "breach", "backdoor",
-        
-        # Counterfeit
-        "counterfeit", "fake", "forged", "documents", "passports", "id cards", "driver license",
-        "credit cards", "currency", "money", "bills", "banknotes", "hologram", "clone",
-        
-        # Financial crimes
-        "carding", "dumps", "cvv", "fullz", "bank drops", "money laundering", "bitcoin tumbler",
-        "crypto mixer", "paypal accounts", "wire transfer", "western union", "bank login",
-        
-        # Illegal services
-        "hitman", "murder", "assassination", "kidnapping", "torture", "human trafficking",
-        "organ trafficking", "smuggling", "bribery", "extortion", "blackmail", "fraud",
-        
-        # Data
-        "stolen data", "leaked database", "hacked accounts", "personal information", "doxing",
-        "social security", "medical records", "financial data", "corporate secrets", "credentials",
-        
-        # Other illegal content
-        "child", "underage", "abuse", "exploitation", "rape", "snuff", "torture", "terrorism",
-        "extremist", "jihad", "bomb making", "suicide", "genocide", "violence"
-    ]
+# Sites filtered at a time when streaming (large enough for the column-wise batch path)
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_FILTER_CHUNK_SIZE', 5000))
+READ_CHUNK_SIZE = 1 << 20  # characters read at a time from a JSON array file
+
+def get_illegal_keywords(keyword_set=None):
+    """Default filter keywords of a keyword set (the current one by default)"""
+    return list((keyword_set or get_keyword_set()).illegal_keywords)
 
-# Risk categories with weights
-RISK_CATEGORIES = {
-    "drugs": {
-        "weight": 60,
-        "keywords": [
-            "drugs", "cocaine", "heroin", "fentanyl", "mdma", "ecstasy", "meth", "amphetamine", 
-            "lsd", "cannabis", "marijuana", "weed", "ketamine", "opioids", "steroids", "pills"
-        ]
-    },
-    "weapons": {
-        "weight": 80,
-        "keywords": [
-            "weapons", "guns", "firearms", "pistol", "rifle", "ammunition", "ammo", "explosives",
-            "grenades", "knives", "tactical", "silencer", "suppressor", "armor", "bulletproof"
-        ]
-    },
-    "hacking": {
-        "weight": 50,
-        "keywords": [
-            "hacking", "malware", "ransomware", "spyware", "botnet", "ddos", "phishing", "exploit",
-            "vulnerability", "zero-day", "rootkit", "keylogger", "cracking", "breach", "backdoor"
-        ]
-    },
-    "counterfeit": {
-        "weight": 60,
-        "keywords": [
-            "counterfeit", "fake", "forged", "documents", "passports", "id cards", "driver license",
-            "credit cards", "currency", "money", "bills", "banknotes", "hologram", "clone"
-        ]
-    },
-    "financial_crime": {
-        "weight": 70,
-        "keywords": [
-            "carding", "dumps", "cvv", "fullz", "bank drops", "money laundering", "bitcoin tumbler",
-            "crypto mixer", "paypal accounts", "wire transfer", "western union", "bank login"
-        ]
-    },
-    "illegal_services": {
-        "weight": 90,
-        "keywords": [
-            "hitman", "murder", "assassination", "kidnapping", "torture", "human trafficking",
-            "organ trafficking", "smuggling", "bribery", "extortion", "blackmail", "fraud"
-        ]
-    },
-    "data_breach": {
-        "weight": 65,
-        "keywords": [
-            "stolen data", "leaked database", "hacked accounts", "personal information", "doxing",
-            "social security", "medical records", "financial data", "corporate secrets", "credentials"
-        ]
-    },
-    "extreme_illegal": {
-        "weight": 100,
-        "keywords": [
-            "child", "underage", "abuse", "exploitation", "rape", "snuff", "torture", "terrorism",
-            "extremist", "jihad", "bomb making", "suicide", "genocide", "violence"
-        ]
-    }
-}
+def site_text(site):
+    """Title, description and content of a site joined for keyword matching"""
+    text_to_analyze = ""
+    if "title" in site:
+        text_to_analyze += site["title"] + " "
+    if "description" in site:
+        text_to_analyze += site["description"] + " "
+    if "content" in site:
+        text_to_analyze += site["content"]
+    return text_to_analyze
 
-def calculate_risk_score(content, title=None):
+def calculate_risk_score(content, title=None, keyword_set=None):
     """
     Calculate a risk score (0-100) based on content and title
     Higher score = higher risk
@@ -130,117 +52,41 @@ def calculate_risk_score(content, title=None):
     else:
         full_text = content.lower()
     
-    # Initialize score and matched categories
-    base_score = 0
-    matched_categories = {}
-    
-    # Check each category
-    for category, data in RISK_CATEGORIES.items():
-        category_matches = []
-        for keyword in data["keywords"]:
-            # Look for whole word matches
-            pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-            matches = re.findall(pattern, full_text)
-            if matches:
-                category_matches.extend(matches)
-        
-        # If we found matches in this category
-        if category_matches:
-            # Calculate category score based on number of matches and category weight
-            category_score = min(100, len(category_matches) * data["weight"] / 5)
-            matched_categories[category] = {
-                "score": category_score,
-                "matches": category_matches
-            }
-            
-            # Add to base score (weighted by category importance)
-            base_score += category_score * (data["weight"] / 100)
-    
-    # Normalize final score to 0-100 range
-    final_score = min(100, base_score)
-    
-    return {
-        "score": round(final_score),
-        "categories": matched_categories
-    }
+    return cached_risk(full_text, keyword_set)
 
-def categorize_site(site):
+def categorize_site(site, keyword_set=None):
     """Categorize a site based on its content"""
-    # Default category
-    category = "unknown"
-    
-    # Extract text to analyze
-    text_to_analyze = ""
-    if "title" in site:
-        text_to_analyze += site["title"] + " "
-    if "description" in site:
-        text_to_analyze += site["description"] + " "
-    if "content" in site:
-        text_to_analyze += site["content"]
-    
-    text_to_analyze = text_to_analyze.lower()
-    
-    # Check for category matches
-    category_matches = {}
-    
-    for category, data in RISK_CATEGORIES.items():
-        matches = 0
-        for keyword in data["keywords"]:
-            if keyword.lower() in text_to_analyze:
-                matches += 1
-        
-        if matches > 0:
-            category_matches[category] = matches
-    
-    # Determine primary category (the one with most matches)
-    if category_matches:
-        primary_category = max(category_matches.items(), key=lambda x: x[1])[0]
-        return primary_category
-    
-    return category
+    return cached_signals(site_text(site), keyword_set)["category"]
 
-def is_seller_profile(site):
+def is_seller_profile(site, keyword_set=None):
     """Determine if a site is likely a seller profile"""
-    seller_indicators = [
-        "vendor", "seller", "shop", "store", "market", "price", "pricing", "cost",
-        "shipping", "payment", "bitcoin", "btc", "monero", "xmr", "escrow", "buy",
-        "purchase", "order", "checkout", "cart", "product", "listing", "feedback",
-        "rating", "review", "trusted", "verified", "pgp", "contact"
-    ]
-    
-    # Extract text to analyze
-    text_to_analyze = ""
-    if "title" in site:
-        text_to_analyze += site["title"] + " "
-    if "description" in site:
-        text_to_analyze += site["description"] + " "
-    if "content" in site:
-        text_to_analyze += site["content"]
-    
-    text_to_analyze = text_to_analyze.lower()
-    
-    # Count seller indicators
-    indicator_count = sum(1 for indicator in seller_indicators if indicator in text_to_analyze)
-    
-    # If more than 3 indicators are found, it's likely a seller
-    return indicator_count >= 3
+    return cached_signals(site_text(site), keyword_set)["is_seller"]
 
 def filter_sites(sites, keywords=None, geo_location=None, date_range=None, 
                 risk_threshold=None, seller_only=False, country=None, 
-                state=None, district=None, category=None):
+                state=None, district=None, category=None, keyword_set=None):
     """
     Filter sites based on multiple criteria
     """
     if not sites:
         return []
+    
+    # One keyword set for the whole run, even if the file is reloaded meanwhile
+    keyword_set = keyword_set or get_keyword_set()
         
     # If no keywords provided, use default illegal keywords
     if not keywords:
-        keywords = get_illegal_keywords()
+        keywords = get_illegal_keywords(keyword_set)
     elif isinstance(keywords, str):
         # Convert comma-separated string to list
         keywords = [k.strip() for k in keywords.split(',')]
     
+    # Large result sets are scored and filtered column-wise
+    from dark_web_scripts import batch_filters
+    if batch_filters.PANDAS_AVAILABLE and len(sites) >= batch_filters.BATCH_MIN_RECORDS:
+        return batch_filters.filter_sites_batch(sites, keywords, geo_location, date_range, risk_threshold,
+                                                seller_only, country, state, district, category, keyword_set)
+    
     # Get risk thresholds from environment
     low_risk = int(os.getenv('LOW_RISK_THRESHOLD', 30))
     medium_risk = int(os.getenv('MEDIUM_RISK_THRESHOLD', 60))
@@ -261,7 +107,7 @@ def filter_sites(sites, keywords=None, geo_location=None, date_range=None,
         if "risk_score" not in site or not isinstance(site["risk_score"], dict):
             content = site.get("content", site.get("description", ""))
             title = site.get("title", "")
-            risk_data = calculate_risk_score(content, title)
+            risk_data = calculate_risk_score(content, title, keyword_set)
             site["risk_score"] = risk_data["score"]
             site["risk_categories"] = risk_data["categories"]
         
@@ -306,7 +152,7 @@ def filter_sites(sites, keywords=None, geo_location=None, date_range=None,
             is_seller = site.get("is_seller", False)
             if not is_seller:
                 # If not already determined, check if it's a seller
-                is_seller = is_seller_profile(site)
+                is_seller = is_seller_profile(site, keyword_set)
                 site["is_seller"] = is_seller
             
             if not is_seller:
@@ -328,7 +174,7 @@ def filter_sites(sites, keywords=None, geo_location=None, date_range=None,
         if category:
             # Determine category if not already present
             if "category" not in site:
-                site["category"] = categorize_site(site)
+                site["category"] = categorize_site(site, keyword_set)
             
             if category.lower() != site["category"].lower():
                 continue
@@ -341,18 +187,142 @@ def filter_sites(sites, keywords=None, geo_location=None, date_range=None,
     
     return filtered_sites
 
-def load_and_filter_sites(file_path='sample_sites.json', keywords=None, risk_threshold=None):
+def iter_site_records(file_path, read_size=READ_CHUNK_SIZE):
     """
-    Load sites from a JSON file and filter them
+    Yield the site dicts of a JSON array file or a JSON Lines file (optionally .gz)
+    one at a time, without loading the whole file
     """
-    try:
-        with open(file_path, 'r') as f:
-            sites = json.load(f)
-        
-        if not keywords:
-            keywords = get_illegal_keywords()
+    opener = gzip.open if file_path.endswith('.gz') else open
+    with opener(file_path, 'rt', encoding='utf-8') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        if first != '[':
+            # JSON Lines: one site per line
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer, position = '', 0
+        at_eof = False
+        expect_value = True
+        while True:
+            # Skip whitespace and the separator between values, reading more when the buffer runs out
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n':
+                    position += 1
+                if position < len(buffer) or at_eof:
+                    break
+                buffer, position = f.read(read_size), 0
+                at_eof = not buffer
+            if position >= len(buffer):
+                raise ValueError(f"Unexpected end of JSON array in {file_path}")
+            if buffer[position] == ']':
+                return
+            if not expect_value:
+                if buffer[position] != ',':
+                    raise ValueError(f"Expected ',' or ']' in JSON array in {file_path}")
+                position += 1
+                expect_value = True
+                continue
+
+            # Decode the next value; a value that runs to the end of the buffer may be incomplete
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                complete = end < len(buffer) or at_eof
+            except json.JSONDecodeError:
+                if at_eof:
+                    raise
+                complete = False
+            if not complete:
+                more = f.read(max(read_size, len(buffer) - position))
+                at_eof = not more
+                buffer, position = buffer[position:] + more, 0
+                continue
+            yield value
+            position = end
+            expect_value = False
+
+def iter_filter_sites(sites, keywords=None, geo_location=None, date_range=None,
+                      risk_threshold=None, seller_only=False, country=None,
+                      state=None, district=None, category=None, chunk_size=STREAM_CHUNK_SIZE,
+                      keyword_set=None):
+    """
+    Generator version of filter_sites for any iterable of sites: yields the filtered,
+    enriched sites in input order, holding only chunk_size sites at a time. Every
+    chunk is scored with the keyword set that was current when the stream started.
+    """
+    keyword_set = keyword_set or get_keyword_set()
+    if not keywords:
+        keywords = get_illegal_keywords(keyword_set)
+    elif isinstance(keywords, str):
+        keywords = [k.strip() for k in keywords.split(',')]
+    
+    sites = iter(sites)
+    skipped = 0
+    while True:
+        chunk = list(itertools.islice(sites, chunk_size))
+        if not chunk:
+            break
+        records = [site for site in chunk if isinstance(site, dict)]
+        skipped += len(chunk) - len(records)
         
-        filtered_sites = filter_sites(sites, keywords, risk_threshold=risk_threshold)
+        # filter_sites returns the chunk highest risk first; put it back in input order
+        positions = {id(site): position for position, site in enumerate(records)}
+        filtered = filter_sites(records, keywords, geo_location, date_range, risk_threshold,
+                                seller_only, country, state, district, category, keyword_set)
+        filtered.sort(key=lambda site: positions[id(site)])
+        yield from filtered
+    
+    if skipped:
+        logger.warning(f"Skipped {skipped} records that are not site objects")
+
+def top_risk_sites(sites, k):
+    """
+    The k highest-risk sites, highest first (ties in input order), keeping at most k
+    sites in memory: the same as sorting every site by risk and taking the first k
+    """
+    if k <= 0:
+        return []
+    heap = []
+    for sequence, site in enumerate(sites):
+        item = (site["risk_score"], -sequence, site)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    return [site for _, _, site in sorted(heap, key=lambda item: item[:2], reverse=True)]
+
+def stream_filter_sites(file_path, keywords=None, risk_threshold=None, top_k=None, workers=None, **filters):
+    """
+    Filter the sites of a JSON array or JSON Lines file as they are read. Yields the
+    filtered sites in file order, or with top_k only the top_k highest-risk ones,
+    highest first. With workers > 1 the sites are filtered by a process pool. Other
+    filter_sites arguments can be passed as keywords.
+    """
+    if workers and workers > 1:
+        from dark_web_scripts.parallel_filters import iter_parallel_filter_sites
+        filtered = iter_parallel_filter_sites(iter_site_records(file_path), keywords, risk_threshold=risk_threshold,
+                                              workers=workers, **filters)
+    else:
+        filtered = iter_filter_sites(iter_site_records(file_path), keywords, risk_threshold=risk_threshold, **filters)
+    if top_k is None:
+        yield from filtered
+    else:
+        yield from top_risk_sites(filtered, top_k)
+
+def load_and_filter_sites(file_path='sample_sites.json', keywords=None, risk_threshold=None, top_k=None,
+                          workers=None):
+    """
+    Load sites from a JSON (or JSON Lines) file and filter them, highest risk first
+    """
+    try:
+        filtered_sites = list(stream_filter_sites(file_path, keywords, risk_threshold, top_k, workers))
+        if top_k is None:
+            filtered_sites.sort(key=lambda x: x["risk_score"], reverse=True)
         return filtered_sites
     except Exception as e:
         logger.error(f"Error loading and filtering sites: {e}")
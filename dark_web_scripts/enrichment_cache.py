@@ -0,0 +1,254 @@
+"""
+Enrichment cache for the Dark Web filters.
+Scoring results are keyed by a hash of the text they were computed from plus the
+version of the keyword set they were scored with, so a page is only scored again
+when its title, description or content changes, or when the rules do. Entries live in an
+in-memory LRU backed by the SQLite database configured by ENRICHMENT_CACHE_PATH,
+which keeps the cache warm across restarts.
+"""
+import os
+import sys
+import json
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dark_web_scripts.keyword_sets import get_keyword_set
+from dark_web_scripts.scoring import risk_from_scan, category_from_matches, seller_from_matches, score_site
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enrichment_cache')
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+# An empty ENRICHMENT_CACHE_PATH keeps the cache in memory only
+CACHE_DB_PATH = os.getenv('ENRICHMENT_CACHE_PATH', os.path.join(BACKEND_DIR, 'data', 'enrichment_cache.db'))
+CACHE_MAX_ENTRIES = int(os.getenv('ENRICHMENT_CACHE_SIZE', 50000))
+FLUSH_EVERY = 500  # new entries are written to disk in batches of this size
+LOOKUP_CHUNK = 500  # keys per SQLite IN (...) lookup
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrichment_cache (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+"""
+
+def content_key(kind, *parts, keyword_set=None):
+    """Cache key for a result of the given kind computed from parts with keyword_set (default: current)"""
+    version = (keyword_set or get_keyword_set()).version
+    digest = hashlib.blake2b(f"{kind}:{version}".encode('utf-8'), digest_size=16)
+    for part in parts:
+        if part is None:
+            digest.update(b"\0-")
+            continue
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True)
+        data = part.encode('utf-8', errors='surrogatepass')
+        # Length prefix so ("ab", "c") and ("a", "bc") hash differently
+        digest.update(b"\0%d:" % len(data))
+        digest.update(data)
+    return digest.hexdigest()
+
+class EnrichmentCache:
+    """
+    LRU of JSON-encoded results in front of a SQLite table. get() always returns a
+    fresh copy, so callers can attach results to their records and modify them.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.db_path = str(db_path) if db_path else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> JSON text, most recently used last
+        self._pending = {}  # key -> (version, JSON text) not yet written to disk
+        self._conn = None
+        if self.db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.executescript(SCHEMA)
+                self._prune()
+            except sqlite3.Error as e:
+                logger.warning(f"Enrichment cache database {self.db_path} unavailable, using memory only: {e}")
+                self._conn = None
+            atexit.register(self.flush)
+
+    def _prune(self):
+        """Drop entries computed under other keyword-set versions"""
+        with self._conn:
+            cursor = self._conn.execute("DELETE FROM enrichment_cache WHERE version != ?",
+                                        (get_keyword_set().version,))
+        if cursor.rowcount:
+            logger.info(f"Dropped {cursor.rowcount} stale enrichment cache entries")
+
+    def _remember(self, key, text):
+        """Add to the LRU; caller holds the lock"""
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """Cached values for keys, in order, with None for keys that aren't cached"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                text = self._memory.get(key)
+                if text is None and key in self._pending:
+                    text = self._pending[key][1]
+                if text is not None:
+                    self._memory[key] = text
+                    self._memory.move_to_end(key)
+                    found[key] = text
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            if missing and self._conn is not None:
+                for start in range(0, len(missing), LOOKUP_CHUNK):
+                    chunk = missing[start:start + LOOKUP_CHUNK]
+                    rows = self._conn.execute(
+                        f"SELECT key, value FROM enrichment_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall()
+                    for key, text in rows:
+                        found[key] = text
+                        self._remember(key, text)
+                    self.disk_hits += len(rows)
+
+            values = [found.get(key) for key in keys]
+            hit_count = sum(1 for text in values if text is not None)
+            self.hits += hit_count
+            self.misses += len(values) - hit_count
+        return [json.loads(text) if text is not None else None for text in values]
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        return self.get_many([key])[0]
+
+    def put_many(self, items, version=None):
+        """
+        Store (key, value) pairs scored under a keyword set version (default: the
+        current one); values must be JSON-serializable
+        """
+        version = version or get_keyword_set().version
+        with self._lock:
+            for key, value in items:
+                text = json.dumps(value)
+                self._remember(key, text)
+                if self._conn is not None:
+                    self._pending[key] = (version, text)
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def put(self, key, value, version=None):
+        self.put_many([(key, value)], version)
+
+    def _flush(self):
+        """Write pending entries to disk; caller holds the lock"""
+        if not self._pending or self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO enrichment_cache (key, version, value) VALUES (?, ?, ?)",
+                    [(key, version, text) for key, (version, text) in self._pending.items()]
+                )
+            self._pending.clear()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing enrichment cache: {e}")
+
+    def flush(self):
+        """Write any entries still held in memory only to disk"""
+        with self._lock:
+            self._flush()
+
+    def clear(self):
+        """Remove every entry, in memory and on disk"""
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM enrichment_cache")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "pending_writes": len(self._pending),
+                "version": get_keyword_set().version
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_enrichment_cache():
+    """The process-wide enrichment cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EnrichmentCache()
+        return _cache
+
+def risk_key(full_text, keyword_set=None):
+    return content_key("risk", full_text, keyword_set=keyword_set)
+
+def signals_key(text, keyword_set=None):
+    return content_key("signals", text, keyword_set=keyword_set)
+
+def cached_risk(full_text, keyword_set=None):
+    """calculate_risk_score's result for already lowercased "title content" text"""
+    keyword_set = keyword_set or get_keyword_set()
+    cache = get_enrichment_cache()
+    key = risk_key(full_text, keyword_set)
+    risk = cache.get(key)
+    if risk is None:
+        risk = risk_from_scan(keyword_set.matcher().scan(full_text, lowered=True), keyword_set)
+        cache.put(key, risk, keyword_set.version)
+    return risk
+
+def cached_signals(text, keyword_set=None):
+    """Category and seller flag of a site's "title description content" text, from one scan"""
+    keyword_set = keyword_set or get_keyword_set()
+    cache = get_enrichment_cache()
+    key = signals_key(text, keyword_set)
+    signals = cache.get(key)
+    if signals is None:
+        scan = keyword_set.matcher().scan(text)
+        signals = {
+            "category": category_from_matches(scan.contains, keyword_set),
+            "is_seller": seller_from_matches(scan.contains, keyword_set) >= keyword_set.seller_threshold
+        }
+        cache.put(key, signals, keyword_set.version)
+    return signals
+
+def cached_score_site(site, keywords=None, keyword_set=None):
+    """score_site, reusing the stored result while the record's text is unchanged"""
+    keyword_set = keyword_set or get_keyword_set()
+    cache = get_enrichment_cache()
+    key = content_key("site", site.get("title"), site.get("description"), site.get("content"),
+                      site.get("content_sample"), site.get("country"), list(keywords or []),
+                      keyword_set=keyword_set)
+    scores = cache.get(key)
+    if scores is None:
+        scores = score_site(site, keywords, keyword_set)
+        cache.put(key, scores, keyword_set.version)
+    return scores
@@ -0,0 +1,309 @@
+"""
+Gazetteer of countries, regions and cities for location extraction.
+Place names and their aliases are compiled into a token trie keyed by each name's
+first word, so finding every place mentioned in a page is one pass over its words:
+a word that starts no place name costs a single dict lookup, whatever the size of
+the gazetteer. The built-in gazetteer covers the countries and the regions/cities
+the crawler has always recognised; GAZETTEER_PATH loads a larger one from a JSON or
+JSON Lines file, whose compiled form is cached at GAZETTEER_CACHE_PATH so it is only
+compiled again when the file changes.
+"""
+import os
+import re
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('gazetteer')
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+# Entries are {"name", "type": country|region|city, "country", "region", "iso", "aliases"}
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', '')
+# An empty GAZETTEER_CACHE_PATH compiles the gazetteer on every start
+GAZETTEER_CACHE_PATH = os.getenv('GAZETTEER_CACHE_PATH', os.path.join(BACKEND_DIR, 'data', 'gazetteer.cache'))
+CACHE_FORMAT = 1  # bump when the compiled layout changes
+
+ENTRY_TYPES = ("country", "region", "city")
+WORD_SPLIT_RE = re.compile(r'(\w+)')
+SPACE_RE = re.compile(r'\s+')
+
+# Countries and their ISO 3166-1 alpha-2 codes; when a page names several countries,
+# the first one in this order wins
+COUNTRY_CODES = {
+    "Afghanistan": "AF", "Albania": "AL", "Algeria": "DZ", "Andorra": "AD", "Angola": "AO",
+    "Argentina": "AR", "Armenia": "AM", "Australia": "AU", "Austria": "AT", "Azerbaijan": "AZ",
+    "Bahamas": "BS", "Bahrain": "BH", "Bangladesh": "BD", "Barbados": "BB", "Belarus": "BY",
+    "Belgium": "BE", "Belize": "BZ", "Benin": "BJ", "Bhutan": "BT", "Bolivia": "BO", "Bosnia": "BA",
+    "Botswana": "BW", "Brazil": "BR", "Brunei": "BN", "Bulgaria": "BG", "Burkina Faso": "BF",
+    "Burundi": "BI", "Cambodia": "KH", "Cameroon": "CM", "Canada": "CA", "Cape Verde": "CV",
+    "Central African Republic": "CF", "Chad": "TD", "Chile": "CL", "China": "CN", "Colombia": "CO",
+    "Comoros": "KM", "Congo": "CG", "Costa Rica": "CR", "Croatia": "HR", "Cuba": "CU", "Cyprus": "CY",
+    "Czech Republic": "CZ", "Denmark": "DK", "Djibouti": "DJ", "Dominica": "DM",
+    "Dominican Republic": "DO", "East Timor": "TL", "Ecuador": "EC", "Egypt": "EG", "El Salvador": "SV",
+    "Equatorial Guinea": "GQ", "Eritrea": "ER", "Estonia": "EE", "Eswatini": "SZ", "Ethiopia": "ET",
+    "Fiji": "FJ", "Finland": "FI", "France": "FR", "Gabon": "GA", "Gambia": "GM", "Georgia": "GE",
+    "Germany": "DE", "Ghana": "GH", "Greece": "GR", "Grenada": "GD", "Guatemala": "GT", "Guinea": "GN",
+    "Guinea-Bissau": "GW", "Guyana": "GY", "Haiti": "HT", "Honduras": "HN", "Hungary": "HU",
+    "Iceland": "IS", "India": "IN", "Indonesia": "ID", "Iran": "IR", "Iraq": "IQ", "Ireland": "IE",
+    "Israel": "IL", "Italy": "IT", "Jamaica": "JM", "Japan": "JP", "Jordan": "JO", "Kazakhstan": "KZ",
+    "Kenya": "KE", "Kiribati": "KI", "Korea": "KR", "Kosovo": "XK", "Kuwait": "KW", "Kyrgyzstan": "KG",
+    "Laos": "LA", "Latvia": "LV", "Lebanon": "LB", "Lesotho": "LS", "Liberia": "LR", "Libya": "LY",
+    "Liechtenstein": "LI", "Lithuania": "LT", "Luxembourg": "LU", "Madagascar": "MG", "Malawi": "MW",
+    "Malaysia": "MY", "Maldives": "MV", "Mali": "ML", "Malta": "MT", "Marshall Islands": "MH",
+    "Mauritania": "MR", "Mauritius": "MU", "Mexico": "MX", "Micronesia": "FM", "Moldova": "MD",
+    "Monaco": "MC", "Mongolia": "MN", "Montenegro": "ME", "Morocco": "MA", "Mozambique": "MZ",
+    "Myanmar": "MM", "Namibia": "NA", "Nauru": "NR", "Nepal": "NP", "Netherlands": "NL",
+    "New Zealand": "NZ", "Nicaragua": "NI", "Niger": "NE", "Nigeria": "NG", "North Macedonia": "MK",
+    "Norway": "NO", "Oman": "OM", "Pakistan": "PK", "Palau": "PW", "Palestine": "PS", "Panama": "PA",
+    "Papua New Guinea": "PG", "Paraguay": "PY", "Peru": "PE", "Philippines": "PH", "Poland": "PL",
+    "Portugal": "PT", "Qatar": "QA", "Romania": "RO", "Russia": "RU", "Rwanda": "RW",
+    "Saint Kitts and Nevis": "KN", "Saint Lucia": "LC", "Saint Vincent and the Grenadines": "VC",
+    "Samoa": "WS", "San Marino": "SM", "Sao Tome and Principe": "ST", "Saudi Arabia": "SA",
+    "Senegal": "SN", "Serbia": "RS", "Seychelles": "SC", "Sierra Leone": "SL", "Singapore": "SG",
+    "Slovakia": "SK", "Slovenia": "SI", "Solomon Islands": "SB", "Somalia": "SO", "South Africa": "ZA",
+    "South Sudan": "SS", "Spain": "ES", "Sri Lanka": "LK", "Sudan": "SD", "Suriname": "SR",
+    "Sweden": "SE", "Switzerland": "CH", "Syria": "SY", "Taiwan": "TW", "Tajikistan": "TJ",
+    "Tanzania": "TZ", "Thailand": "TH", "Togo": "TG", "Tonga": "TO", "Trinidad and Tobago": "TT",
+    "Tunisia": "TN", "Turkey": "TR", "Turkmenistan": "TM", "Tuvalu": "TV", "Uganda": "UG",
+    "Ukraine": "UA", "United Arab Emirates": "AE", "United Kingdom": "GB", "USA": "US",
+    "Uruguay": "UY", "Uzbekistan": "UZ", "Vanuatu": "VU", "Vatican City": "VA", "Venezuela": "VE",
+    "Vietnam": "VN", "Yemen": "YE", "Zambia": "ZM", "Zimbabwe": "ZW"
+}
+COUNTRY_ALIASES = {"USA": ["United States"]}
+
+# States/regions and their districts/cities, per country
+LOCATION_DATA = {
+    'USA': {
+        'states': {
+            'California': ['Los Angeles', 'San Francisco', 'San Diego', 'Sacramento'],
+            'New York': ['New York City', 'Buffalo', 'Albany', 'Rochester'],
+            'Texas': ['Austin', 'Houston', 'Dallas', 'San Antonio'],
+            'Florida': ['Miami', 'Orlando', 'Tampa', 'Jacksonville']
+        }
+    },
+    'Russia': {
+        'states': {
+            'Moscow Oblast': ['Moscow', 'Khimki', 'Podolsk'],
+            'Saint Petersburg': ['Saint Petersburg', 'Pushkin', 'Peterhof']
+        }
+    },
+    'Germany': {
+        'states': {
+            'Bavaria': ['Munich', 'Nuremberg', 'Augsburg'],
+            'Berlin': ['Berlin'],
+            'North Rhine-Westphalia': ['Cologne', 'Düsseldorf', 'Dortmund']
+        }
+    }
+}
+
+def builtin_entries():
+    """Gazetteer entries for the built-in countries, regions and cities"""
+    entries = [{"name": name, "type": "country", "iso": code, "aliases": COUNTRY_ALIASES.get(name, [])}
+               for name, code in COUNTRY_CODES.items()]
+    for country, country_info in LOCATION_DATA.items():
+        for region, cities in country_info['states'].items():
+            entries.append({"name": region, "type": "region", "country": country})
+            entries.extend({"name": city, "type": "city", "country": country, "region": region} for city in cities)
+    return entries
+
+def _name_key(parts):
+    """
+    Trie key of a split name or text span (alternating separators and words): the
+    words joined by their separators, with runs of whitespace as one space
+    """
+    key = parts[1]
+    for index in range(3, len(parts), 2):
+        separator = parts[index - 1]
+        key += separator if separator == ' ' else SPACE_RE.sub(' ', separator)
+        key += parts[index]
+    return key
+
+class Gazetteer:
+    """
+    Compiled gazetteer. entries[i] is (type, name, country, region, iso); a lower index
+    means a higher priority when several places of the same type are mentioned.
+    """
+
+    def __init__(self, entries=None, version=None, state=None):
+        if state is not None:
+            self.version = state["version"]
+            self.entries = state["entries"]
+            self._names = state["names"]
+            self._first = state["first"]
+            self._countries = state["countries"]
+            self._codes = state["codes"]
+            return
+
+        entries = builtin_entries() if entries is None else list(entries)
+        self.version = version or hashlib.sha1(
+            json.dumps(entries, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+        self.entries = []
+        self._names = {}  # name key -> entry indexes
+        self._first = {}  # first word of a name -> most words any name starting with it has
+        self._countries = {}  # lowercased country name, alias or ISO code -> canonical name
+        self._codes = {}  # canonical country name -> ISO code
+
+        for entry in entries:
+            if entry.get("type") == "country" and entry.get("name"):
+                self._codes.setdefault(entry["name"], entry.get("iso"))
+                for name in [entry["name"], entry.get("iso")] + list(entry.get("aliases") or []):
+                    if name:
+                        self._countries.setdefault(name.lower(), entry["name"])
+
+        skipped = 0
+        for entry in entries:
+            kind, name = entry.get("type"), entry.get("name")
+            country = self._countries.get((entry.get("country") or "").lower()) if kind != "country" else name
+            if kind not in ENTRY_TYPES or not name or not country:
+                skipped += 1
+                continue
+            index = len(self.entries)
+            self.entries.append((kind, name, country, entry.get("region") if kind == "city" else None, entry.get("iso")))
+            for alias in [name] + list(entry.get("aliases") or []):
+                parts = WORD_SPLIT_RE.split(alias.lower())
+                if len(parts) < 3:
+                    continue  # no words to match
+                key = _name_key(parts)
+                if index not in self._names.get(key, ()):
+                    self._names[key] = self._names.get(key, ()) + (index,)
+                self._first[parts[1]] = max(self._first.get(parts[1], 0), len(parts) // 2)
+        if skipped:
+            logger.warning(f"Skipped {skipped} gazetteer entries without a valid name, type or country")
+
+    def state(self):
+        """Compiled form, for caching on disk"""
+        return {
+            "version": self.version,
+            "entries": self.entries,
+            "names": self._names,
+            "first": self._first,
+            "countries": self._countries,
+            "codes": self._codes
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find(self, text):
+        """Indexes of every entry whose name or alias occurs as whole words in text, ascending"""
+        parts = WORD_SPLIT_RE.split((text or "").lower())
+        names, first = self._names, self._first
+        found = set()
+        for word_index in range(1, len(parts), 2):
+            length = first.get(parts[word_index])
+            if length is None:
+                continue
+            key = parts[word_index]
+            found.update(names.get(key, ()))
+            for index in range(word_index + 2, min(word_index + 2 * length, len(parts)), 2):
+                separator = parts[index - 1]
+                key += (separator if separator == ' ' else SPACE_RE.sub(' ', separator)) + parts[index]
+                found.update(names.get(key, ()))
+        return sorted(found)
+
+    def canonical_country(self, name):
+        """Canonical name of a country given its name, an alias or its ISO code (any case)"""
+        return self._countries.get(name.lower()) if name else None
+
+    def country_code(self, name):
+        """ISO code of a country given its name, an alias or its ISO code"""
+        return self._codes.get(self.canonical_country(name))
+
+    def locate(self, text, country=None):
+        """
+        Country, state and district mentioned in text. A known country (name, alias or
+        ISO code) is kept as given and limits the state lookup to that country; the
+        district must be a city of the state found.
+        """
+        entries = self.entries
+        mentions = self.find(text)
+        result = {}
+        if not country:
+            country = next((entries[i][1] for i in mentions if entries[i][0] == "country"), None)
+        if country:
+            result['country'] = country
+
+        known = self.canonical_country(country) if country else None
+        region = next((entries[i] for i in mentions
+                       if entries[i][0] == "region" and (not country or entries[i][2] == known)), None)
+        if region:
+            result['state'] = region[1]
+            result.setdefault('country', region[2])
+            district = next((entries[i][1] for i in mentions
+                             if entries[i][0] == "city" and entries[i][2] == region[2] and entries[i][3] == region[1]),
+                            None)
+            if district:
+                result['district'] = district
+        return result
+
+def read_entries(data):
+    """Gazetteer entries from the bytes of a JSON list or JSON Lines file"""
+    text = data.decode('utf-8-sig')
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def load_gazetteer(path=None, cache_path=None):
+    """
+    The built-in gazetteer, or the one in path (JSON or JSON Lines). A file's compiled
+    form is reused from cache_path while the file's contents are unchanged.
+    """
+    if not path:
+        return Gazetteer()
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    signature = hashlib.sha1(b"%d:" % CACHE_FORMAT + data).hexdigest()
+
+    if cache_path:
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get("signature") == signature:
+                return Gazetteer(state=cached["gazetteer"])
+        except FileNotFoundError:
+            pass
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable gazetteer cache {cache_path}: {e}")
+
+    gazetteer = Gazetteer(read_entries(data), version=signature[:12])
+    logger.info(f"Compiled gazetteer {path} with {len(gazetteer)} places")
+
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump({"signature": signature, "gazetteer": gazetteer.state()}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not cache compiled gazetteer at {cache_path}: {e}")
+    return gazetteer
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """The process-wide gazetteer (GAZETTEER_PATH, or the built-in one)"""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            try:
+                _gazetteer = load_gazetteer(GAZETTEER_PATH, GAZETTEER_CACHE_PATH)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading gazetteer {GAZETTEER_PATH}, using the built-in one: {e}")
+                _gazetteer = load_gazetteer()
+        return _gazetteer
+
+def locate(text, country=None):
+    """Country, state and district mentioned in text, from the process-wide gazetteer"""
+    return get_gazetteer().locate(text, country)
@@ -0,0 +1,142 @@
+"""
+Multi-pattern keyword matching for the Dark Web filters.
+A KeywordMatcher compiles a keyword list once into an Aho-Corasick automaton and finds
+every occurrence of every keyword in a single pass over the text. The scan result
+answers both the substring checks used by categorize_site/check_for_keywords and the
+whole-word (\\b...\\b) counts used by calculate_risk_score.
+"""
+import logging
+
+# Optional C implementation of the automaton
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('keyword_matcher')
+
+def is_word_char(char):
+    """Same notion of a word character as \\w in Python's re module"""
+    return char.isalnum() or char == '_'
+
+def at_word_boundary(text, index):
+    """Whether \\b matches at text[index]"""
+    before = index > 0 and is_word_char(text[index - 1])
+    after = index < len(text) and is_word_char(text[index])
+    return before != after
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a fixed, lowercased keyword list"""
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(keyword.lower() for keyword in keywords if keyword))
+        self.max_length = max((len(keyword) for keyword in self.keywords), default=0)
+
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for index, keyword in enumerate(self.keywords):
+                self._automaton.add_word(keyword, index)
+            if self.keywords:
+                self._automaton.make_automaton()
+        else:
+            self._build()
+
+    def _build(self):
+        """Build the goto/fail/output tables of the pure-Python automaton"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] += (index,)
+
+        # Breadth-first pass to link each state to its longest proper suffix state
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def _iter(self, text):
+        """Yield (end_index, keyword_index) for every occurrence; end_index is inclusive"""
+        if not self.keywords:
+            return
+        if AHOCORASICK_AVAILABLE:
+            yield from self._automaton.iter(text)
+            return
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                yield end, index
+
+    def scan(self, text, lowered=False):
+        """Find all keyword occurrences in text (lowercased first unless lowered=True)"""
+        if not lowered:
+            text = text.lower()
+        starts = {}
+        for end, index in self._iter(text):
+            keyword = self.keywords[index]
+            starts.setdefault(keyword, []).append(end - len(keyword) + 1)
+        return KeywordScan(text, starts)
+
+class KeywordScan:
+    """Occurrences of each keyword found by one KeywordMatcher.scan pass"""
+
+    def __init__(self, text, starts):
+        self.text = text
+        self.starts = starts  # keyword -> ascending start offsets of every (overlapping) occurrence
+
+    def contains(self, keyword, lo=0, hi=None):
+        """Substring check: keyword occurs inside text[lo:hi]"""
+        if not keyword:
+            return True  # same as '' in text
+        if hi is None:
+            hi = len(self.text)
+        keyword = keyword.lower()
+        return any(lo <= start and start + len(keyword) <= hi for start in self.starts.get(keyword, ()))
+
+    def word_starts(self, keyword, lo=0, hi=None):
+        """
+        Start offsets of whole-word matches inside text[lo:hi], non-overlapping and
+        leftmost-first, i.e. what re.finditer(r'\\b' + re.escape(keyword) + r'\\b') finds
+        on the whole text (boundaries are judged against the characters around the match)
+        """
+        if hi is None:
+            hi = len(self.text)
+        keyword = keyword.lower()
+        length = len(keyword)
+        found = []
+        last_end = lo
+        for start in self.starts.get(keyword, ()):
+            end = start + length
+            if start < last_end or end > hi:
+                continue
+            if at_word_boundary(self.text, start) and at_word_boundary(self.text, end):
+                found.append(start)
+                last_end = end
+        return found
+
+    def count_words(self, keyword, lo=0, hi=None):
+        """Number of whole-word matches inside text[lo:hi]"""
+        return len(self.word_starts(keyword, lo, hi))
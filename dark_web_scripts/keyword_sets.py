@@ -0,0 +1,268 @@
+"""
+Keyword sets for the scoring engine and the Dark Web filters.
+A keyword set is an immutable snapshot of the risk categories (keywords and
+weights), the seller indicators and threshold, and the default filter keywords,
+with a version ID that changes whenever any of them (or the gazetteer) does.
+Definitions are loaded from the JSON file at KEYWORD_SET_PATH, falling back to the
+built-in ones below for anything the file leaves out. get_keyword_set() notices
+when the file changes, compiles the new set's keyword matcher and then swaps it in
+atomically; callers that take one snapshot for a whole crawl or filter run keep
+scoring with a consistent version.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import functools
+import logging
+import threading
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dark_web_scripts.keyword_matcher import KeywordMatcher
+from dark_web_scripts.gazetteer import get_gazetteer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('keyword_sets')
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+KEYWORD_SET_PATH = os.getenv('KEYWORD_SET_PATH', os.path.join(BACKEND_DIR, 'keyword_sets.json'))
+RELOAD_CHECK_INTERVAL = float(os.getenv('KEYWORD_SET_RELOAD_INTERVAL', 2))  # seconds between file checks
+
+# Built-in risk categories with weights
+RISK_CATEGORIES = {
+    "drugs": {
+        "weight": 60,
+        "keywords": [
+            "drugs", "cocaine", "heroin", "fentanyl", "mdma", "ecstasy", "meth", "amphetamine", 
+            "lsd", "cannabis", "marijuana", "weed", "ketamine", "opioids", "steroids", "pills"
+        ]
+    },
+    "weapons": {
+        "weight": 80,
+        "keywords": [
+            "weapons", "guns", "firearms", "pistol", "rifle", "ammunition", "ammo", "explosives",
+            "grenades", "knives", "tactical", "silencer", "suppressor", "armor", "bulletproof"
+        ]
+    },
+    "hacking": {
+        "weight": 50,
+        "keywords": [
+            "hacking", "malware", "ransomware", "spyware", "botnet", "ddos", "phishing", "exploit",
+            "vulnerability", "zero-day", "rootkit", "keylogger", "cracking", "breach", "backdoor"
+        ]
+    },
+    "counterfeit": {
+        "weight": 60,
+        "keywords": [
+            "counterfeit", "fake", "forged", "documents", "passports", "id cards", "driver license",
+            "credit cards", "currency", "money", "bills", "banknotes", "hologram", "clone"
+        ]
+    },
+    "financial_crime": {
+        "weight": 70,
+        "keywords": [
+            "carding", "dumps", "cvv", "fullz", "bank drops", "money laundering", "bitcoin tumbler",
+            "crypto mixer", "paypal accounts", "wire transfer", "western union", "bank login"
+        ]
+    },
+    "illegal_services": {
+        "weight": 90,
+        "keywords": [
+            "hitman", "murder", "assassination", "kidnapping", "torture", "human trafficking",
+            "organ trafficking", "smuggling", "bribery", "extortion", "blackmail", "fraud"
+        ]
+    },
+    "data_breach": {
+        "weight": 65,
+        "keywords": [
+            "stolen data", "leaked database", "hacked accounts", "personal information", "doxing",
+            "social security", "medical records", "financial data", "corporate secrets", "credentials"
+        ]
+    },
+    "extreme_illegal": {
+        "weight": 100,
+        "keywords": [
+            "child", "underage", "abuse", "exploitation", "rape", "snuff", "torture", "terrorism",
+            "extremist", "jihad", "bomb making", "suicide", "genocide", "violence"
+        ]
+    }
+}
+
+# Words that suggest a vendor page; seller_threshold distinct ones make a seller
+SELLER_INDICATORS = [
+    "vendor", "seller", "shop", "store", "market", "price", "pricing", "cost",
+    "shipping", "payment", "bitcoin", "btc", "monero", "xmr", "escrow", "buy",
+    "purchase", "order", "checkout", "cart", "product", "listing", "feedback",
+    "rating", "review", "trusted", "verified", "pgp", "contact"
+]
+SELLER_THRESHOLD = 3
+
+class KeywordSet:
+    """Immutable keyword and category definitions with their version ID"""
+
+    def __init__(self, risk_categories=None, seller_indicators=None, seller_threshold=None,
+                 illegal_keywords=None, source=None):
+        self.risk_categories = {
+            name: {"weight": data["weight"], "keywords": list(data["keywords"])}
+            for name, data in (risk_categories or RISK_CATEGORIES).items()
+        }
+        self.seller_indicators = list(seller_indicators or SELLER_INDICATORS)
+        self.seller_threshold = SELLER_THRESHOLD if seller_threshold is None else int(seller_threshold)
+        # The filters look for every risk keyword unless the set lists its own
+        if illegal_keywords is None:
+            illegal_keywords = [keyword for data in self.risk_categories.values() for keyword in data["keywords"]]
+        self.illegal_keywords = tuple(illegal_keywords)
+        self.source = source
+        self.loaded_at = time.time()
+
+        rules = [self.risk_categories, self.seller_indicators, self.seller_threshold,
+                 self.illegal_keywords, get_gazetteer().version]
+        self.version = hashlib.sha1(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+        # Keywords of the base matcher: every risk keyword, then the seller terms
+        self.engine_keywords = tuple(
+            [keyword.lower() for data in self.risk_categories.values() for keyword in data["keywords"]] +
+            [term.lower() for term in self.seller_indicators]
+        )
+
+    def matcher(self, extra_keywords=None):
+        """
+        Matcher over every risk keyword, the seller terms, and extra_keywords (e.g.
+        search terms). The automaton is built once per keyword list.
+        """
+        keywords = self.engine_keywords
+        if extra_keywords:
+            keywords += tuple(keyword.lower() for keyword in extra_keywords)
+        return _compile_matcher(keywords)
+
+    def to_dict(self):
+        return {
+            "risk_categories": self.risk_categories,
+            "seller_indicators": self.seller_indicators,
+            "seller_threshold": self.seller_threshold,
+            "illegal_keywords": list(self.illegal_keywords)
+        }
+
+    def summary(self):
+        """Version and size of the set, for status endpoints"""
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "categories": len(self.risk_categories),
+            "risk_keywords": sum(len(data["keywords"]) for data in self.risk_categories.values()),
+            "illegal_keywords": len(self.illegal_keywords)
+        }
+
+@functools.lru_cache(maxsize=32)
+def _compile_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+def _env_illegal_keywords():
+    """ILLEGAL_KEYWORDS from the environment (a JSON list), or None"""
+    env_keywords = os.getenv('ILLEGAL_KEYWORDS')
+    if env_keywords:
+        try:
+            keywords = json.loads(env_keywords)
+            if isinstance(keywords, list):
+                return keywords
+        except ValueError:
+            pass
+        logger.warning("Ignoring ILLEGAL_KEYWORDS, which is not a JSON list")
+    return None
+
+def _validate(definitions):
+    """Raise ValueError unless definitions has the keyword set file's layout"""
+    if not isinstance(definitions, dict):
+        raise ValueError("a keyword set file must hold a JSON object")
+    for name, data in (definitions.get("risk_categories") or {}).items():
+        if not isinstance(data, dict) or not isinstance(data.get("keywords"), list) or \
+                not isinstance(data.get("weight"), (int, float)):
+            raise ValueError(f"risk category {name!r} needs a keywords list and a numeric weight")
+    for field in ("seller_indicators", "illegal_keywords"):
+        if field in definitions and not isinstance(definitions[field], list):
+            raise ValueError(f"{field} must be a list")
+    threshold = definitions.get("seller_threshold")
+    if threshold is not None and (not isinstance(threshold, int) or isinstance(threshold, bool) or threshold < 0):
+        raise ValueError("seller_threshold must be a non-negative integer")
+
+def load_keyword_set(path=KEYWORD_SET_PATH):
+    """
+    Keyword set from the JSON file at path (built-in definitions for the sections it
+    leaves out, or for everything if there is no file). ILLEGAL_KEYWORDS in the
+    environment overrides the default filter keywords.
+    """
+    definitions = {}
+    source = None
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            definitions = json.load(f)
+        _validate(definitions)
+        source = path
+
+    illegal_keywords = _env_illegal_keywords()
+    if illegal_keywords is None:
+        illegal_keywords = definitions.get("illegal_keywords")
+    keyword_set = KeywordSet(definitions.get("risk_categories"), definitions.get("seller_indicators"),
+                             definitions.get("seller_threshold"), illegal_keywords, source)
+    # Compile before the set is handed out, so a reload never stalls a request
+    keyword_set.matcher()
+    return keyword_set
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+_keyword_set = None
+_keyword_set_signature = None
+_next_check = 0.0
+_keyword_set_lock = threading.Lock()
+
+def get_keyword_set():
+    """
+    The current keyword set. The file is checked for changes at most every
+    RELOAD_CHECK_INTERVAL seconds; take one snapshot per crawl or filter run and pass
+    it along to score everything in the run with the same version.
+    """
+    keyword_set = _keyword_set
+    if keyword_set is not None and time.monotonic() < _next_check:
+        return keyword_set
+    return reload_keyword_set(force=False)
+
+def reload_keyword_set(force=True):
+    """Load the keyword set file again (only if it changed, unless force) and swap it in"""
+    global _keyword_set, _keyword_set_signature, _next_check
+    with _keyword_set_lock:
+        signature = _file_signature(KEYWORD_SET_PATH) if KEYWORD_SET_PATH else None
+        if force or _keyword_set is None or signature != _keyword_set_signature:
+            try:
+                keyword_set = load_keyword_set(KEYWORD_SET_PATH)
+                if _keyword_set is not None and keyword_set.version != _keyword_set.version:
+                    logger.info(f"Keyword set changed: version {_keyword_set.version} -> {keyword_set.version}")
+                _keyword_set = keyword_set
+            except (OSError, ValueError) as e:
+                # Keep scoring with the previous set until the file is fixed
+                logger.error(f"Error loading keyword set {KEYWORD_SET_PATH}: {e}")
+                if _keyword_set is None:
+                    _keyword_set = load_keyword_set(None)
+            _keyword_set_signature = signature
+        _next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+        return _keyword_set
+
+if __name__ == "__main__":
+    # Write the built-in definitions as a starting keyword set file
+    if os.path.exists(KEYWORD_SET_PATH):
+        print(f"{KEYWORD_SET_PATH} already exists (version {get_keyword_set().version})")
+    else:
+        with open(KEYWORD_SET_PATH, 'w', encoding='utf-8') as f:
+            json.dump(KeywordSet().to_dict(), f, indent=2)
+        print(f"Wrote the built-in keyword set to {KEYWORD_SET_PATH}")
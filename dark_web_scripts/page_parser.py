@@ -0,0 +1,182 @@
+"""
+Single-pass HTML parsing for the Dark Web crawler.
+Each fetched page is parsed once (with lxml when available) into everything the
+crawler and the scorers need: title, meta description, main text, links, and the
+seller and shipping signals used by backend/crawler.py. BeautifulSoup's html.parser
+is only used when lxml is missing or can't make sense of the markup.
+"""
+import re
+import logging
+from itertools import islice
+
+from bs4 import BeautifulSoup
+
+# Optional fast parser backend
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('page_parser')
+
+MAX_CONTENT_LENGTH = 10000
+MAX_PARAGRAPHS = 3
+MAX_SHIPPING_SNIPPETS = 20
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+def _clean(text):
+    return WHITESPACE_RE.sub(' ', text or '').strip()
+
+def _limit(content):
+    if len(content) > MAX_CONTENT_LENGTH:
+        return content[:MAX_CONTENT_LENGTH] + "..."
+    return content
+
+def _has_any(value, words):
+    value = (value or '').lower()
+    return any(word in value for word in words)
+
+def empty_page(parser=None):
+    """Parsed page with no content, used when even the fallback parser fails"""
+    return {
+        "title": "",
+        "description": "",
+        "content": "",
+        "text": "",
+        "paragraphs": [],
+        "links": [],
+        "seller_elements": 0,
+        "shipping_text": [],
+        "parser": parser
+    }
+
+def _seller_elements(forms, buttons, inputs, divs):
+    """Count the cart/checkout/buy markers determine_if_seller looks for"""
+    return sum([
+        any(_has_any(form_id, ('cart', 'checkout', 'order')) for form_id in forms),
+        any(_has_any(text, ('buy', 'purchase', 'add to cart')) for text in buttons),
+        any(_has_any(value, ('buy', 'purchase')) for value in inputs),
+        any(_has_any(cls, ('product', 'item', 'cart')) for cls in divs)
+    ])
+
+def _parse_lxml(html):
+    """Parse with lxml; raises on markup lxml can't build a document from"""
+    parser = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True)
+    root = lxml.html.document_fromstring(html.encode('utf-8', errors='replace'), parser=parser)
+    etree.strip_elements(root, 'script', 'style', with_tail=False)
+
+    def text_of(element):
+        return ' '.join(part.strip() for part in element.itertext() if part.strip())
+
+    title_tag = root.find('.//title')
+    title = title_tag.text_content().strip() if title_tag is not None else ""
+
+    description = ""
+    for meta in root.iterfind('.//meta[@name="description"]'):
+        if meta.get('content') is not None:
+            description = meta.get('content')
+            break
+
+    # Same areas extract_content has always preferred: main, article, .content, #content, .main, #main
+    content_areas = root.xpath(
+        "//main | //article | //*[@id='content' or @id='main'] | "
+        "//*[contains(concat(' ', normalize-space(@class), ' '), ' content ') or "
+        "contains(concat(' ', normalize-space(@class), ' '), ' main ')]"
+    )
+    full_text = text_of(root)
+    if content_areas:
+        content = max((text_of(area) for area in content_areas), key=len)
+    else:
+        content = full_text
+
+    paragraphs = [p.text_content() for p in islice(root.iter('p'), MAX_PARAGRAPHS)]
+
+    shipping_text = []
+    for node in root.xpath("//text()[contains(translate(., 'SHIPNG', 'shipng'), 'shipping')]"):
+        shipping_text.append(str(node))
+        if len(shipping_text) >= MAX_SHIPPING_SNIPPETS:
+            break
+
+    return {
+        "title": title,
+        "description": description,
+        "content": _limit(_clean(content)),
+        "text": _clean(full_text),
+        "paragraphs": paragraphs,
+        "links": [a.get('href') for a in root.iterfind('.//a[@href]')],
+        "seller_elements": _seller_elements(
+            [form.get('id') for form in root.iterfind('.//form[@id]')],
+            [button.text_content() for button in root.iterfind('.//button')],
+            [inp.get('value') for inp in root.iterfind('.//input[@type="submit"]')],
+            [div.get('class') for div in root.iterfind('.//div[@class]')]
+        ),
+        "shipping_text": shipping_text,
+        "parser": "lxml"
+    }
+
+def _parse_soup(html):
+    """Parse with BeautifulSoup's html.parser (the lenient fallback)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.extract()
+
+    title = soup.title.get_text().strip() if soup.title else ""
+
+    description = ""
+    meta_tag = soup.find("meta", attrs={"name": "description"})
+    if meta_tag and "content" in meta_tag.attrs:
+        description = meta_tag["content"]
+
+    full_text = soup.get_text(separator=' ', strip=True)
+    content_areas = soup.select("main, article, .content, #content, .main, #main")
+    if content_areas:
+        content = max((area.get_text(separator=' ', strip=True) for area in content_areas), key=len)
+    else:
+        content = full_text
+
+    shipping_text = [
+        str(text) for text in soup.find_all(string=lambda text: text and "shipping" in text.lower())
+    ][:MAX_SHIPPING_SNIPPETS]
+
+    return {
+        "title": title,
+        "description": description,
+        "content": _limit(_clean(content)),
+        "text": _clean(full_text),
+        "paragraphs": [p.get_text() for p in soup.find_all('p', limit=MAX_PARAGRAPHS)],
+        "links": [a['href'] for a in soup.find_all('a', href=True)],
+        "seller_elements": _seller_elements(
+            [form.get('id') for form in soup.find_all('form', id=True)],
+            [button.get_text() for button in soup.find_all('button')],
+            [inp.get('value') for inp in soup.find_all('input', attrs={'type': 'submit'})],
+            [' '.join(div.get('class')) for div in soup.find_all('div', class_=True)]
+        ),
+        "shipping_text": shipping_text,
+        "parser": "html.parser"
+    }
+
+def parse_page(html, url=None):
+    """
+    Parse a page once and return a dict with title, description, content (main text,
+    at most 10,000 chars), text (all visible text), paragraphs, links (raw hrefs),
+    seller_elements, shipping_text and the parser that was used.
+    """
+    if not html:
+        return empty_page()
+
+    if LXML_AVAILABLE:
+        try:
+            return _parse_lxml(html)
+        except (etree.ParserError, etree.XMLSyntaxError, ValueError) as e:
+            logger.info(f"lxml could not parse {url or 'page'} ({e}), falling back to html.parser")
+
+    try:
+        return _parse_soup(html)
+    except Exception as e:
+        logger.error(f"Error parsing {url or 'page'}: {e}")
+        return empty_page("html.parser")
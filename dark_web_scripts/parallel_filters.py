@@ -0,0 +1,128 @@
+"""
+Process-pool filtering for large offline jobs, such as re-scoring a whole archive
+after ILLEGAL_KEYWORDS changes.
+Sites are split into chunks that worker processes score and filter with
+filter_sites' rules. Each worker receives the keyword set and filters once, when
+it starts, and compiles the keyword automaton once; tasks only carry their chunk of
+sites. Results are merged back in input order, so the output is the same as a
+single-process run.
+"""
+import os
+import sys
+import json
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dark_web_scripts.keyword_sets import get_keyword_set
+from dark_web_scripts.dark_web_filters import STREAM_CHUNK_SIZE, iter_filter_sites, iter_site_records
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('parallel_filters')
+
+FILTER_WORKERS = int(os.getenv('FILTER_WORKERS', os.cpu_count() or 1))
+TASKS_PER_WORKER = 2  # chunks queued per worker, which bounds the sites held in memory
+
+# Keywords and filters of the pool this worker process belongs to
+_worker_filters = None
+
+def _init_worker(filters):
+    """Worker start-up: keep the filters and compile the keyword set's automaton once"""
+    global _worker_filters
+    _worker_filters = filters
+    filters["keyword_set"].matcher()
+
+def _filter_chunk(chunk):
+    """Filter one chunk in a worker; returns the surviving, enriched sites in input order"""
+    from dark_web_scripts.enrichment_cache import get_enrichment_cache
+    filtered = list(iter_filter_sites(chunk, chunk_size=len(chunk) or 1, **_worker_filters))
+    # Worker processes don't run atexit handlers, so write new cache entries now
+    get_enrichment_cache().flush()
+    return filtered
+
+def _chunks(sites, chunk_size):
+    chunk = []
+    for site in sites:
+        chunk.append(site)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_parallel_filter_sites(sites, keywords=None, geo_location=None, date_range=None,
+                               risk_threshold=None, seller_only=False, country=None,
+                               state=None, district=None, category=None,
+                               workers=None, chunk_size=STREAM_CHUNK_SIZE, keyword_set=None):
+    """
+    iter_filter_sites across a pool of worker processes: yields the filtered, enriched
+    sites in input order. The sites are copies made by the workers; the input dicts
+    are not updated. Every worker scores with the same keyword set.
+    """
+    keyword_set = keyword_set or get_keyword_set()
+    if not keywords:
+        keywords = list(keyword_set.illegal_keywords)
+    elif isinstance(keywords, str):
+        keywords = [k.strip() for k in keywords.split(',')]
+    filters = {
+        "keywords": keywords,
+        "geo_location": geo_location,
+        "date_range": date_range,
+        "risk_threshold": risk_threshold,
+        "seller_only": seller_only,
+        "country": country,
+        "state": state,
+        "district": district,
+        "category": category,
+        "keyword_set": keyword_set
+    }
+    workers = workers or FILTER_WORKERS
+
+    # Spawned workers don't inherit the parent's open SQLite connections
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(filters,)) as executor:
+        pending = deque()
+        for chunk in _chunks(sites, chunk_size):
+            pending.append(executor.submit(_filter_chunk, chunk))
+            if len(pending) >= workers * TASKS_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def parallel_filter_sites(sites, keywords=None, geo_location=None, date_range=None,
+                          risk_threshold=None, seller_only=False, country=None,
+                          state=None, district=None, category=None,
+                          workers=None, chunk_size=STREAM_CHUNK_SIZE, keyword_set=None):
+    """filter_sites across a pool of worker processes: same sites, highest risk first"""
+    if not sites:
+        return []
+    filtered_sites = list(iter_parallel_filter_sites(sites, keywords, geo_location, date_range, risk_threshold,
+                                                     seller_only, country, state, district, category,
+                                                     workers, chunk_size, keyword_set))
+    filtered_sites.sort(key=lambda x: x["risk_score"], reverse=True)
+    return filtered_sites
+
+def rescore_file(input_path, output_path, workers=None, **filters):
+    """
+    Re-score and filter every site of a JSON array or JSON Lines dump, writing the
+    results to output_path as JSON Lines in input order. Returns the number written.
+    """
+    written = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for site in iter_parallel_filter_sites(iter_site_records(input_path), workers=workers, **filters):
+            out.write(json.dumps(site) + "\n")
+            written += 1
+    return written
+
+if __name__ == "__main__":
+    # Example usage: python parallel_filters.py sites.json rescored.jsonl [workers]
+    if len(sys.argv) < 3:
+        print("Usage: python parallel_filters.py <input.json|.jsonl> <output.jsonl> [workers]")
+        sys.exit(1)
+    count = rescore_file(sys.argv[1], sys.argv[2], workers=int(sys.argv[3]) if len(sys.argv) > 3 else None,
+                         risk_threshold=0)
+    print(f"Wrote {count} re-scored sites to {sys.argv[2]}")
@@ -0,0 +1,156 @@
+"""
+Per-domain politeness scheduler for the Dark Web crawler.
+Keeps a min-heap of each domain's next allowed fetch time so the crawler always
+gets a URL from a domain that is ready now instead of sleeping on a busy one.
+"""
+import os
+import json
+import heapq
+import time
+import logging
+from collections import deque
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('politeness')
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', '.env'))
+
+DEFAULT_CRAWL_DELAY = 2  # seconds between requests to the same domain
+MAX_BACKOFF_DELAY = 300  # seconds
+BACKOFF_FACTOR = 2
+
+def get_delay_overrides():
+    """Per-domain crawl delays from the CRAWL_DELAY_OVERRIDES env var ({"domain.onion": seconds})"""
+    env_overrides = os.getenv('CRAWL_DELAY_OVERRIDES')
+    if env_overrides:
+        try:
+            return {domain.lower(): float(delay) for domain, delay in json.loads(env_overrides).items()}
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid CRAWL_DELAY_OVERRIDES: {e}")
+    return {}
+
+class PolitenessScheduler:
+    """
+    Hands out URLs only from domains whose crawl delay has elapsed.
+    A domain is "in flight" between pop() and release(), so each domain gets at most
+    one fetch at a time and its delay is measured from the end of the last fetch.
+    """
+
+    def __init__(self, default_delay=DEFAULT_CRAWL_DELAY, delay_overrides=None,
+                 backoff_factor=BACKOFF_FACTOR, max_backoff=MAX_BACKOFF_DELAY):
+        self.default_delay = default_delay
+        self.delay_overrides = get_delay_overrides()
+        if delay_overrides:
+            self.delay_overrides.update({domain.lower(): delay for domain, delay in delay_overrides.items()})
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        self._queues = {}         # domain -> deque of (url, depth)
+        self._heap = []           # (next_allowed, seq, domain) for idle domains with queued URLs
+        self._scheduled = set()   # domains currently in the heap
+        self._in_flight = {}      # domain -> number of URLs handed out and not yet released
+        self._next_allowed = {}   # domain -> earliest time of the next fetch
+        self._errors = {}         # domain -> consecutive errors
+        self._seq = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def domain_of(url):
+        return urlparse(url).netloc.lower()
+
+    def set_delay(self, domain, delay):
+        """Override the crawl delay for one domain"""
+        self.delay_overrides[domain.lower()] = delay
+
+    def delay_for(self, domain):
+        """Current delay for a domain, including error backoff"""
+        delay = self.delay_overrides.get(domain, self.default_delay)
+        errors = self._errors.get(domain, 0)
+        if errors:
+            delay = min(self.max_backoff, max(delay, 1) * (self.backoff_factor ** errors))
+        return delay
+
+    def _schedule(self, domain):
+        """Put an idle domain with queued URLs on the heap"""
+        if domain in self._scheduled or self._in_flight.get(domain) or not self._queues.get(domain):
+            return
+        self._seq += 1
+        heapq.heappush(self._heap, (self._next_allowed.get(domain, 0), self._seq, domain))
+        self._scheduled.add(domain)
+
+    def push(self, url, depth=0):
+        """Queue a URL behind its domain"""
+        domain = self.domain_of(url)
+        self._queues.setdefault(domain, deque()).append((url, depth))
+        self._size += 1
+        self._schedule(domain)
+
+    def pop(self, now=None):
+        """Return (url, depth) from a domain that is ready now, or None"""
+        if now is None:
+            now = time.time()
+        if not self._heap or self._heap[0][0] > now:
+            return None
+
+        _, _, domain = heapq.heappop(self._heap)
+        self._scheduled.discard(domain)
+        queue = self._queues[domain]
+        url, depth = queue.popleft()
+        if not queue:
+            del self._queues[domain]
+        self._size -= 1
+        self._in_flight[domain] = self._in_flight.get(domain, 0) + 1
+        return url, depth
+
+    def release(self, url, success=True, now=None):
+        """Report that a fetch finished; schedules the domain's next fetch (with backoff on errors)"""
+        if now is None:
+            now = time.time()
+        domain = self.domain_of(url)
+
+        remaining = self._in_flight.get(domain, 0) - 1
+        if remaining > 0:
+            self._in_flight[domain] = remaining
+        else:
+            self._in_flight.pop(domain, None)
+
+        if success:
+            self._errors.pop(domain, None)
+        else:
+            self._errors[domain] = self._errors.get(domain, 0) + 1
+            logger.info(f"Backing off {domain} for {self.delay_for(domain):.0f}s after {self._errors[domain]} errors")
+
+        self._next_allowed[domain] = now + self.delay_for(domain)
+        self._schedule(domain)
+
+    def time_until_ready(self, now=None):
+        """Seconds until some domain is ready (0 if one is ready now), or None if nothing is queued"""
+        if not self._heap:
+            return None
+        if now is None:
+            now = time.time()
+        return max(0.0, self._heap[0][0] - now)
+
+    def drain(self):
+        """Remove and return every queued (url, depth)"""
+        drained = [item for queue in self._queues.values() for item in queue]
+        self._queues.clear()
+        self._heap.clear()
+        self._scheduled.clear()
+        self._size = 0
+        return drained
+
+    def stats(self):
+        return {
+            "queued": self._size,
+            "domains_queued": len(self._queues),
+            "domains_in_flight": len(self._in_flight),
+            "domains_backing_off": len(self._errors)
+        }
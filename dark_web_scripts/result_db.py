@@ -0,0 +1,243 @@
+"""
+Persistent store of crawl results in the SQLite database configured by DB_PATH.
+Every crawl's results are upserted by URL, so a site seen again is updated in place
+and the results of earlier crawls are kept instead of being overwritten. Inserts are
+batched into transactions, and the columns the API filters on (risk score, country,
+category, date, seller flag) are indexed so exports and queries don't have to read
+every record. The full record is kept as JSON next to the indexed columns.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('result_db')
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+# Same location as config.DB_PATH in the backend
+DB_PATH = os.path.join(BACKEND_DIR, os.getenv('DB_PATH', 'data/darkweb.db'))
+
+# Results saved by earlier versions, imported the first time the database is opened
+LEGACY_RESULTS_PATH = os.path.join(BACKEND_DIR, 'data_storage', 'crawled_data.json')
+LEGACY_CRAWL_ID = 'imported'
+
+INSERT_BATCH_SIZE = 500  # records per transaction
+FETCH_BATCH_SIZE = 1000  # rows read at a time when iterating
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_results (
+    url TEXT PRIMARY KEY,
+    crawl_id TEXT,
+    title TEXT,
+    risk_score REAL,
+    country TEXT,
+    category TEXT,
+    is_seller INTEGER NOT NULL DEFAULT 0,
+    date_detected TEXT,
+    first_seen REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_crawl_results_risk ON crawl_results (risk_score);
+CREATE INDEX IF NOT EXISTS idx_crawl_results_country ON crawl_results (country);
+CREATE INDEX IF NOT EXISTS idx_crawl_results_category ON crawl_results (category);
+CREATE INDEX IF NOT EXISTS idx_crawl_results_date ON crawl_results (date_detected);
+CREATE INDEX IF NOT EXISTS idx_crawl_results_seller ON crawl_results (is_seller) WHERE is_seller = 1;
+CREATE INDEX IF NOT EXISTS idx_crawl_results_crawl ON crawl_results (crawl_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_crawl_results_updated ON crawl_results (updated_at);
+"""
+
+UPSERT = """
+INSERT INTO crawl_results (url, crawl_id, title, risk_score, country, category, is_seller,
+                           date_detected, first_seen, updated_at, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(url) DO UPDATE SET
+    crawl_id = excluded.crawl_id,
+    title = excluded.title,
+    risk_score = excluded.risk_score,
+    country = excluded.country,
+    category = excluded.category,
+    is_seller = excluded.is_seller,
+    date_detected = excluded.date_detected,
+    updated_at = excluded.updated_at,
+    data = excluded.data
+"""
+
+def _score(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _date(value):
+    """date_detected as YYYY-MM-DD, so dates compare as strings"""
+    return str(value)[:10] if value else None
+
+def to_row(record, crawl_id, now):
+    """Column values of a crawl result for UPSERT"""
+    return (
+        record['url'],
+        crawl_id,
+        record.get('title'),
+        _score(record.get('risk_score')),
+        record.get('country'),
+        record.get('category'),
+        1 if record.get('is_seller') else 0,
+        _date(record.get('date_detected')),
+        now,
+        now,
+        json.dumps(record, default=str)
+    )
+
+class ResultDatabase:
+    """Crawl results keyed by URL, with the filtered columns indexed"""
+
+    def __init__(self, db_path=DB_PATH, legacy_path=LEGACY_RESULTS_PATH):
+        self.db_path = str(db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        if legacy_path and os.path.exists(legacy_path) and not self.count():
+            self.import_file(legacy_path, crawl_id=LEGACY_CRAWL_ID)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def upsert_many(self, records, crawl_id=None, batch_size=INSERT_BATCH_SIZE):
+        """
+        Insert or update records (any iterable) by URL, batch_size records per
+        transaction; records without a URL are skipped. Returns the number saved.
+        """
+        saved = 0
+        batch = []
+        for record in records:
+            if isinstance(record, dict) and record.get('url'):
+                batch.append(record)
+            if len(batch) >= batch_size:
+                saved += self._write(batch, crawl_id)
+                batch = []
+        if batch:
+            saved += self._write(batch, crawl_id)
+        if saved:
+            logger.info(f"Saved {saved} crawl results to {self.db_path}")
+        return saved
+
+    def _write(self, records, crawl_id):
+        now = time.time()
+        rows = [to_row(record, crawl_id, now) for record in records]
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, rows)
+        return len(rows)
+
+    def import_file(self, file_path, crawl_id=LEGACY_CRAWL_ID):
+        """Upsert the records of a JSON array or JSON Lines file of crawl results"""
+        from dark_web_scripts.dark_web_filters import iter_site_records
+        try:
+            count = self.upsert_many(iter_site_records(file_path), crawl_id=crawl_id)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error importing crawl results from {file_path}: {e}")
+            return 0
+        logger.info(f"Imported {count} crawl results from {file_path}")
+        return count
+
+    def _where(self, crawl_id=None, country=None, category=None, min_risk=None, date_range=None,
+               seller_only=False, url_contains=None):
+        clauses, params = [], []
+        if crawl_id is not None:
+            clauses.append("crawl_id = ?")
+            params.append(crawl_id)
+        if country:
+            clauses.append("country = ?")
+            params.append(country)
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        if min_risk is not None:
+            clauses.append("risk_score >= ?")
+            params.append(float(min_risk))
+        if date_range:
+            start, end = date_range
+            if start:
+                clauses.append("date_detected >= ?")
+                params.append(_date(start))
+            if end:
+                clauses.append("date_detected <= ?")
+                params.append(_date(end))
+        if seller_only:
+            clauses.append("is_seller = 1")
+        if url_contains:
+            clauses.append("instr(url, ?) > 0")
+            params.append(url_contains)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def iter_records(self, limit=None, **filters):
+        """
+        Yield stored crawl results in the order they were first saved, read in batches
+        on a connection of their own so a long export doesn't block new saves.
+        Filters: crawl_id, country, category, min_risk, date_range (start, end),
+        seller_only and url_contains.
+        """
+        where, params = self._where(**filters)
+        sql = f"SELECT data FROM crawl_results{where} ORDER BY rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not rows:
+                    break
+                for (data,) in rows:
+                    yield json.loads(data)
+        finally:
+            conn.close()
+
+    def count(self, **filters):
+        """Number of stored results matching the filters of iter_records"""
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM crawl_results{where}", params).fetchone()[0]
+
+    def latest_crawl_id(self):
+        """ID of the crawl that saved results most recently, or None if nothing is stored"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT crawl_id FROM crawl_results ORDER BY updated_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def stats(self):
+        with self._lock:
+            total, crawls = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT crawl_id) FROM crawl_results").fetchone()
+        return {"results": total, "crawls": crawls, "db_path": self.db_path}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_db = None
+_db_lock = threading.Lock()
+
+def get_result_db():
+    """Process-wide result database"""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = ResultDatabase()
+        return _db
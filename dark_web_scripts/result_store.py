@@ -0,0 +1,315 @@
+"""
+Indexed in-memory store for crawl results.
+Records are kept in insertion order with bitmap indexes (Python ints, one bit per
+row) on country, state, district, category, is_seller and crawl, and sorted bitmap
+indexes on risk_score and date_detected. A filter_data request becomes a handful of
+bitmap intersections; only the free-text keyword and geo-location checks look at the
+records themselves, and only at rows the indexes have already narrowed down to.
+Records can be added at any time; a batch that has the URL of an earlier record
+replaces it. Once replaced rows outnumber the live ones, the store is rebuilt from
+its live rows, so it grows with the current results rather than with every crawl.
+"""
+import os
+import json
+import bisect
+import datetime
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('result_store')
+
+COMPACT_MIN_DEAD = 1000  # replaced rows before the store may be rebuilt from its live rows
+
+# Positions of the set bits in every byte value, for walking a bitmap
+BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def bitmap_of(rows):
+    """Bitmap with the given row bits set"""
+    rows = list(rows)
+    if not rows:
+        return 0
+    data = bytearray(max(rows) // 8 + 1)
+    for row in rows:
+        data[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(data, 'little')
+
+def iter_rows(bitmap):
+    """Row numbers of the set bits, in ascending order"""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(data):
+        if byte:
+            base = byte_index * 8
+            for bit in BYTE_BITS[byte]:
+                yield base + bit
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else None
+
+def _date(value):
+    """date_detected as a date; filter_data only accepts YYYY-MM-DD"""
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+class BitmapIndex:
+    """
+    Bitmap per distinct (normalized) value of a field, plus the rows that don't have
+    the field and the rows whose value couldn't be normalized. Values are kept
+    sorted so range lookups only OR the bitmaps inside the range.
+    """
+
+    def __init__(self, field, normalize=_lower):
+        self.field = field
+        self.normalize = normalize
+        self.bitmaps = {}
+        self.keys = []  # sorted distinct values
+        self.missing = 0
+        self.invalid = 0
+
+    def add_rows(self, rows, records):
+        """Index records[i] as row rows[i]"""
+        grouped = {}
+        missing, invalid = [], []
+        for row, record in zip(rows, records):
+            if record.get(self.field) is None:
+                missing.append(row)
+                continue
+            value = self.normalize(record[self.field])
+            if value is None:
+                invalid.append(row)
+            else:
+                grouped.setdefault(value, []).append(row)
+
+        for value, value_rows in grouped.items():
+            if value not in self.bitmaps:
+                self.bitmaps[value] = 0
+                bisect.insort(self.keys, value)
+            self.bitmaps[value] |= bitmap_of(value_rows)
+        self.missing |= bitmap_of(missing)
+        self.invalid |= bitmap_of(invalid)
+
+    def equal(self, value):
+        return self.bitmaps.get(self.normalize(value), 0)
+
+    def containing(self, text):
+        """Rows whose value contains text (values are lowercased strings)"""
+        text = text.lower()
+        result = 0
+        for value, bitmap in self.bitmaps.items():
+            if text in value:
+                result |= bitmap
+        return result
+
+    def at_least(self, low):
+        result = 0
+        for value in self.keys[bisect.bisect_left(self.keys, low):]:
+            result |= self.bitmaps[value]
+        return result
+
+    def between(self, low, high):
+        result = 0
+        for value in self.keys[bisect.bisect_left(self.keys, low):bisect.bisect_right(self.keys, high)]:
+            result |= self.bitmaps[value]
+        return result
+
+    def truthy(self):
+        result = 0
+        for value, bitmap in self.bitmaps.items():
+            if value:
+                result |= bitmap
+        return result
+
+class ResultStore:
+    """Crawl records with bitmap indexes for filter_data-style queries"""
+
+    def __init__(self, records=None):
+        self.records = []
+        self.live = 0  # rows not replaced by a later record with the same URL
+        self._rows_by_url = {}  # url -> rows of the latest batch that had it
+        self._crawls = {}  # crawl_id -> bitmap
+        self._lock = threading.RLock()
+        self.indexes = self._new_indexes()
+        if records:
+            self.add_many(records)
+
+    @staticmethod
+    def _new_indexes():
+        return {
+            "country": BitmapIndex("country"),
+            "state": BitmapIndex("state"),
+            "district": BitmapIndex("district"),
+            "category": BitmapIndex("category"),
+            "is_seller": BitmapIndex("is_seller", normalize=bool),
+            "risk_score": BitmapIndex("risk_score", normalize=_number),
+            "date_detected": BitmapIndex("date_detected", normalize=_date),
+        }
+
+    def __len__(self):
+        return bin(self.live).count('1')
+
+    def add_many(self, records, crawl_id=None):
+        """Add records (and index them); returns their row numbers, valid until the next add"""
+        records = list(records)
+        with self._lock:
+            first = len(self.records)
+            rows = list(range(first, first + len(records)))
+            self.records.extend(records)
+
+            # A URL seen in an earlier batch is superseded by this batch's records for it
+            batch_urls = {}
+            for row, record in zip(rows, records):
+                url = record.get("url")
+                if url and url != '#':
+                    batch_urls.setdefault(url, []).append(row)
+            replaced = []
+            for url, url_rows in batch_urls.items():
+                replaced.extend(self._rows_by_url.get(url, ()))
+                self._rows_by_url[url] = url_rows
+            for index in self.indexes.values():
+                index.add_rows(rows, records)
+
+            added = bitmap_of(rows)
+            self.live = (self.live | added) & ~bitmap_of(replaced)
+            if crawl_id is not None:
+                self._crawls[crawl_id] = self._crawls.get(crawl_id, 0) | added
+
+            dead = len(self.records) - len(self)
+            if dead >= COMPACT_MIN_DEAD and dead > len(self):
+                self._compact()
+                # The batch's rows are all live, so they are now the last rows
+                rows = list(range(len(self.records) - len(records), len(self.records)))
+        return rows
+
+    def _compact(self):
+        """Rebuild the records and indexes from the live rows only (lock held)"""
+        rows = list(iter_rows(self.live))
+        dropped = len(self.records) - len(rows)
+        renumbered = {row: new_row for new_row, row in enumerate(rows)}
+        crawls = {}
+        for crawl_id, bitmap in self._crawls.items():
+            crawl_rows = [renumbered[row] for row in iter_rows(bitmap & self.live)]
+            if crawl_rows:
+                crawls[crawl_id] = bitmap_of(crawl_rows)
+        self._crawls = crawls
+        self._rows_by_url = {url: [renumbered[row] for row in url_rows]
+                             for url, url_rows in self._rows_by_url.items()}
+        self.records = [self.records[row] for row in rows]
+        self.live = (1 << len(rows)) - 1
+        self.indexes = self._new_indexes()
+        for index in self.indexes.values():
+            index.add_rows(range(len(rows)), self.records)
+        logger.info(f"Compacted the result store: dropped {dropped} replaced rows, {len(rows)} left")
+
+    def add(self, record, crawl_id=None):
+        return self.add_many([record], crawl_id)[0]
+
+    def _present_or(self, field, matches):
+        """Rows matching, plus rows that don't have the field (filter_data skips those checks)"""
+        return matches | self.indexes[field].missing
+
+    def select(self, keywords=None, geo_location=None, date_range=None, risk_threshold=None,
+               seller_only=False, country=None, state=None, district=None, category=None, crawl_id=None):
+        """
+        Bitmap of the live rows that pass every filter, with filter_data's semantics
+        (row numbers are valid until the next add)
+        """
+        with self._lock:
+            rows = self.live
+            if crawl_id is not None:
+                rows &= self._crawls.get(crawl_id, 0)
+            if date_range:
+                start = datetime.datetime.strptime(date_range[0], '%Y-%m-%d').date()
+                end = datetime.datetime.strptime(date_range[1], '%Y-%m-%d').date()
+                rows &= self._present_or("date_detected", self.indexes["date_detected"].between(start, end))
+            if risk_threshold is not None:
+                rows &= self._present_or("risk_score", self.indexes["risk_score"].at_least(risk_threshold))
+            if seller_only:
+                rows &= self._present_or("is_seller", self.indexes["is_seller"].truthy())
+            for field, value in (("country", country), ("state", state), ("district", district)):
+                if value:
+                    rows &= self._present_or(field, self.indexes[field].containing(value))
+            if category:
+                rows &= self._present_or("category", self.indexes["category"].equal(category))
+
+            # Free-text checks on the rows left after the index lookups
+            if keywords or geo_location:
+                terms = [keyword.strip().lower() for keyword in keywords.split(',')] if keywords else None
+                geo = geo_location.lower() if geo_location else None
+                rows = bitmap_of(row for row in iter_rows(rows) if self._text_match(self.records[row], terms, geo))
+            return rows
+
+    @staticmethod
+    def _text_match(record, terms, geo):
+        if terms is not None:
+            title = (record.get('title') or '').lower()
+            description = (record.get('description') or '').lower()
+            if not any(term in title or term in description for term in terms):
+                return False
+        if geo is not None:
+            if geo not in (record.get('description') or '').lower() and \
+                    not (isinstance(record.get('country'), str) and geo in record['country'].lower()):
+                return False
+        return True
+
+    def query(self, **filters):
+        """Records passing every filter, in insertion order"""
+        # One lock hold, so a compaction can't renumber the rows in between
+        with self._lock:
+            return [self.records[row] for row in iter_rows(self.select(**filters))]
+
+    def filter_data(self, **filters):
+        """
+        filter_data over the stored records (or one crawl's records with crawl_id):
+        the matching records, or all of them if nothing matches
+        """
+        matches = self.query(**filters)
+        if matches:
+            return matches
+        return self.query(crawl_id=filters.get("crawl_id"))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "records": len(self),
+                "rows": len(self.records),
+                "crawls": len(self._crawls),
+                "distinct": {field: len(index.bitmaps) for field, index in self.indexes.items()}
+            }
+
+def matches(record, **filters):
+    """Whether a single record passes the filters of filter_data (without its fall back to every record)"""
+    return bool(ResultStore([record]).select(**filters))
+
+def load_records(file_path):
+    """Records from a saved crawl JSON file, or [] if there isn't one"""
+    if not os.path.exists(file_path):
+        return []
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        return records if isinstance(records, list) else []
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading saved results from {file_path}: {e}")
+        return []
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_result_store(seed_path=None, seed_records=None):
+    """
+    The process-wide result store, seeded the first time it's used from seed_path or
+    from seed_records (any iterable, only read then)
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore(load_records(seed_path) if seed_path else seed_records)
+            if len(_store):
+                logger.info(f"Loaded {len(_store)} saved results into the result store")
+        return _store
@@ -0,0 +1,163 @@
+"""
+Unified scoring engine for crawled Dark Web pages.
+score_page() computes the risk score, risk categories, primary category and seller
+likelihood of a page from a single pass of the keyword matcher, and its location
+from a single pass of the gazetteer.
+Scores are deterministic for a given keyword set, so results can be cached and
+compared across runs; the crawler, the Dark Web filters and the backend all score
+pages through this module.
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dark_web_scripts.gazetteer import get_gazetteer
+from dark_web_scripts.keyword_sets import get_keyword_set
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('scoring')
+
+def keyword_set_version():
+    """
+    Version ID of the current keyword set. Results computed under another version
+    are stale.
+    """
+    return get_keyword_set().version
+
+def get_keyword_matcher(extra_keywords=None, keyword_set=None):
+    """
+    Matcher over every risk keyword and seller term of the keyword set (the current
+    one by default), and extra_keywords (e.g. search terms). The automaton is built
+    once per keyword list.
+    """
+    return (keyword_set or get_keyword_set()).matcher(extra_keywords)
+
+def risk_from_scan(scan, keyword_set=None):
+    """Turn whole-word keyword matches from a scan into the calculate_risk_score result"""
+    keyword_set = keyword_set or get_keyword_set()
+    
+    # Initialize score and matched categories
+    base_score = 0
+    matched_categories = {}
+    
+    # Check each category
+    for category, data in keyword_set.risk_categories.items():
+        category_matches = []
+        for keyword in data["keywords"]:
+            # Look for whole word matches
+            category_matches.extend([keyword.lower()] * scan.count_words(keyword))
+        
+        # If we found matches in this category
+        if category_matches:
+            # Calculate category score based on number of matches and category weight
+            category_score = min(100, len(category_matches) * data["weight"] / 5)
+            matched_categories[category] = {
+                "score": category_score,
+                "matches": category_matches
+            }
+            
+            # Add to base score (weighted by category importance)
+            base_score += category_score * (data["weight"] / 100)
+    
+    # Normalize final score to 0-100 range
+    final_score = min(100, base_score)
+    
+    return {
+        "score": round(final_score),
+        "categories": matched_categories
+    }
+
+def category_from_matches(contains, keyword_set=None):
+    """Pick the category with the most keywords present; contains(keyword) is a substring check"""
+    keyword_set = keyword_set or get_keyword_set()
+    
+    # Check for category matches
+    category_matches = {}
+    
+    for category, data in keyword_set.risk_categories.items():
+        matches = sum(1 for keyword in data["keywords"] if contains(keyword))
+        if matches > 0:
+            category_matches[category] = matches
+    
+    # Determine primary category (the one with most matches)
+    if category_matches:
+        return max(category_matches.items(), key=lambda x: x[1])[0]
+    
+    return "unknown"
+
+def seller_from_matches(contains, keyword_set=None):
+    """Number of distinct seller indicators present; contains(keyword) is a substring check"""
+    return sum(1 for indicator in (keyword_set or get_keyword_set()).seller_indicators if contains(indicator))
+
+class PageScan:
+    """
+    Keyword occurrences for a page's title, description and content from one pass.
+    The risk score looks at "title content" and everything else at
+    "title description content", so "title content" is scanned once (the content is
+    the bulk of the text) and only the short stretch around the description is
+    scanned separately.
+    """
+
+    def __init__(self, matcher, title="", description="", content=""):
+        title_lower = (title or "").lower()
+        content_lower = (content or "").lower()
+        self.risk_text = f"{title_lower} {content_lower}" if title else content_lower
+        self.title_end = len(title_lower)
+        self.content_start = len(self.risk_text) - len(content_lower)
+        self.risk_scan = matcher.scan(self.risk_text, lowered=True)
+        
+        # One extra character on each side so word boundaries are judged on real neighbours
+        margin = matcher.max_length + 1
+        tail = title_lower[-margin:] if title_lower else ""
+        bridge = f"{tail} {(description or '').lower()} {content_lower[:margin]}"
+        self.bridge_start = len(tail)
+        self.bridge_end = len(bridge) - len(content_lower[:margin])
+        self.bridge_scan = matcher.scan(bridge, lowered=True)
+
+    def _in_bridge(self, keyword, starts):
+        # Only occurrences touching the description or its separators; the rest are in risk_scan
+        length = len(keyword)
+        return any(start < self.bridge_end and start + length > self.bridge_start for start in starts)
+
+    def contains(self, keyword):
+        """Substring check over "title description content" """
+        if not keyword:
+            return True
+        keyword = keyword.lower()
+        return (self.risk_scan.contains(keyword, 0, self.title_end) or
+                self.risk_scan.contains(keyword, self.content_start) or
+                self._in_bridge(keyword, self.bridge_scan.starts.get(keyword, ())))
+
+def score_page(title="", description="", content="", keywords=None, country=None, keyword_set=None):
+    """
+    Score a page in one pass over its text. Returns risk_score and risk_categories
+    (same as calculate_risk_score(content, title)), category, is_seller and
+    seller_indicators, country/state/district when mentioned, and the entries of
+    keywords found in the text. keyword_set defaults to the current one.
+    """
+    keyword_set = keyword_set or get_keyword_set()
+    scan = PageScan(keyword_set.matcher(keywords), title, description, content)
+    risk = risk_from_scan(scan.risk_scan, keyword_set) if content else {"score": 0, "categories": {}}
+    seller_indicators = seller_from_matches(scan.contains, keyword_set)
+    
+    result = {
+        "risk_score": risk["score"],
+        "risk_categories": risk["categories"],
+        "category": category_from_matches(scan.contains, keyword_set),
+        "is_seller": seller_indicators >= keyword_set.seller_threshold,
+        "seller_indicators": seller_indicators,
+        "found_keywords": [keyword for keyword in keywords or [] if scan.contains(keyword)]
+    }
+    result.update(get_gazetteer().locate(" ".join(part or "" for part in (title, description, content)), country))
+    return result
+
+def score_site(site, keywords=None, keyword_set=None):
+    """Score a crawled record, using content, then content_sample, then description as its body"""
+    content = site.get("content") or site.get("content_sample") or site.get("description", "")
+    country = site.get("country")
+    if country == "Unknown":
+        country = None
+    return score_page(site.get("title", ""), site.get("description", ""), content,
+                      keywords=keywords, country=country, keyword_set=keyword_set)
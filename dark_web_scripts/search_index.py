@@ -0,0 +1,480 @@
+"""
+Full-text search over crawled pages.
+Every page saved by save_crawled_content is added to an inverted index in the SQLite
+database configured by SEARCH_INDEX_PATH: a term dictionary with document
+frequencies, postings with term frequencies and positions, and document lengths.
+Pages are written in batches, and each batch stores one posting block per term
+(clustered by term), so a common term is read as a few blobs rather than a row per
+page. search() ranks pages with BM25 and supports "quoted phrases", so saved pages
+can be searched without starting a new crawl.
+"""
+import os
+import re
+import json
+import math
+import time
+import heapq
+import atexit
+import sqlite3
+import logging
+import threading
+from array import array
+from dotenv import load_dotenv
+
+# Optional vectorized scoring
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('search_index')
+
+# Load environment variables
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', os.path.join(BACKEND_DIR, 'data', 'search_index.db'))
+CRAWLED_DIR = os.path.join(BACKEND_DIR, 'data', 'crawled')
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+FIELD_GAP = 10  # position gap between title, description and content so phrases don't span them
+FLUSH_EVERY = 200  # pages written to the index per transaction (one posting block per term)
+LOOKUP_CHUNK = 500  # values per SQLite IN (...) lookup
+TERM_CACHE_SIZE = 1000000  # term ids kept in memory while indexing
+CACHE_KB = 65536  # SQLite page cache
+
+TOKEN_RE = re.compile(r'\w+')
+PHRASE_RE = re.compile(r'"([^"]*)"')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_documents (
+    doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT,
+    description TEXT,
+    file_path TEXT,
+    length INTEGER NOT NULL,
+    term_ids BLOB NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS search_terms (
+    term_id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE,
+    doc_freq INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS search_postings (
+    term_id INTEGER NOT NULL,
+    block_id INTEGER NOT NULL,
+    doc_ids BLOB NOT NULL,
+    freqs BLOB NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (term_id, block_id)
+) WITHOUT ROWID;
+"""
+
+def tokenize(text):
+    """Lowercased word tokens of text"""
+    return TOKEN_RE.findall((text or "").lower())
+
+def parse_query(query):
+    """Split a query into bare terms and "quoted phrases" (each a list of terms)"""
+    phrases = [tokenize(phrase) for phrase in PHRASE_RE.findall(query or "")]
+    terms = tokenize(PHRASE_RE.sub(' ', query or ""))
+    return terms, [phrase for phrase in phrases if phrase]
+
+def _chunks(values, size=LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _unpack(blob):
+    values = array('I')
+    values.frombytes(blob)
+    return values
+
+def _has_phrase(position_lists):
+    """Whether the terms occur at consecutive positions; position_lists[i] are term i's positions"""
+    candidates = set(position_lists[0])
+    for offset, positions in enumerate(position_lists[1:], 1):
+        candidates &= {position - offset for position in positions}
+        if not candidates:
+            return False
+    return True
+
+class SearchIndex:
+    """
+    Incrementally updated on-disk inverted index with BM25 ranking. Removed or
+    re-indexed pages leave dead entries in older posting blocks (skipped when
+    searching) until optimize() rewrites the blocks.
+    """
+
+    def __init__(self, db_path=SEARCH_INDEX_PATH):
+        self.db_path = str(db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA cache_size=-{CACHE_KB}")
+        self._conn.executescript(SCHEMA)
+
+        self._pending = {}  # url -> (title, description, content, file_path, indexed_at) not yet written
+        self._term_cache = {}  # term -> term_id for terms written by this process
+        atexit.register(self.flush)
+
+        # Document lengths by doc_id, kept in memory for scoring; 0 marks a removed document
+        self._lengths = array('I')
+        self.doc_count = 0
+        self.total_length = 0
+        for doc_id, length in self._conn.execute("SELECT doc_id, length FROM search_documents"):
+            self._set_length(doc_id, length)
+            self.doc_count += 1
+            self.total_length += length
+
+    def _set_length(self, doc_id, length):
+        if doc_id >= len(self._lengths):
+            self._lengths.extend([0] * (doc_id + 1 - len(self._lengths)))
+        self._lengths[doc_id] = length
+
+    def _term_ids(self, terms):
+        """term -> (term_id, doc_freq) for the terms that are in the dictionary"""
+        found = {}
+        for chunk in _chunks(terms):
+            rows = self._conn.execute(
+                f"SELECT term, term_id, doc_freq FROM search_terms WHERE term IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for term, term_id, doc_freq in rows:
+                found[term] = (term_id, doc_freq)
+        return found
+
+    def _ensure_terms(self, terms):
+        """
+        term -> term_id, adding terms the dictionary doesn't have; caller holds a
+        transaction and passes the result to _cache_terms once it has committed
+        """
+        term_ids = {term: self._term_cache[term] for term in terms if term in self._term_cache}
+        new_terms = [term for term in terms if term not in term_ids]
+        if new_terms:
+            self._conn.executemany("INSERT OR IGNORE INTO search_terms (term) VALUES (?)",
+                                   [(term,) for term in new_terms])
+            for term, (term_id, _) in self._term_ids(new_terms).items():
+                term_ids[term] = term_id
+        return term_ids
+
+    def _cache_terms(self, term_ids):
+        """Remember committed term ids, starting over when the cache is full"""
+        if len(self._term_cache) + len(term_ids) > TERM_CACHE_SIZE:
+            self._term_cache.clear()
+        self._term_cache.update(term_ids)
+
+    def _remove(self, doc_id, term_blob):
+        """
+        Remove a document (its postings become dead entries); caller holds the lock and a
+        transaction, and calls _forget(doc_id) once it has committed
+        """
+        self._conn.executemany(
+            "UPDATE search_terms SET doc_freq = doc_freq - 1 WHERE term_id = ?",
+            [(term_id,) for term_id in _unpack(term_blob)]
+        )
+        self._conn.execute("DELETE FROM search_documents WHERE doc_id = ?", (doc_id,))
+
+    def _forget(self, doc_id):
+        self.doc_count -= 1
+        self.total_length -= self._lengths[doc_id]
+        self._lengths[doc_id] = 0
+
+    def add_document(self, url, title="", description="", content="", file_path=None):
+        """
+        Queue a page for indexing, replacing any earlier version of the same URL.
+        Pages are written in batches of FLUSH_EVERY; searches always see queued pages.
+        """
+        with self._lock:
+            self._pending.pop(url, None)
+            self._pending[url] = (title, description, content, file_path, time.time())
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def _flush(self):
+        """
+        Write queued pages to the index in one transaction; caller holds the lock.
+        If the write fails, the pages stay queued and in-memory state is unchanged.
+        """
+        if not self._pending:
+            return
+        pages = list(self._pending.items())
+        try:
+            self._write(pages)
+        except Exception:
+            logger.error(f"Error writing {len(pages)} pages to the search index, keeping them queued")
+            raise
+        self._pending.clear()
+
+    def _write(self, pages):
+        """Index (url, page) pairs in one transaction, then update the in-memory state"""
+        documents = []
+        for url, (title, description, content, file_path, indexed_at) in pages:
+            positions = {}
+            position = 0
+            for text in (title, description, content):
+                for token in tokenize(text):
+                    positions.setdefault(token, []).append(position)
+                    position += 1
+                position += FIELD_GAP
+            length = sum(len(token_positions) for token_positions in positions.values())
+            documents.append((url, title, description, file_path, indexed_at, length, positions))
+
+        removed = []
+        added = []  # (doc_id, length)
+        with self._conn:
+            for chunk in _chunks(url for url, _ in pages):
+                previous = self._conn.execute(
+                    f"SELECT doc_id, term_ids FROM search_documents WHERE url IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for doc_id, term_blob in previous:
+                    self._remove(doc_id, term_blob)
+                    removed.append(doc_id)
+
+            term_ids = self._ensure_terms(list({term for document in documents for term in document[-1]}))
+            blocks = {}  # term_id -> (doc_ids, freqs, positions) for this batch
+            block_id = None
+            for url, title, description, file_path, indexed_at, length, positions in documents:
+                doc_id = self._conn.execute(
+                    "INSERT INTO search_documents (url, title, description, file_path, length, term_ids, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, title, description, file_path, length,
+                     array('I', [term_ids[term] for term in positions]).tobytes(), indexed_at)
+                ).lastrowid
+                block_id = doc_id if block_id is None else block_id
+                for term, token_positions in positions.items():
+                    block = blocks.get(term_ids[term])
+                    if block is None:
+                        block = blocks[term_ids[term]] = (array('I'), array('I'), array('I'))
+                    block[0].append(doc_id)
+                    block[1].append(len(token_positions))
+                    block[2].extend(token_positions)
+                added.append((doc_id, length))
+
+            self._conn.executemany(
+                "INSERT INTO search_postings (term_id, block_id, doc_ids, freqs, positions) VALUES (?, ?, ?, ?, ?)",
+                [(term_id, block_id, doc_ids.tobytes(), freqs.tobytes(), term_positions.tobytes())
+                 for term_id, (doc_ids, freqs, term_positions) in sorted(blocks.items())]
+            )
+            self._conn.executemany(
+                "UPDATE search_terms SET doc_freq = doc_freq + ? WHERE term_id = ?",
+                [(len(doc_ids), term_id) for term_id, (doc_ids, _, _) in blocks.items()]
+            )
+
+        # Committed: bring the in-memory lengths, counters and term cache up to date
+        for doc_id in removed:
+            self._forget(doc_id)
+        for doc_id, length in added:
+            self._set_length(doc_id, length)
+            self.doc_count += 1
+            self.total_length += length
+        self._cache_terms(term_ids)
+
+    def flush(self):
+        """Write queued pages to the index"""
+        with self._lock:
+            self._flush()
+
+    def remove_document(self, url):
+        """Remove a page from the index; returns whether it was indexed"""
+        with self._lock:
+            self._pending.pop(url, None)
+            self._flush()
+            with self._conn:
+                row = self._conn.execute(
+                    "SELECT doc_id, term_ids FROM search_documents WHERE url = ?", (url,)
+                ).fetchone()
+                if row:
+                    self._remove(*row)
+            if row:
+                self._forget(row[0])
+            return bool(row)
+
+    def _postings(self, term_id, with_positions=False):
+        """Live (doc_ids, freqs[, positions by doc_id]) of a term across its blocks"""
+        columns = "doc_ids, freqs, positions" if with_positions else "doc_ids, freqs, NULL"
+        doc_ids, freqs = array('I'), array('I')
+        positions = {}
+        lengths = self._lengths
+        for doc_blob, freq_blob, position_blob in self._conn.execute(
+            f"SELECT {columns} FROM search_postings WHERE term_id = ? ORDER BY block_id", (term_id,)
+        ):
+            block_docs, block_freqs = _unpack(doc_blob), _unpack(freq_blob)
+            block_positions = _unpack(position_blob) if with_positions else None
+            offset = 0
+            for doc_id, freq in zip(block_docs, block_freqs):
+                if lengths[doc_id]:
+                    doc_ids.append(doc_id)
+                    freqs.append(freq)
+                    if with_positions:
+                        positions[doc_id] = block_positions[offset:offset + freq]
+                offset += freq
+        return doc_ids, freqs, positions
+
+    def _bm25(self, term_postings, doc_freqs):
+        """doc_id -> BM25 score summed over the terms; term_postings[i] are (doc_ids, freqs) of term i"""
+        average_length = self.total_length / self.doc_count or 1
+        idfs = [math.log(1 + (self.doc_count - doc_freq + 0.5) / (doc_freq + 0.5)) for doc_freq in doc_freqs]
+
+        if NUMPY_AVAILABLE:
+            lengths = np.array(self._lengths, dtype=np.float64)
+            totals = np.zeros(len(lengths))
+            matched = np.zeros(len(lengths), dtype=bool)
+            for (doc_ids, freqs), idf in zip(term_postings, idfs):
+                docs = np.frombuffer(doc_ids, dtype=np.uint32)
+                tf = np.frombuffer(freqs, dtype=np.uint32).astype(np.float64)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / average_length)
+                totals += np.bincount(docs, weights=idf * tf * (BM25_K1 + 1) / (tf + norm), minlength=len(lengths))
+                matched[docs] = True
+            doc_ids = np.flatnonzero(matched)
+            return dict(zip(doc_ids.tolist(), totals[doc_ids].tolist()))
+
+        scores = {}
+        for (doc_ids, freqs), idf in zip(term_postings, idfs):
+            for doc_id, freq in zip(doc_ids, freqs):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+        return scores
+
+    def search(self, query, limit=20):
+        """
+        Rank indexed pages for a query with BM25. Bare terms are optional (any of them
+        can match); every "quoted phrase" must appear in the page. Returns the total
+        number of matching pages and the best `limit` of them.
+        """
+        terms, phrases = parse_query(query)
+        query_terms = list(dict.fromkeys(terms + [term for phrase in phrases for term in phrase]))
+        empty = {"query": query, "total": 0, "results": []}
+        if not query_terms:
+            return empty
+
+        with self._lock:
+            self._flush()
+            term_ids = self._term_ids(query_terms)
+            phrase_terms = {term for phrase in phrases for term in phrase}
+            if self.doc_count == 0 or not phrase_terms <= set(term_ids):
+                return empty
+
+            found_terms = [term for term in query_terms if term in term_ids]
+            postings = {term: self._postings(term_ids[term][0], with_positions=term in phrase_terms)
+                        for term in found_terms}
+            scores = self._bm25([postings[term][:2] for term in found_terms],
+                                [term_ids[term][1] for term in found_terms])
+
+            if phrases:
+                matched = set(scores)
+                for term in phrase_terms:
+                    matched.intersection_update(postings[term][0])
+                for phrase in phrases:
+                    if len(phrase) > 1:
+                        matched = {doc_id for doc_id in matched
+                                   if _has_phrase([postings[term][2][doc_id] for term in phrase])}
+                scores = {doc_id: scores[doc_id] for doc_id in matched}
+
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            documents = {}
+            for chunk in _chunks(doc_id for doc_id, _ in top):
+                rows = self._conn.execute(
+                    "SELECT doc_id, url, title, description, file_path, indexed_at FROM search_documents "
+                    f"WHERE doc_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                for doc_id, url, title, description, file_path, indexed_at in rows:
+                    documents[doc_id] = {
+                        "url": url,
+                        "title": title,
+                        "description": description,
+                        "file_path": file_path,
+                        "indexed_at": indexed_at
+                    }
+
+        results = []
+        for doc_id, score in top:
+            result = dict(documents[doc_id])
+            result["score"] = round(score, 4)
+            results.append(result)
+        return {"query": query, "total": len(scores), "results": results}
+
+    def optimize(self):
+        """Merge each term's posting blocks into one and drop entries of removed pages"""
+        with self._lock:
+            self._flush()
+            term_ids = [row[0] for row in self._conn.execute("SELECT DISTINCT term_id FROM search_postings")]
+            with self._conn:
+                for term_id in term_ids:
+                    doc_ids, freqs, positions = self._postings(term_id, with_positions=True)
+                    self._conn.execute("DELETE FROM search_postings WHERE term_id = ?", (term_id,))
+                    if doc_ids:
+                        merged = array('I')
+                        for doc_id in doc_ids:
+                            merged.extend(positions[doc_id])
+                        self._conn.execute(
+                            "INSERT INTO search_postings (term_id, block_id, doc_ids, freqs, positions) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (term_id, doc_ids[0], doc_ids.tobytes(), freqs.tobytes(), merged.tobytes())
+                        )
+            self._conn.execute("VACUUM")
+
+    def index_directory(self, data_dir=CRAWLED_DIR):
+        """Index saved page files that aren't in the index yet; returns how many were added"""
+        if not os.path.isdir(data_dir):
+            return 0
+        with self._lock:
+            indexed = {row[0] for row in self._conn.execute(
+                "SELECT file_path FROM search_documents WHERE file_path IS NOT NULL"
+            )}
+        added = 0
+        for filename in sorted(os.listdir(data_dir)):
+            file_path = os.path.join(data_dir, filename)
+            if not filename.endswith('.json') or file_path in indexed:
+                continue
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    page = json.load(f)
+                self.add_document(page["url"], page.get("title", ""), page.get("description", ""),
+                                  page.get("content", ""), file_path)
+                added += 1
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Error indexing {file_path}: {e}")
+        self.flush()
+        return added
+
+    def stats(self):
+        with self._lock:
+            self._flush()
+            terms = self._conn.execute("SELECT COUNT(*) FROM search_terms WHERE doc_freq > 0").fetchone()[0]
+            blocks = self._conn.execute("SELECT COUNT(*) FROM search_postings").fetchone()[0]
+            return {
+                "documents": self.doc_count,
+                "terms": terms,
+                "posting_blocks": blocks,
+                "average_length": round(self.total_length / self.doc_count, 1) if self.doc_count else 0
+            }
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index():
+    """The process-wide search index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+if __name__ == "__main__":
+    # Index every saved page that isn't indexed yet, then show the index size
+    index = get_search_index()
+    print(f"Indexed {index.index_directory()} saved pages")
+    print(index.stats())
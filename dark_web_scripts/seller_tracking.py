@@ -384,8 +384,12 @@ def save_seller_profile(profile):
         logger.error(f"Error saving seller profile: {e}")
         return False
 
-def get_seller_history(marketplace, seller_id=None, seller_name=None):
-    """Get historical data for a seller"""
+def get_seller_history(marketplace, seller_id=None, seller_name=None, limit=None, after=None):
+    """
+    Get historical data for a seller, newest first. With limit only that many
+    snapshots are loaded, starting after the snapshot file named after;
+    next_after names the file to continue from, or is None on the last page.
+    """
     try:
         data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', 'data', 'sellers')
         
@@ -410,6 +414,15 @@ def get_seller_history(marketplace, seller_id=None, seller_name=None):
         
         # Sort by timestamp (newest first)
         files.sort(reverse=True)
+        total = len(files)
+        
+        # Only read the requested page of snapshots
+        if after:
+            files = [f for f in files if os.path.basename(f) < after]
+        next_after = None
+        if limit is not None and len(files) > limit:
+            files = files[:limit]
+            next_after = os.path.basename(files[-1])
         
         # Load data from files
         history = []
@@ -426,7 +439,9 @@ def get_seller_history(marketplace, seller_id=None, seller_name=None):
             "seller_id": seller_id,
             "seller_name": seller_name,
             "history": history,
-            "count": len(history)
+            "count": len(history),
+            "total": total,
+            "next_after": next_after
         }
     
     except Exception as e:
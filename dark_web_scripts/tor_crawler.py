@@ -1,18 +1,17 @@
 import requests
 from stem import Signal
 from stem.control import Controller
-from bs4 import BeautifulSoup
 import re
 import json
 import os
 import time
 import datetime
-import hashlib
 import random
+import hashlib
+import sqlite3
 import logging
-import queue
 import threading
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, unquote
 from dotenv import load_dotenv
 import socks
 import socket
@@ -27,14 +26,26 @@ load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend',
 # Import local modules
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from dark_web_scripts.dark_web_filters import calculate_risk_score, categorize_site
+from dark_web_scripts.scoring import score_page, get_keyword_matcher
+from dark_web_scripts.keyword_sets import get_keyword_set
 from dark_web_scripts.ip_reveal import reveal_ip_and_geo
 from dark_web_scripts.seller_tracking import identify_marketplace, extract_seller_id
+from dark_web_scripts.circuit_pool import TorCircuitPool
+from dark_web_scripts.crawl_frontier import CrawlFrontier
+from dark_web_scripts.politeness import PolitenessScheduler
+from dark_web_scripts.page_parser import parse_page
+from dark_web_scripts.search_index import get_search_index
+from dark_web_scripts.result_db import get_result_db
+from dark_web_scripts.content_log import get_content_log
+from dark_web_scripts.blob_store import get_blob_store
 
 # Constants
-MAX_PAGES_PER_SITE = 50
+MAX_PAGES_PER_SITE = 50  # page budget per .onion domain (scaled by domain_weights)
 MAX_DEPTH = 3
+MAX_DOMAIN_DEPTH = 3  # same-domain link hops followed from the first page seen on a domain
 CRAWL_DELAY = 2  # seconds between requests to the same domain
+SCHEDULER_BATCH = 200  # URLs claimed from the frontier at a time
+SCHEDULER_BUFFER = 5000  # maximum URLs held in memory by the politeness scheduler
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; rv:91.0) Gecko/20100101 Firefox/91.0',
     'Mozilla/5.0 (Windows NT 10.0; rv:78.0) Gecko/20100101 Firefox/78.0',
@@ -201,126 +212,79 @@ def normalize_url(url):
         logger.error(f"Error normalizing URL {url}: {e}")
         return url
 
-def extract_links(html, base_url):
-    """Extract links from HTML content"""
-    try:
-        soup = BeautifulSoup(html, 'html.parser')
-        links = []
+def filter_links(hrefs, base_url):
+    """Turn raw hrefs from a page into normalized .onion URLs worth crawling"""
+    links = []
+    
+    for href in hrefs:
+        # Skip empty links, javascript, and mailto
+        if not href or href.startswith(('javascript:', 'mailto:', '#')):
+            continue
         
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
-            
-            # Skip empty links, javascript, and mailto
-            if not href or href.startswith(('javascript:', 'mailto:', '#')):
-                continue
-            
-            # Convert relative URLs to absolute
-            absolute_url = urljoin(base_url, href)
-            
-            # Normalize the URL
-            normalized_url = normalize_url(absolute_url)
-            
-            # Validate the URL
-            if not is_valid_url(normalized_url):
-                logger.warning(f"Skipping invalid URL: {normalized_url}")
-                continue
-                
-            # Only include .onion URLs
-            if is_onion_url(normalized_url):
-                links.append(normalized_url)
+        # Convert relative URLs to absolute
+        absolute_url = urljoin(base_url, href)
+        
+        # Normalize the URL
+        normalized_url = normalize_url(absolute_url)
+        
+        # Validate the URL
+        if not is_valid_url(normalized_url):
+            logger.warning(f"Skipping invalid URL: {normalized_url}")
+            continue
             
-            # Also include URLs with redirect_url parameter pointing to .onion domains
-            elif 'redirect_url=' in normalized_url:
-                try:
-                    # Extract the redirect URL
-                    redirect_part = normalized_url.split('redirect_url=')[1].split('&')[0]
-                    
-                    # URL decode the redirect part
-                    import urllib.parse
-                    redirect_part = urllib.parse.unquote(redirect_part)
-                    
-                    # Ensure it has a scheme
-                    if not redirect_part.startswith(('http://', 'https://')):
-                        redirect_part = 'http://' + redirect_part
-                    
-                    # Validate and normalize the redirect URL
-                    redirect_part = normalize_url(redirect_part)
-                    
-                    if is_onion_url(redirect_part) and is_valid_url(redirect_part):
-                        # Use the actual .onion URL instead of the redirect
-                        links.append(redirect_part)
-                        logger.info(f"Extracted redirect URL: {redirect_part}")
-                except Exception as e:
-                    logger.warning(f"Failed to extract redirect URL from {normalized_url}: {e}")
+        # Only include .onion URLs
+        if is_onion_url(normalized_url):
+            links.append(normalized_url)
         
-        return links
+        # Also include URLs with redirect_url parameter pointing to .onion domains
+        elif 'redirect_url=' in normalized_url:
+            try:
+                # Extract the redirect URL
+                redirect_part = normalized_url.split('redirect_url=')[1].split('&')[0]
+                
+                # URL decode the redirect part
+                redirect_part = unquote(redirect_part)
+                
+                # Ensure it has a scheme
+                if not redirect_part.startswith(('http://', 'https://')):
+                    redirect_part = 'http://' + redirect_part
+                
+                # Validate and normalize the redirect URL
+                redirect_part = normalize_url(redirect_part)
+                
+                if is_onion_url(redirect_part) and is_valid_url(redirect_part):
+                    # Use the actual .onion URL instead of the redirect
+                    links.append(redirect_part)
+                    logger.info(f"Extracted redirect URL: {redirect_part}")
+            except Exception as e:
+                logger.warning(f"Failed to extract redirect URL from {normalized_url}: {e}")
+    
+    return links
+
+def extract_links(html, base_url):
+    """Extract links from HTML content"""
+    try:
+        return filter_links(parse_page(html, base_url)["links"], base_url)
     except Exception as e:
         logger.error(f"Error extracting links from {base_url}: {e}")
         return []
 
 def extract_content(html, url):
-    """Extract relevant content from HTML"""
-    try:
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-        
-        # Get the title
-        title = soup.title.string if soup.title else ""
-        
-        # Get meta description
-        meta_desc = ""
-        meta_tag = soup.find("meta", attrs={"name": "description"})
-        if meta_tag and "content" in meta_tag.attrs:
-            meta_desc = meta_tag["content"]
-        
-        # Get main content (prioritize main content areas)
-        content_areas = soup.select("main, article, .content, #content, .main, #main")
-        if content_areas:
-            # Use the largest content area
-            main_content = max(content_areas, key=lambda x: len(x.get_text()))
-            content = main_content.get_text(separator=' ', strip=True)
-        else:
-            # Fall back to body text
-            content = soup.get_text(separator=' ', strip=True)
-        
-        # Clean up content (remove excessive whitespace)
-        content = re.sub(r'\s+', ' ', content).strip()
-        
-        # Limit content length
-        if len(content) > 10000:
-            content = content[:10000] + "..."
-        
-        return {
-            "title": title,
-            "description": meta_desc,
-            "content": content,
-            "html": html  # Keep the original HTML for further analysis
-        }
-    except Exception as e:
-        logger.error(f"Error extracting content from {url}: {e}")
-        return {
-            "title": "",
-            "description": "",
-            "content": "",
-            "html": html
-        }
+    """Extract title, meta description and main content from HTML"""
+    page = parse_page(html, url)
+    return {
+        "title": page["title"],
+        "description": page["description"],
+        "content": page["content"]
+    }
 
 def check_for_keywords(text, keywords=None):
     """Check if text contains any of the specified keywords"""
     if not keywords:
         keywords = ILLEGAL_KEYWORDS
     
-    text = text.lower()
-    found_keywords = []
-    
-    for keyword in keywords:
-        if keyword.lower() in text:
-            found_keywords.append(keyword)
-    
-    return found_keywords
+    scan = get_keyword_matcher(keywords).scan(text)
+    return [keyword for keyword in keywords if scan.contains(keyword)]
 
 def is_valid_url(url):
     """Check if a URL is valid and has a hostname"""
@@ -330,7 +294,60 @@ def is_valid_url(url):
     except:
         return False
 
-def scrape_onion_site(url, session=None, depth=0, visited=None, domain_last_visit=None, keywords=None):
+def process_page(url, html, depth=0, keywords=None, keyword_set=None):
+    """Build the result dict for a fetched page (shared by the sync and async crawl engines)"""
+    if keywords is None:
+        keywords = ILLEGAL_KEYWORDS
+    
+    # Parse the page once for content and links
+    content_data = parse_page(html, url)
+    
+    # Keywords, risk score, category, seller signals and location from one pass of the scoring engine
+    analysis = score_page(content_data['title'], content_data['description'], content_data['content'], keywords,
+                          keyword_set=keyword_set)
+    
+    # Determine if it's a marketplace and if it's a seller profile
+    marketplace = identify_marketplace(url)
+    is_seller = analysis["is_seller"]
+    seller_id = None
+    
+    if marketplace:
+        seller_id = extract_seller_id(url, marketplace)
+        if seller_id:
+            is_seller = True
+    
+    # Create result object
+    result = {
+        "url": url,
+        "title": content_data['title'],
+        "description": content_data['description'],
+        "content_sample": content_data['content'][:500] + "..." if len(content_data['content']) > 500 else content_data['content'],
+        "found_keywords": analysis["found_keywords"],
+        "risk_score": analysis["risk_score"],
+        "risk_categories": analysis["risk_categories"],
+        "timestamp": datetime.datetime.now().isoformat(),
+        "marketplace": marketplace,
+        "is_seller": is_seller,
+        "seller_id": seller_id,
+        "category": analysis["category"]
+    }
+    for field in ("country", "state", "district"):
+        if field in analysis:
+            result[field] = analysis[field]
+    
+    # Save the full content to disk; the result references the stored body by hash
+    result["content_hash"] = save_crawled_content(url, content_data, result)
+    
+    # Extract links for further crawling if not at max depth
+    links = []
+    if depth < MAX_DEPTH:
+        links = filter_links(content_data["links"], url)
+        result["links"] = links
+    
+    return result
+
+def scrape_onion_site(url, session=None, depth=0, visited=None, domain_last_visit=None, keywords=None,
+                      keyword_set=None):
     """Scrape a single .onion site and return its content"""
     if not session:
         session = connect_to_tor()
@@ -399,56 +416,7 @@ def scrape_onion_site(url, session=None, depth=0, visited=None, domain_last_visi
                 "timestamp": datetime.datetime.now().isoformat()
             }
         
-        # Extract content
-        content_data = extract_content(response.text, url)
-        
-        # Check for keywords
-        full_text = f"{content_data['title']} {content_data['description']} {content_data['content']}"
-        found_keywords = check_for_keywords(full_text, keywords)
-        
-        # Calculate risk score
-        risk_data = calculate_risk_score(content_data['content'], content_data['title'])
-        
-        # Determine if it's a marketplace and if it's a seller profile
-        marketplace = identify_marketplace(url)
-        is_seller = False
-        seller_id = None
-        
-        if marketplace:
-            seller_id = extract_seller_id(url, marketplace)
-            if seller_id:
-                is_seller = True
-        
-        # Create result object
-        result = {
-            "url": url,
-            "title": content_data['title'],
-            "description": content_data['description'],
-            "content_sample": content_data['content'][:500] + "..." if len(content_data['content']) > 500 else content_data['content'],
-            "found_keywords": found_keywords,
-            "risk_score": risk_data["score"],
-            "risk_categories": risk_data["categories"],
-            "timestamp": datetime.datetime.now().isoformat(),
-            "marketplace": marketplace,
-            "is_seller": is_seller,
-            "seller_id": seller_id,
-            "category": categorize_site({
-                "title": content_data['title'],
-                "description": content_data['description'],
-                "content": content_data['content']
-            })
-        }
-        
-        # Save the full content to disk
-        save_crawled_content(url, content_data, result)
-        
-        # Extract links for further crawling if not at max depth
-        links = []
-        if depth < MAX_DEPTH:
-            links = extract_links(response.text, url)
-            result["links"] = links
-        
-        return result
+        return process_page(url, response.text, depth=depth, keywords=keywords, keyword_set=keyword_set)
     
     except requests.exceptions.RequestException as e:
         logger.error(f"Error scraping {url}: {e}")
@@ -465,155 +433,265 @@ def scrape_onion_site(url, session=None, depth=0, visited=None, domain_last_visi
             "timestamp": datetime.datetime.now().isoformat()
         }
 
+def hash_metadata(metadata):
+    """Hash of a page's metadata without its timestamp, to tell whether a re-crawl changed its scoring"""
+    fields = {field: value for field, value in metadata.items() if field != "timestamp"}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
 def save_crawled_content(url, content_data, metadata):
-    """Save crawled content to disk"""
+    """
+    Save crawled content: the body goes to the content-addressed blob store and a
+    new version of the page, referencing the body by hash, to the content log.
+    A page whose title, description, body and scoring metadata (risk score,
+    keywords, category, seller flags...) haven't changed since it was last saved
+    isn't written again. Returns the body's hash, or None on error.
+    """
     try:
-        # Create directory if it doesn't exist
-        data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', 'data', 'crawled')
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # Create a unique filename based on URL
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{url_hash}_{timestamp}.json"
-        
-        # Combine content and metadata
+        blob_store = get_blob_store()
+        content_log = get_content_log()
+        content_hash = blob_store.put(content_data["content"])
+        metadata_hash = hash_metadata(metadata)
+        
+        previous = content_log.get(url)
+        if previous and previous.get("content_hash") == content_hash and \
+                previous.get("metadata_hash") == metadata_hash and \
+                previous.get("title") == content_data["title"] and \
+                previous.get("description") == content_data["description"]:
+            logger.info(f"Content from {url} unchanged since version {content_log.versions(url)[0]['version']}")
+            return content_hash
+        
+        # Combine content reference and metadata
         data = {
             "url": url,
             "timestamp": datetime.datetime.now().isoformat(),
             "title": content_data["title"],
             "description": content_data["description"],
-            "content": content_data["content"],
-            "metadata": metadata
+            "content_hash": content_hash,
+            "metadata": metadata,
+            "metadata_hash": metadata_hash
         }
         
-        # Save to file
-        file_path = os.path.join(data_dir, filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        version = content_log.append(url, data)
+        logger.info(f"Saved content from {url} to the content log (version {version})")
         
-        logger.info(f"Saved content from {url} to {file_path}")
-        return True
+        # Keep the full-text index up to date with the saved pages
+        try:
+            get_search_index().add_document(url, data["title"], data["description"], content_data["content"])
+        except sqlite3.Error as e:
+            logger.error(f"Error indexing content from {url}: {e}")
+        return content_hash
     except Exception as e:
         logger.error(f"Error saving content from {url}: {e}")
+        return None
+
+def is_relevant_result(result):
+    """Check whether a scraped page should be kept in the crawl results"""
+    return bool(result.get("found_keywords") or
+                result.get("risk_score", 0) > 50 or
+                "error" not in result)
+
+def attach_ip_info(result, url):
+    """Try to reveal the hosting IP of a scraped page and attach it to the result"""
+    try:
+        ip_info = reveal_ip_and_geo(url)
+        if ip_info and ip_info.get("ip_found", False):
+            result["ip_info"] = ip_info
+    except Exception as e:
+        logger.error(f"Error revealing IP for {url}: {e}")
+    return result
+
+def log_crawl_stats(stats, results):
+    """Log the summary of a finished crawl, including the per-domain budget counters"""
+    logger.info(f"Crawl {stats['crawl_id']} completed. Visited {stats['done'] + stats['failed']} URLs, found {len(results)} relevant pages")
+    logger.info(f"Crawled {stats['domains_crawled']}/{stats['domains_seen']} domains, "
+                f"{stats['domains_exhausted']} hit their page budget; dropped {stats['dropped_over_budget']} "
+                f"URLs over budget and {stats['dropped_too_deep']} too deep")
+
+def get_crawl_stats(crawl_id):
+    """Frontier and per-domain budget counters of a (possibly finished) crawl"""
+    frontier = CrawlFrontier(crawl_id, resume=False)
+    try:
+        stats = frontier.stats()
+        stats["domains"] = frontier.domain_stats()
+        return stats
+    finally:
+        frontier.close()
+
+def scheduler_room(scheduler):
+    """How many URLs to claim from the frontier to top up the politeness scheduler"""
+    return max(0, min(SCHEDULER_BATCH, SCHEDULER_BUFFER - len(scheduler)))
+
+def fill_scheduler(frontier, scheduler):
+    """Move a batch of ready URLs from the frontier into the politeness scheduler"""
+    room = scheduler_room(scheduler)
+    if not room:
         return False
+    claimed = frontier.claim(room)
+    for url, depth in claimed:
+        scheduler.push(url, depth)
+    return bool(claimed)
 
-def crawl_dark_web(start_urls=None, max_pages=100, keywords=None, enable_ip_detection=True):
-    """Crawl the Dark Web starting from seed URLs"""
+def crawl_dark_web(start_urls=None, max_pages=100, keywords=None, enable_ip_detection=True,
+                   use_async=False, concurrency=None, circuit_pool=None, crawl_id=None,
+                   domain_delays=None, max_pages_per_site=MAX_PAGES_PER_SITE, domain_weights=None,
+                   keyword_set=None, progress=None, cancel_event=None, on_result=None):
+    """
+    Crawl the Dark Web starting from seed URLs.
+    Passing the crawl_id of an interrupted crawl resumes it from its saved frontier.
+    Each domain gets at most max_pages_per_site pages (times its weight in domain_weights),
+    and domains take turns so the max_pages budget is spread across many onion services.
+    on_result(result) is called with every relevant page as soon as it is scored, and
+    progress(pages_crawled, results_found) after every page. Setting cancel_event
+    stops the crawl after the current page, leaving it resumable.
+    """
     if not start_urls:
         start_urls = SEED_URLS
     
     if keywords is None:
         keywords = ILLEGAL_KEYWORDS
     
-    # Initialize Tor session
-    session = connect_to_tor()
-    if not session:
-        return {"error": "Could not connect to Tor"}
+    # Score the whole crawl with one keyword set, even if the file is reloaded meanwhile
+    if keyword_set is None:
+        keyword_set = get_keyword_set()
     
-    # Initialize crawl state
-    visited = set()
-    domain_last_visit = {}
+    # Hand off to the asyncio engine if requested and available
+    if use_async:
+        from dark_web_scripts.async_crawler import AIOHTTP_AVAILABLE, run_async_crawl
+        if AIOHTTP_AVAILABLE:
+            return run_async_crawl(
+                start_urls=start_urls,
+                max_pages=max_pages,
+                keywords=keywords,
+                enable_ip_detection=enable_ip_detection,
+                concurrency=concurrency,
+                circuit_pool=circuit_pool,
+                crawl_id=crawl_id,
+                domain_delays=domain_delays,
+                max_pages_per_site=max_pages_per_site,
+                domain_weights=domain_weights,
+                keyword_set=keyword_set,
+                progress=progress,
+                cancel_event=cancel_event,
+                on_result=on_result
+            )
+        logger.warning("aiohttp/aiohttp_socks not installed, falling back to the synchronous crawler")
+    
+    # Initialize the pool of isolated Tor circuits (verified once, rotated per circuit)
+    owns_pool = circuit_pool is None
+    if owns_pool:
+        circuit_pool = TorCircuitPool()
+        circuit_pool.verify()
+    
+    # Initialize the persistent frontier (an existing crawl_id resumes where it stopped)
+    frontier = CrawlFrontier(crawl_id, max_pages=max_pages, max_pages_per_domain=max_pages_per_site,
+                             max_domain_depth=MAX_DOMAIN_DEPTH, domain_weights=domain_weights)
+    scheduler = PolitenessScheduler(default_delay=CRAWL_DELAY, delay_overrides=domain_delays)
     results = []
-    to_visit = queue.Queue()
     
-    # Add start URLs to queue
-    for url in start_urls:
-        to_visit.put((url, 0))  # (url, depth)
+    # Add start URLs to the frontier
+    frontier.add_many([(normalize_url(url), 0) for url in start_urls])  # (url, depth)
     
     # Start crawling
-    pages_crawled = 0
-    
-    while not to_visit.empty() and pages_crawled < max_pages:
-        # Get new Tor circuit every 10 pages
-        if pages_crawled > 0 and pages_crawled % 10 == 0:
-            new_tor_circuit()
-            # Recreate session after new circuit
-            session = connect_to_tor()
-            if not session:
-                logger.error("Lost connection to Tor, stopping crawl")
-                break
-        
-        # Get next URL to crawl
-        url, depth = to_visit.get()
-        
-        # Skip if already visited
-        if url in visited:
-            continue
-        
-        # Crawl the page
-        result = scrape_onion_site(
-            url, 
-            session=session, 
-            depth=depth, 
-            visited=visited, 
-            domain_last_visit=domain_last_visit,
-            keywords=keywords
-        )
-        
-        if result:
+    pages_crawled = frontier.pages_crawled
+    
+    try:
+        while pages_crawled < max_pages and not (cancel_event and cancel_event.is_set()):
+            # Get next URL from a domain whose crawl delay has elapsed
+            claimed = scheduler.pop()
+            if claimed is None:
+                if fill_scheduler(frontier, scheduler):
+                    continue
+                wait = scheduler.time_until_ready()
+                if wait is None:
+                    # Nothing buffered; stop unless the frontier holds URLs scheduled for later
+                    next_ready = frontier.next_ready_time()
+                    if next_ready is None:
+                        break
+                    wait = max(0, next_ready - time.time())
+                if cancel_event:
+                    cancel_event.wait(wait)
+                else:
+                    time.sleep(wait)
+                continue
+            url, depth = claimed
+            
+            # Crawl the page over the least busy circuit
+            circuit = circuit_pool.acquire()
+            start_time = time.time()
+            result = scrape_onion_site(
+                url, 
+                session=circuit.session, 
+                depth=depth, 
+                keywords=keywords,
+                keyword_set=keyword_set
+            )
+            success = "error" not in result
+            circuit_pool.release(circuit, time.time() - start_time, success)
+            scheduler.release(url, success)
+            
+            if success:
+                frontier.mark_done(url)
+            else:
+                frontier.mark_failed(url)
+            
             # Add to results if it contains keywords or has high risk score
-            if (result.get("found_keywords") or 
-                result.get("risk_score", 0) > 50 or 
-                "error" not in result):
+            if is_relevant_result(result):
                 
                 # Try to reveal IP if enabled
-                if enable_ip_detection and "error" not in result:
-                    try:
-                        ip_info = reveal_ip_and_geo(url)
-                        if ip_info and ip_info.get("ip_found", False):
-                            result["ip_info"] = ip_info
-                    except Exception as e:
-                        logger.error(f"Error revealing IP for {url}: {e}")
+                if enable_ip_detection and success:
+                    attach_ip_info(result, url)
                 
                 results.append(result)
+                if on_result:
+                    on_result(result)
             
-            # Add links to queue if not at max depth
+            # Add links to the frontier if not at max depth (already seen URLs are ignored)
             if "links" in result and depth < MAX_DEPTH:
-                for link in result["links"]:
-                    if link not in visited:
-                        to_visit.put((link, depth + 1))
-        
-        pages_crawled += 1
-        logger.info(f"Crawled {pages_crawled}/{max_pages} pages")
+                frontier.add_links(url, result["links"])
+            
+            pages_crawled += 1
+            logger.info(f"Crawled {pages_crawled}/{max_pages} pages")
+            if progress:
+                progress(pages_crawled, len(results))
+        
+        # URLs still buffered in memory go back to the frontier for a later resume
+        for url, _ in scheduler.drain():
+            frontier.requeue(url)
+        
+        frontier.finish('completed' if not frontier.has_pending() else 'stopped')
+        stats = frontier.stats()
+    finally:
+        frontier.close()
+        if owns_pool:
+            circuit_pool.close()
     
-    logger.info(f"Crawl completed. Visited {len(visited)} URLs, found {len(results)} relevant pages")
+    log_crawl_stats(stats, results)
     return results
 
-def search_dark_web(keywords, max_pages=50):
+def search_dark_web(keywords, max_pages=50, use_async=False, crawl_id=None):
     """Search the Dark Web for specific keywords"""
     if isinstance(keywords, str):
         keywords = [keyword.strip() for keyword in keywords.split(',')]
     
     logger.info(f"Searching Dark Web for keywords: {keywords}")
     
-    # Check if we have any stored data with redirect URLs for these keywords
+    # Check if we have any stored results with redirect URLs for these keywords
     try:
-        data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', 'data_storage')
-        file_path = os.path.join(data_dir, 'crawled_data.json')
-        
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                stored_data = json.load(f)
-            
-            # Extract actual .onion URLs from redirect URLs
-            redirect_urls = []
-            for item in stored_data:
-                if 'url' in item and 'redirect_url=' in item['url']:
-                    try:
-                        redirect_part = item['url'].split('redirect_url=')[1].split('&')[0]
-                        if is_valid_url(redirect_part) and is_onion_url(redirect_part):
-                            redirect_urls.append(redirect_part)
-                            logger.info(f"Found stored redirect URL: {redirect_part}")
-                    except Exception as e:
-                        logger.warning(f"Failed to extract redirect URL from stored data: {e}")
-            
-            # Add these to our seed URLs if they're valid
-            if redirect_urls:
-                start_urls = SEED_URLS + redirect_urls
-                logger.info(f"Added {len(redirect_urls)} redirect URLs to seed list")
-            else:
-                start_urls = SEED_URLS
+        # Extract actual .onion URLs from redirect URLs
+        redirect_urls = []
+        for item in get_result_db().iter_records(url_contains='redirect_url='):
+            try:
+                redirect_part = item['url'].split('redirect_url=')[1].split('&')[0]
+                if is_valid_url(redirect_part) and is_onion_url(redirect_part):
+                    redirect_urls.append(redirect_part)
+                    logger.info(f"Found stored redirect URL: {redirect_part}")
+            except Exception as e:
+                logger.warning(f"Failed to extract redirect URL from stored data: {e}")
+        
+        # Add these to our seed URLs if they're valid
+        if redirect_urls:
+            start_urls = SEED_URLS + redirect_urls
+            logger.info(f"Added {len(redirect_urls)} redirect URLs to seed list")
         else:
             start_urls = SEED_URLS
     except Exception as e:
@@ -625,7 +703,9 @@ def search_dark_web(keywords, max_pages=50):
         start_urls=start_urls,
         max_pages=max_pages,
         keywords=keywords,
-        enable_ip_detection=True
+        enable_ip_detection=True,
+        use_async=use_async,
+        crawl_id=crawl_id
     )
     
     return results
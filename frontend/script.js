@@ -219,6 +219,52 @@ async function fetchData(endpoint, data = {}, method = 'POST') {
     }
 }
 
+// Stream a crawl job's results over Server-Sent Events as the backend finds them.
+// Resolves with all results once the job is done, or null if the job couldn't be started.
+async function streamCrawl(data, onResult, onProgress) {
+    const job = await fetchData('/crawl', { ...data, async: true });
+    if (!job || !job.job_id) {
+        return null;
+    }
+    
+    return new Promise((resolve, reject) => {
+        const results = [];
+        let skipped = false;
+        const source = new EventSource(`${API_URL}/crawl/jobs/${job.job_id}/events`);
+        
+        source.addEventListener('result', event => {
+            results.push(JSON.parse(event.data));
+            onResult(results);
+        });
+        // Results the stream fell too far behind to deliver are in the job's results
+        source.addEventListener('skipped', () => {
+            skipped = true;
+        });
+        source.addEventListener('progress', event => {
+            if (onProgress) {
+                onProgress(JSON.parse(event.data));
+            }
+        });
+        source.addEventListener('done', event => {
+            source.close();
+            const status = JSON.parse(event.data);
+            if (status.status === 'failed') {
+                reject(new Error(status.error || 'Crawl failed'));
+            } else if (skipped) {
+                fetchData(`/crawl/jobs/${job.job_id}/results?limit=1000`, {}, 'GET').then(resolve, reject);
+            } else {
+                resolve(results);
+            }
+        });
+        // EventSource reconnects (resuming after the last result) unless the stream is closed
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                reject(new Error('Lost connection to the crawl stream'));
+            }
+        };
+    });
+}
+
 // Check for high risk items and trigger alert
 function checkForHighRisk(results) {
     const highRiskItems = results.filter(item => item.risk_score >= 80);
@@ -567,7 +613,22 @@ document.addEventListener('DOMContentLoaded', () => {
         console.log('Sending crawl request to endpoint:', endpoint);
         console.log('Request data:', data);
         
-        const results = await fetchData(endpoint, data);
+        let results;
+        if (endpoint === '/crawl' && window.EventSource) {
+            // Render each result as soon as the backend has scored it
+            let found = 0;
+            results = await streamCrawl(data, streamed => {
+                found = streamed.length;
+                crawlResults = streamed;
+                renderCrawlResults(streamed);
+            }, progress => {
+                if (found === 0) {
+                    resultsDiv.innerHTML = `<p>Crawling the dark web... ${progress.pages_crawled}/${progress.max_pages} pages <i class="fas fa-spinner fa-spin"></i></p>`;
+                }
+            });
+        } else {
+            results = await fetchData(endpoint, data);
+        }
         
         console.log('Received crawl results:', results);
         
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Test script for the crawl job event stream (runs the backend in development mode,
+with its databases and log file in a temporary directory)
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+
+client = None
+data_dir = None
+saved_environ = None
+
+def setup_module(module=None):
+    """Point the backend at a temporary directory and create a test client"""
+    global client, data_dir, saved_environ
+    data_dir = tempfile.mkdtemp(prefix='darkweb-test-')
+    saved_environ = dict(os.environ)
+    os.environ.update({
+        'DARK_WEB_DEV_MODE': '1',
+        'DB_PATH': os.path.join(data_dir, 'darkweb.db'),
+        'LOG_FILE': os.path.join(data_dir, 'darkweb.log'),
+        'CONTENT_LOG_DIR': os.path.join(data_dir, 'content'),
+        'BLOB_STORE_PATH': os.path.join(data_dir, 'blobs.db'),
+        'SEARCH_INDEX_PATH': os.path.join(data_dir, 'search.db'),
+        'ENRICHMENT_CACHE_PATH': ''
+    })
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from app import app
+    client = app.test_client()
+
+def teardown_module(module=None):
+    """Restore the environment and remove the temporary directory"""
+    import logging
+    for name in list(logging.Logger.manager.loggerDict):
+        if name == 'darkweb' or name.startswith('darkweb.'):
+            for handler in logging.getLogger(name).handlers:
+                handler.close()
+    os.environ.clear()
+    os.environ.update(saved_environ)
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+def parse_events(body):
+    """(event, data) of every message in a Server-Sent Events body"""
+    events = []
+    for message in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if ': ' in line)
+        events.append((fields.get('event'), json.loads(fields.get('data', 'null'))))
+    return events
+
+def stream_job(params):
+    """Submit a crawl job and return the events of its stream"""
+    response = client.post('/crawl/jobs', json=params)
+    assert response.status_code == 202, response.get_data(as_text=True)
+    job_id = response.get_json()['job_id']
+    response = client.get(f'/crawl/jobs/{job_id}/events')
+    assert response.status_code == 200
+    return parse_events(response.get_data(as_text=True))
+
+def test_stream_risk_threshold():
+    """Only results at or above the risk threshold are streamed"""
+    events = stream_job({"keywords": "", "risk_threshold": 70})
+    assert events[-1][0] == 'done', events[-1]
+    scores = [data['risk_score'] for event, data in events if event == 'result']
+    assert all(score >= 70 for score in scores), scores
+    print(f"✅ Streamed {len(scores)} results, all with risk score >= 70")
+
+def test_stream_unfiltered():
+    """Without filters every result is streamed"""
+    events = stream_job({"keywords": ""})
+    results = [data for event, data in events if event == 'result']
+    assert len(results) == 15, len(results)
+    print(f"✅ Streamed all {len(results)} results without filters")
+
+def main():
+    """Run all tests"""
+    print("🔍 Testing crawl job event stream...")
+    print("-" * 50)
+
+    setup_module()
+    failed = 0
+    try:
+        for test in (test_stream_risk_threshold, test_stream_unfiltered):
+            try:
+                test()
+            except AssertionError as e:
+                print(f"❌ {test.__doc__} failed: {e}")
+                failed += 1
+    finally:
+        teardown_module()
+
+    print("-" * 50)
+    print("✅ All tests passed" if not failed else f"❌ {failed} test(s) failed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())